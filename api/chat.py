@@ -8,6 +8,9 @@ from urllib.parse import urlparse, parse_qs
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from lib.ai_interviewer import AIInterviewer
+from lib.tracing import request_trace, tag
+from lib.llm_gateway import get_gateway
+from lib.profile_digest import ensure_profile_digest, USE_PROFILE_DIGEST
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -59,6 +62,19 @@ class handler(BaseHTTPRequestHandler):
                 'total_interviews': 0
             }
             
+            # Queue depth / wait times for this container's LLM scheduler
+            if os.getenv('ANTHROPIC_API_KEY'):
+                response['llm_gateway'] = get_gateway().get_stats()
+            
+            # Supabase reads served from the short-TTL cache or shared with a concurrent identical read
+            from lib.supabase import SupabaseClient
+            response['supabase_reads'] = SupabaseClient.read_cache_stats()
+            response['supabase_circuits'] = SupabaseClient.circuit_stats()
+            try:
+                response['catalog_replica'] = SupabaseClient().catalog_replica_stats()
+            except Exception as e:
+                print(f"DEBUG: Catalog replica status unavailable: {e}")
+            
             self.wfile.write(json.dumps(response).encode('utf-8'))
             
         except Exception as e:
@@ -67,10 +83,15 @@ class handler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
     def do_POST(self):
+        with request_trace("api/chat POST"):
+            self._handle_post()
+    
+    def _handle_post(self):
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             data = json.loads(post_data.decode('utf-8'))
+            tag(operation='message', profile_id=data.get('profile_id'))
             
             # Get API key from environment
             api_key = os.getenv('ANTHROPIC_API_KEY')
@@ -95,8 +116,14 @@ class handler(BaseHTTPRequestHandler):
                 
                 print(f"DEBUG: Loaded profile data for {profile_id}")
                 
+                # Compact digest built once per profile version, instead of the full JSON with source metadata
+                if USE_PROFILE_DIGEST:
+                    profile_text = ensure_profile_digest(supabase, profile_data)['text']
+                else:
+                    profile_text = json.dumps(profile_data.get('profile_data', {}), indent=2)
+                
                 # Generate digital twin response based on profile
-                response_text = self._generate_digital_twin_response(profile_data, message, api_key)
+                response_text = self._generate_digital_twin_response(profile_data, profile_text, message, api_key)
                 
                 response = {
                     'response': response_text,
@@ -180,21 +207,18 @@ class handler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
     
-    def _generate_digital_twin_response(self, profile_data, message, api_key):
+    def _generate_digital_twin_response(self, profile_data, profile_text, message, api_key):
         """Generate a digital twin response based on the person's profile data"""
-        import anthropic
-        
-        client = anthropic.Anthropic(api_key=api_key)
+        llm = get_gateway(api_key)
         
         # Extract profile information
-        profile_json = profile_data.get('profile_data', {})
         person_name = profile_data.get('person_name', 'User')
         
         # Create system prompt with personality profile
         system_prompt = f"""You are {person_name}'s digital twin, an AI representation of their personality based on their actual interview responses and extracted psychological profile.
 
 PERSONALITY PROFILE:
-{json.dumps(profile_json, indent=2)}
+{profile_text}
 
 INSTRUCTIONS:
 - Respond as {person_name} would, using first person ("I", "my", "me")
@@ -207,9 +231,8 @@ INSTRUCTIONS:
 Remember: You ARE {person_name}, not an AI assistant describing them."""
 
         try:
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=300,
+            response = llm.create(
+                "twin_chat",
                 temperature=0.7,
                 system=system_prompt,
                 messages=[{
@@ -2,14 +2,53 @@ from http.server import BaseHTTPRequestHandler
 import json
 import sys
 import os
+import threading
 from urllib.parse import urlparse, parse_qs
 
 # Add the lib directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from lib.ai_interviewer import AIInterviewer
+from lib.tracing import request_trace, tag, wrap_context
+from lib.llm_gateway import get_gateway
+from lib.prediction_dependencies import changed_fields, queue_refresh, run_refresh_job, REPREDICT_ON_UPDATE
+from lib.profile_extractor import merge_profile_data, merge_completeness_metadata
+from lib.profile_digest import ensure_profile_digest
+from lib.idempotency import IdempotencyCache, request_key
+from lib.turn_journal import TurnJournal, WRITE_BEHIND
+from lib.supabase import SupabaseClient
+from lib.questionnaire_compiler import (ensure_compiled, interviewer_context, compiled_artifacts, extraction_schema,
+                                        DEFAULT_TARGET_QUESTIONS)
+
+# Results of recent interview turns, so a retried continue request doesn't call Claude or append messages twice
+_interview_turns = IdempotencyCache(persist_dir='/tmp/pai_interview_turns')
+
+# Write-behind mode: turns are journaled locally and saved to Supabase in the background.
+# Created at import so turns left unsaved by a previous run of this container are replayed.
+_turn_journal = TurnJournal(SupabaseClient) if WRITE_BEHIND else None
 
 class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """?action=status - write-behind journal depth and flush lag for this container"""
+        query_params = parse_qs(urlparse(self.path).query)
+        if query_params.get('action', [''])[0] != 'status':
+            self.send_response(404)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'error': 'Not found'}).encode('utf-8'))
+            return
+        
+        response = {
+            'write_behind': WRITE_BEHIND,
+            'turn_journal': _turn_journal.stats() if _turn_journal else None,
+            'idempotent_turns': _interview_turns.stats
+        }
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(response).encode('utf-8'))
+    
     def do_POST(self):
         try:
             content_length = int(self.headers['Content-Length'])
@@ -23,11 +62,16 @@ class handler(BaseHTTPRequestHandler):
             # Determine operation: start, continue, or complete
             operation = query_params.get('action', ['start'])[0]
             if 'complete' in self.path or operation == 'complete':
-                return self._handle_complete_interview(data)
+                operation, handle = 'complete', self._handle_complete_interview
             elif data.get('message'):  # If there's a message, this is a continuation
-                return self._handle_continue_interview(data)
+                operation, handle = 'continue', self._handle_continue_interview
             else:
-                return self._handle_start_interview(data)
+                operation, handle = 'start', self._handle_start_interview
+            
+            with request_trace(f"api/interview {operation}", operation=operation,
+                               session_id=data.get('session_id'),
+                               questionnaire_id=data.get('questionnaire_id')):
+                return handle(data)
                 
         except Exception as e:
             self.send_response(500)
@@ -73,18 +117,12 @@ class handler(BaseHTTPRequestHandler):
                     print(f"DEBUG: START - Loaded {len(questions)} questions")
                     
                     if questions:
-                        # Calculate target interview length (number of questions + 3 additional questions)
-                        target_questions = len(questions) + 3
-                        print(f"DEBUG: Target interview questions: {target_questions} (base questions: {len(questions)} + 3 additional)")
-                        
-                        # Prepare questionnaire context for AI interviewer
-                        questionnaire_context = {
-                            'title': title,
-                            'category': category,
-                            'description': description,
-                            'questions': questions,
-                            'target_questions': max(3, min(len(questions) + 2, 8))
-                        }
+                        # Prepare questionnaire context for AI interviewer from the precompiled artifacts
+                        compiled = ensure_compiled(supabase, questionnaire)
+                        questionnaire_context = dict(interviewer_context(questionnaire), compiled=compiled,
+                                                     target_questions=compiled['target_questions'])
+                        print(f"DEBUG: Target interview questions: {compiled['target_questions']} "
+                              f"(questionnaire version {compiled['source_hash']})")
                         
                         # Let the AI generate a natural conversational greeting
                         # that introduces the topic and asks the first question naturally
@@ -109,6 +147,7 @@ class handler(BaseHTTPRequestHandler):
         
         # Start interview
         session = interviewer.start_interview(participant_name)
+        tag(session_id=session.session_id)
         
         # Save session and questionnaire context for send-message.py to use
         import pickle
@@ -160,14 +199,8 @@ class handler(BaseHTTPRequestHandler):
                 supabase = SupabaseClient()
                 
                 # Ensure person exists BEFORE creating interview session
-                print(f"DEBUG: Checking if person exists: '{participant_name}'")
-                person = supabase.get_person(participant_name)
-                if not person:
-                    print(f"DEBUG: Person '{participant_name}' not found, creating...")
-                    supabase.create_person(participant_name)
-                    print(f"DEBUG: Successfully created person: '{participant_name}'")
-                else:
-                    print(f"DEBUG: Person '{participant_name}' already exists")
+                supabase.upsert_person(participant_name)
+                print(f"DEBUG: Ensured person exists: '{participant_name}'")
                 
                 # Create interview session record with initial AI message
                 interview_session_data = {
@@ -189,9 +222,7 @@ class handler(BaseHTTPRequestHandler):
                 print(f"DEBUG: Error storing initial interview data: {e}")
         
         # Get target questions from questionnaire context
-        target_questions = 8  # Default reduced for better UX
-        if questionnaire_context and 'target_questions' in questionnaire_context:
-            target_questions = questionnaire_context['target_questions']
+        target_questions = self._target_questions(questionnaire_context)
         
         response = {
             'session_id': session.session_id,
@@ -216,7 +247,29 @@ class handler(BaseHTTPRequestHandler):
         self.wfile.write(json.dumps(response).encode('utf-8'))
     
     def _handle_continue_interview(self, data):
-        """Handle continuing an interview conversation"""
+        """Handle continuing an interview conversation, at most once per turn"""
+        # Retries of a turn (same Idempotency-Key, or same session/exchange/message when the
+        # client sends none) share the first request's result instead of calling Claude again
+        idempotency_key = self.headers.get('Idempotency-Key') or data.get('idempotency_key')
+        key = request_key('interview_turn', data.get('session_id'),
+                          idempotency_key or [data.get('exchange_count', 0), data.get('message', '')])
+        response, replayed = _interview_turns.run(key, lambda: self._continue_interview(data))
+        if replayed:
+            print(f"DEBUG: Replaying stored response for session {data.get('session_id')} turn {data.get('exchange_count', 0)}")
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Idempotency-Key')
+        if replayed:
+            self.send_header('Idempotent-Replayed', 'true')
+        self.end_headers()
+        
+        self.wfile.write(json.dumps(response).encode('utf-8'))
+    
+    def _continue_interview(self, data):
+        """Run one interview turn and return the response body"""
         # Get API key from environment
         api_key = os.getenv('ANTHROPIC_API_KEY')
         if not api_key:
@@ -230,12 +283,17 @@ class handler(BaseHTTPRequestHandler):
         
         print(f"DEBUG: Continuing interview - Session: {session_id}, Message: {message}")
         
+        try:
+            from lib.supabase import SupabaseClient
+            supabase = SupabaseClient()
+        except Exception as e:
+            print(f"DEBUG: Supabase unavailable, turn won't be stored: {e}")
+            supabase = None
+        
         # Load questionnaire context
         questionnaire_context = None
         try:
             if questionnaire_id != 'default':
-                from lib.supabase import SupabaseClient
-                supabase = SupabaseClient()
                 questionnaire = supabase.get_custom_questionnaire(questionnaire_id)
                 
                 print(f"DEBUG: Retrieved questionnaire for ID '{questionnaire_id}': {questionnaire}")
@@ -247,14 +305,9 @@ class handler(BaseHTTPRequestHandler):
                     if questions:
                         print(f"DEBUG: First question: {questions[0]}")
                     
-                    questionnaire_context = {
-                        'questionnaire_id': questionnaire_id,
-                        'title': questionnaire.get('title', 'Custom Questionnaire'),
-                        'category': questionnaire.get('category', 'general'),
-                        'description': questionnaire.get('description', ''),
-                        'questions': questions,
-                        'target_questions': max(3, min(len(questions) + 2, 8))
-                    }
+                    compiled = ensure_compiled(supabase, questionnaire)
+                    questionnaire_context = dict(interviewer_context(questionnaire), questionnaire_id=questionnaire_id,
+                                                 compiled=compiled, target_questions=compiled['target_questions'])
                     print(f"DEBUG: Loaded questionnaire context for category '{questionnaire_context['category']}' with {len(questions)} questions")
                 else:
                     print(f"DEBUG: No questionnaire found for ID '{questionnaire_id}'")
@@ -262,6 +315,20 @@ class handler(BaseHTTPRequestHandler):
             print(f"DEBUG: Error loading questionnaire context: {e}")
             questionnaire_context = None
         
+        # Without write-behind the session row is read once: to spot a retry that reached another
+        # container (the turn is already in the stored transcript) and to append this turn to
+        current_session, session_loaded = None, False
+        if not _turn_journal and supabase is not None and session_id:
+            try:
+                current_session = supabase.get_interview_session(session_id)
+                session_loaded = True
+            except Exception as e:
+                print(f"DEBUG: Could not load session {session_id} before the turn: {e}")
+        stored_turn = self._stored_turn(session_id, exchange_count, message, questionnaire_context, current_session)
+        if stored_turn:
+            print(f"DEBUG: Turn {exchange_count} of session {session_id} already recorded, not calling Claude again")
+            return stored_turn
+        
         # Use conversational AI interviewer for natural dialogue
         if True:  # Enable conversational AI interviewer
             # Load or create interview session from pickle file
@@ -320,6 +387,26 @@ class handler(BaseHTTPRequestHandler):
             new_exchange_count = exchange_count
             is_complete = new_exchange_count >= 8
         
+        if _turn_journal and session_id:
+            # Reply now; the journal's flusher saves the turn to interview_sessions in the background
+            from datetime import datetime
+            timestamp = datetime.now().isoformat()
+            _turn_journal.append(session_id, [
+                {'id': f"user_{exchange_count}", 'type': 'user', 'content': message, 'timestamp': timestamp},
+                {'id': f"ai_{exchange_count}", 'type': 'ai', 'content': ai_response, 'timestamp': timestamp}
+            ], {
+                'exchange_count': new_exchange_count,
+                'is_complete': is_complete,
+                'completed_at': timestamp if is_complete else None
+            })
+            return {
+                'session_id': session_id,
+                'ai_response': ai_response,
+                'exchange_count': new_exchange_count,
+                'is_complete': is_complete,
+                'target_questions': self._target_questions(questionnaire_context)
+            }
+        
         # Store the conversation messages in Supabase
         try:
             from datetime import datetime
@@ -337,9 +424,9 @@ class handler(BaseHTTPRequestHandler):
             
             # Update interview session with new messages and transcript
             try:
-                # Get all messages for this session to build complete transcript
-                # Get current session and build updated messages
-                current_session = supabase.get_interview_session(session_id)
+                # Build updated messages on the session row read before the turn (again if that read failed)
+                if not session_loaded:
+                    current_session = supabase.get_interview_session(session_id)
                 existing_messages = current_session.get('messages', []) if current_session else []
                 
                 # Add new messages
@@ -376,10 +463,7 @@ class handler(BaseHTTPRequestHandler):
                         is_complete = new_exchange_count >= 8
                         
                 # Set target_questions for response consistency
-                if questionnaire_context and 'questions' in questionnaire_context:
-                    target_questions = len(questionnaire_context['questions'])
-                else:
-                    target_questions = 8
+                target_questions = self._target_questions(questionnaire_context)
                 
                 print(f"DEBUG: Completion check - exchange_count: {exchange_count}, new_exchange_count: {new_exchange_count}, target_questions: {target_questions}, is_complete: {is_complete}")
                 
@@ -419,23 +503,38 @@ class handler(BaseHTTPRequestHandler):
                 else:
                     is_complete = new_exchange_count >= 8
         
-        # Send response
-        response = {
+        return {
             'session_id': session_id,
             'ai_response': ai_response,
             'exchange_count': new_exchange_count,
             'is_complete': is_complete,
-            'target_questions': target_questions
+            'target_questions': self._target_questions(questionnaire_context)
         }
+    
+    def _stored_turn(self, session_id, exchange_count, message, questionnaire_context, current_session=None):
+        """Response for a turn whose user and AI messages are already on `current_session` (or journaled), else None"""
+        # Write-behind turns never wait on Supabase: a retry is caught by the journal or _interview_turns
+        journaled = _turn_journal.pending_turn(session_id, exchange_count) if _turn_journal else None
+        if journaled:
+            current_session = dict(journaled['updates'], messages=journaled['messages'])
+        messages = {msg.get('id'): msg for msg in (current_session or {}).get('messages') or []}
+        user_message = messages.get(f"user_{exchange_count}")
+        ai_message = messages.get(f"ai_{exchange_count}")
+        if not user_message or not ai_message or user_message.get('content') != message:
+            return None
         
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-        
-        self.wfile.write(json.dumps(response).encode('utf-8'))
+        return {
+            'session_id': session_id,
+            'ai_response': ai_message.get('content', ''),
+            'exchange_count': current_session.get('exchange_count', exchange_count),
+            'is_complete': current_session.get('is_complete', False),
+            'target_questions': self._target_questions(questionnaire_context)
+        }
+    
+    @staticmethod
+    def _target_questions(questionnaire_context):
+        """The questionnaire's precompiled interview length, as the start response reports it"""
+        return (questionnaire_context or {}).get('target_questions') or DEFAULT_TARGET_QUESTIONS
     
     def _handle_complete_interview(self, data):
         """Handle interview completion and profile extraction"""
@@ -455,9 +554,15 @@ class handler(BaseHTTPRequestHandler):
                 raise Exception('ANTHROPIC_API_KEY environment variable is required')
             
             # Get interview session data
-            from lib.supabase import SupabaseClient
+            from lib.supabase import SupabaseRpcUnavailable
             supabase = SupabaseClient()
             
+            if _turn_journal:
+                # Extraction reads the transcript from Supabase, so journaled turns must land first
+                _turn_journal.flush()
+                if _turn_journal.pending_for(session_id):
+                    raise Exception(f"Interview turns for session {session_id} are still being saved, please retry")
+            
             print(f"DEBUG: Looking for interview session with ID: {session_id}")
             interview_session = supabase.get_interview_session(session_id)
             
@@ -543,23 +648,11 @@ class handler(BaseHTTPRequestHandler):
             person_name = interview_session['person_name'].strip()  # Remove any trailing spaces
             print(f"DEBUG: Getting latest profile version for person: {person_name}")
             
-            # Ensure person exists in database before creating profile
-            try:
-                person = supabase.get_person(person_name)
-                if not person:
-                    print(f"DEBUG: Person {person_name} not found, creating...")
-                    supabase.create_person(person_name)
-                    print(f"DEBUG: Created person: {person_name}")
-            except Exception as e:
-                print(f"DEBUG: Error ensuring person exists: {e}")
-            
-            # Generate a unique profile ID using timestamp to avoid conflicts
-            from datetime import datetime
-            import uuid
-            
             # Check if we should add to existing profile or create new one
             existing_profile_id = data.get('existing_profile_id')
             profile_action = data.get('profile_action', 'new')
+            existing_profile = None
+            next_version = None  # set when a new version is created rather than merged into
             
             if profile_action == 'existing' and existing_profile_id:
                 # Adding to existing profile - use the provided profile ID
@@ -567,11 +660,11 @@ class handler(BaseHTTPRequestHandler):
                 print(f"DEBUG: Adding to existing profile: {profile_id}")
                 
                 # Verify the existing profile exists
-                existing_profile = supabase.get_profile_version(profile_id)
+                existing_profile = supabase.get_profile_version(profile_id, cached=False)
                 if not existing_profile:
                     print(f"ERROR: Existing profile {profile_id} not found, creating new one instead")
                     # Fall back to creating new profile
-                    latest_profile = supabase.get_latest_profile_version(person_name)
+                    latest_profile = supabase.get_latest_profile_version(person_name, cached=False)
                     print(f"DEBUG: Latest profile found: {latest_profile}")
                     next_version = (latest_profile['version_number'] + 1) if latest_profile else 1
                     profile_id = f"{person_name}_v{next_version}"
@@ -583,20 +676,15 @@ class handler(BaseHTTPRequestHandler):
                     print(f"DEBUG: Will extract NEW data from {len(sessions_for_extraction)} new session(s) only")
             else:
                 # Creating new profile
-                latest_profile = supabase.get_latest_profile_version(person_name)
+                latest_profile = supabase.get_latest_profile_version(person_name, cached=False)
                 print(f"DEBUG: Latest profile found: {latest_profile}")
                 next_version = (latest_profile['version_number'] + 1) if latest_profile else 1
                 
-                # Create a unique profile version ID
+                # Provisional ID for extraction; the commit below allocates the final one
                 profile_id = f"{person_name}_v{next_version}"
                 print(f"DEBUG: Creating new profile with ID: {profile_id}")
-                
-                # Double-check this profile_id doesn't exist
-                existing_check = supabase.get_profile_version(profile_id)
-                if existing_check:
-                    # If it somehow exists, add a UUID suffix
-                    profile_id = f"{person_name}_v{next_version}_{uuid.uuid4().hex[:8]}"
-                    print(f"DEBUG: Profile ID conflict detected, using UUID suffix: {profile_id}")
+            
+            tag(profile_id=profile_id)
             
             # Extract profile using AI with all collected sessions (already determined above)
             print(f"DEBUG: Extracting profile from {len(sessions_for_extraction)} session(s)")
@@ -613,126 +701,40 @@ class handler(BaseHTTPRequestHandler):
             print(f"DEBUG: Saving completeness_metadata: {completeness_metadata}")
             
             # Save or update profile based on action
+            predictions_refresh = None
+            merge_into = profile_id if profile_action == 'existing' and existing_profile_id and existing_profile else None
+            session_ids = [session['session_id'] for session in sessions_for_extraction]
             try:
-                if profile_action == 'existing' and existing_profile_id and existing_profile:
-                    # Update existing profile
-                    print(f"DEBUG: Updating existing profile {profile_id}")
-                    
-                    # Get existing profile data to merge with new data
-                    existing_data = existing_profile.get('profile_data', {})
-                    existing_completeness = existing_profile.get('completeness_metadata', {})
-                    
-                    print(f"DEBUG: Existing profile data structure: {list(existing_data.keys()) if existing_data else 'None'}")
-                    print(f"DEBUG: New profile data structure: {list(profile_data.keys()) if profile_data else 'None'}")
-                    
-                    # Merge profile data - preserve existing structure and add new sections
-                    merged_profile_data = existing_data.copy() if existing_data else {}
-                    
-                    # Check if we have new structured data vs old format
-                    if 'profile_data' in existing_data and isinstance(existing_data['profile_data'], dict):
-                        # Existing profile uses new structure
-                        print("DEBUG: Existing profile uses new structure, merging sections")
-                        if 'profile_data' in profile_data and isinstance(profile_data['profile_data'], dict):
-                            # Both use new structure - merge sections
-                            if 'profile_data' not in merged_profile_data:
-                                merged_profile_data['profile_data'] = {}
-                            
-                            # Merge each section
-                            for section_name, section_data in profile_data['profile_data'].items():
-                                if section_name in merged_profile_data['profile_data']:
-                                    # Merge fields within existing section
-                                    if isinstance(section_data, dict) and isinstance(merged_profile_data['profile_data'][section_name], dict):
-                                        merged_profile_data['profile_data'][section_name].update(section_data)
-                                    else:
-                                        merged_profile_data['profile_data'][section_name] = section_data
-                                else:
-                                    # Add new section
-                                    merged_profile_data['profile_data'][section_name] = section_data
-                        else:
-                            # New data is legacy format - don't merge, keep existing structure
-                            print("DEBUG: New data is legacy format, preserving existing structure")
-                    else:
-                        # Existing profile uses legacy format - use new extraction
-                        print("DEBUG: Existing profile uses legacy format, using new extraction")
-                        merged_profile_data = profile_data
-                    
-                    # Merge completeness metadata - preserve existing questionnaires and add new ones
-                    merged_completeness = existing_completeness.copy() if existing_completeness else {}
-                    if completeness_metadata:
-                        if isinstance(completeness_metadata, dict) and isinstance(merged_completeness, dict):
-                            # Deep merge completeness metadata arrays
-                            for key in ['centrepiece', 'categories', 'products']:
-                                if key in completeness_metadata:
-                                    new_value = completeness_metadata[key]
-                                    if key in merged_completeness:
-                                        existing_value = merged_completeness[key]
-                                        
-                                        if key == 'centrepiece':
-                                            # Centrepiece is a single object, replace if new one provided
-                                            if new_value is not None:
-                                                merged_completeness[key] = new_value
-                                        else:
-                                            # Categories and products are arrays - merge them
-                                            if isinstance(existing_value, list) and isinstance(new_value, list):
-                                                # Create a set of existing names to avoid duplicates
-                                                existing_names = {item.get('name') for item in existing_value if isinstance(item, dict)}
-                                                # Add new items that don't already exist
-                                                for new_item in new_value:
-                                                    if isinstance(new_item, dict) and new_item.get('name') not in existing_names:
-                                                        existing_value.append(new_item)
-                                                merged_completeness[key] = existing_value
-                                            else:
-                                                merged_completeness[key] = new_value
-                                    else:
-                                        # Key doesn't exist in merged, add it
-                                        merged_completeness[key] = new_value
-                        else:
-                            merged_completeness = completeness_metadata
-                    
-                    update_data = {
-                        'profile_data': merged_profile_data,
-                        'completeness_metadata': merged_completeness,
-                        'updated_at': 'NOW()'
-                    }
-                    
-                    updated_profile = supabase.update_profile_version(profile_id, update_data)
-                    print(f"DEBUG: Updated existing profile {profile_id}")
-                    created_profile = updated_profile
-                else:
-                    # Create new profile version
-                    print(f"DEBUG: Creating new profile {profile_id}")
-                    profile_version_data = {
-                        'profile_id': profile_id,
-                        'person_name': person_name,
-                        'version_number': next_version if 'next_version' in locals() else 1,
-                        'profile_data': profile_data,
-                        'completeness_metadata': completeness_metadata,
-                        'is_active': True,
-                        'created_at': 'NOW()',
-                        'updated_at': 'NOW()'
-                    }
-                    
-                    created_profile = supabase.create_profile_version(profile_version_data)
-                    print(f"DEBUG: Created profile version {profile_id}")
-                
-                # Link all sessions to this profile_id for full traceability
-                for session in sessions_for_extraction:
-                    try:
-                        supabase.update_interview_session(session['session_id'], {'profile_id': profile_id})
-                        print(f"DEBUG: Linked session {session['session_id']} to profile {profile_id}")
-                    except Exception as e:
-                        print(f"DEBUG: Error linking session {session['session_id']}: {e}")
-                
-            except Exception as e:
-                print(f"DEBUG: Error creating or linking profile: {e}")
-                # If session update fails, we should delete the created profile to avoid orphans
-                try:
-                    if 'created_profile' in locals():
-                        print(f"DEBUG: Attempting to clean up orphaned profile {profile_id}")
-                        # Note: We'd need a delete method for this, but for now just log the issue
-                except:
-                    pass
-                raise e
+                # Person, version allocation, insert or merge and session links in one transaction
+                commit = supabase.complete_interview_profile(
+                    person_name, profile_id, 'existing' if merge_into else 'new',
+                    profile_data, completeness_metadata, session_ids
+                )
+            except SupabaseRpcUnavailable as e:
+                print(f"DEBUG: {e}, committing profile with separate requests")
+                commit = self._commit_profile_sequentially(
+                    supabase, person_name, profile_id, next_version,
+                    existing_profile if merge_into else None,
+                    profile_data, completeness_metadata, session_ids
+                )
+            
+            profile_id = commit['profile_id']
+            saved_profile_data = commit['profile_data']
+            tag(profile_id=profile_id)
+            print(f"DEBUG: Profile {profile_id} {commit['action']}, "
+                  f"{commit['sessions_linked']}/{len(session_ids)} session(s) linked")
+            
+            # Build the chat/prediction prompt digest now rather than on the first chat message
+            ensure_profile_digest(supabase, {'profile_id': profile_id, 'profile_data': saved_profile_data})
+            
+            refresh_job = None
+            if commit['action'] == 'merged' and REPREDICT_ON_UPDATE:
+                # Only stored predictions that rely on a changed field are re-run - after the response, not in it
+                changed = changed_fields(commit['previous_profile_data'], saved_profile_data)
+                if changed:
+                    refresh_job = queue_refresh(supabase, profile_id, changed)
+                    predictions_refresh = {'status': 'queued', 'job_id': refresh_job.get('id'),
+                                           'changed_fields': sorted(changed)}
             
             # Calculate total exchanges from all sessions used in profile creation
             total_exchanges = sum(session.get('exchange_count', 0) for session in sessions_for_extraction)
@@ -742,11 +744,13 @@ class handler(BaseHTTPRequestHandler):
                 'status': 'success',
                 'message': 'Interview completed successfully. Profile has been extracted.',
                 'profile_id': profile_id,
-                'profile_data': profile_data,
+                'profile_data': saved_profile_data,
                 'questionnaire_id': interview_session.get('questionnaire_id', 'unknown'),
                 'person_name': person_name,
                 'total_exchanges': total_exchanges
             }
+            if predictions_refresh:
+                response['predictions_refresh'] = predictions_refresh
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -754,6 +758,12 @@ class handler(BaseHTTPRequestHandler):
             self.end_headers()
             
             self.wfile.write(json.dumps(response).encode('utf-8'))
+            self.wfile.flush()
+            
+            if refresh_job:
+                # Best effort here; scripts/run_prediction_refresh_jobs.py picks up whatever doesn't finish
+                threading.Thread(target=wrap_context(self._run_refresh_job), args=(api_key, refresh_job),
+                                 name="pai-prediction-refresh", daemon=True).start()
             
         except Exception as e:
             print(f"DEBUG: Error in interview completion: {e}")
@@ -764,6 +774,69 @@ class handler(BaseHTTPRequestHandler):
             error_response = {'error': str(e)}
             self.wfile.write(json.dumps(error_response).encode('utf-8'))
     
+    @staticmethod
+    def _run_refresh_job(api_key, job):
+        try:
+            run_refresh_job(api_key, SupabaseClient(), job)
+        except Exception as e:
+            print(f"DEBUG: Background prediction refresh for {job.get('profile_id')} failed: {e}")
+    
+    def _commit_profile_sequentially(self, supabase, person_name, profile_id, version_number, existing_profile,
+                                     profile_data, completeness_metadata, session_ids):
+        """Commit path for databases without the complete_interview_profile RPC: the same steps, one request each"""
+        try:
+            supabase.upsert_person(person_name)
+        except Exception as e:
+            print(f"DEBUG: Error ensuring person exists: {e}")
+        
+        if existing_profile:
+            previous_profile_data = existing_profile.get('profile_data', {})
+            saved_profile_data = merge_profile_data(previous_profile_data, profile_data)
+            supabase.update_profile_version(profile_id, {
+                'profile_data': saved_profile_data,
+                'completeness_metadata': merge_completeness_metadata(
+                    existing_profile.get('completeness_metadata', {}), completeness_metadata),
+                'updated_at': 'NOW()'
+            })
+            version_number = existing_profile.get('version_number', version_number)
+            action = 'merged'
+        else:
+            if supabase.get_profile_version(profile_id, cached=False):
+                import uuid
+                profile_id = f"{person_name}_v{version_number}_{uuid.uuid4().hex[:8]}"
+                print(f"DEBUG: Profile ID conflict detected, using UUID suffix: {profile_id}")
+            previous_profile_data = None
+            saved_profile_data = profile_data
+            supabase.create_profile_version({
+                'profile_id': profile_id,
+                'person_name': person_name,
+                'version_number': version_number,
+                'profile_data': profile_data,
+                'completeness_metadata': completeness_metadata,
+                'is_active': True,
+                'created_at': 'NOW()',
+                'updated_at': 'NOW()'
+            })
+            action = 'created'
+        
+        # Link all sessions to this profile_id for full traceability
+        sessions_linked = 0
+        for session_id in session_ids:
+            try:
+                supabase.update_interview_session(session_id, {'profile_id': profile_id})
+                sessions_linked += 1
+            except Exception as e:
+                print(f"DEBUG: Error linking session {session_id}: {e}")
+        
+        return {
+            'profile_id': profile_id,
+            'version_number': version_number,
+            'action': action,
+            'profile_data': saved_profile_data,
+            'previous_profile_data': previous_profile_data,
+            'sessions_linked': sessions_linked
+        }
+    
     def _get_session_from_url(self):
         """Extract session_id from URL query params"""
         try:
@@ -782,42 +855,17 @@ class handler(BaseHTTPRequestHandler):
         }
         
         for q_id, q_data in questionnaires_data.items():
-            questions = q_data.get('questions', [])
-            for question in questions:
-                tags = question.get('tags')
-                if tags:
-                    # Handle both flat format ['category', 'subcategory'] and nested format [['category', 'subcategory']]
-                    if len(tags) == 2 and isinstance(tags[0], str):
-                        # Flat format: ['lifestyle', 'daily_life_work']
-                        category, sub_category = tags
-                    elif len(tags) == 1 and isinstance(tags[0], list) and len(tags[0]) == 2:
-                        # Nested format: [['facial_moisturizer_attitudes', 'benefits_sought']]
-                        category, sub_category = tags[0]
-                    else:
-                        # Unsupported format, skip
-                        print(f"DEBUG: Skipping question {question.get('id', 'unknown')} with unsupported tag format: {tags}")
-                        continue
-                    
-                    if category not in schema["profile_data"]:
-                        schema["profile_data"][category] = {}
-                    
-                    # Add a placeholder for the AI to fill
-                    schema["profile_data"][category][sub_category] = {
-                        "value": f"extracted {sub_category.replace('_', ' ')}",
-                        "source": {
-                            "questionnaire_id": q_id,
-                            "question_id": question.get('id', 'unknown'),
-                            "session_id": "session_id_placeholder"
-                        }
-                    }
+            # Precompiled per questionnaire version; older rows are compiled here until the next compile run
+            compiled = compiled_artifacts(q_data)
+            sections = compiled['extraction_schema'] if compiled else extraction_schema(q_id, q_data.get('questions', []))
+            for category, fields in sections.items():
+                schema["profile_data"].setdefault(category, {}).update(fields)
         
         return schema
 
     def _extract_profile_from_interview(self, all_sessions, api_key, profile_id, questionnaires_completed, questionnaires_data):
         """Use AI to extract personality profile from interview transcript with metadata tracking"""
-        import anthropic
-        
-        client = anthropic.Anthropic(api_key=api_key)
+        llm = get_gateway(api_key)
         
         # Build combined transcript and collect session metadata
         combined_transcript = ""
@@ -874,9 +922,8 @@ STRICT REQUIREMENTS:
 BASE ALL EXTRACTIONS ON EVIDENCE FROM THE INTERVIEW TRANSCRIPT. Extract rich, detailed personality insights, not just surface-level categories."""
         
         try:
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=8000,
+            response = llm.create(
+                "structured_profile_extraction",
                 temperature=0.3,
                 system=system_prompt,
                 messages=[{
@@ -947,6 +994,6 @@ BASE ALL EXTRACTIONS ON EVIDENCE FROM THE INTERVIEW TRANSCRIPT. Extract rich, de
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Idempotency-Key')
         self.end_headers()
\ No newline at end of file
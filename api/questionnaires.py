@@ -6,6 +6,7 @@ import sys
 # Add the lib directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from lib.supabase import SupabaseClient
+from lib.questionnaire_compiler import ensure_compiled
 
 class handler(BaseHTTPRequestHandler):
     def do_POST(self):
@@ -39,27 +40,16 @@ class handler(BaseHTTPRequestHandler):
             print(f"DEBUG: Questionnaire created: {questionnaire_result}")
             
             # Insert individual questions
-            questions_inserted = []
-            for question in data['questions']:
-                question_data = {
-                    'questionnaire_id': data['questionnaire_id'],
-                    'question_id': question['id'],
-                    'question_text': question['text'],
-                    'question_type': question['type'],
-                    'options': question.get('options'),
-                    'is_required': question.get('required', True),
-                    'question_order': question.get('question_order', 1),
-                    'help_text': question.get('helpText', '')
-                }
-                
-                question_result = supabase.add_questionnaire_question(question_data)
-                questions_inserted.append(question_result)
+            questions_inserted = self._insert_questions(supabase, data['questionnaire_id'], data['questions'])
+            
+            # Compile interviewer prompt, field coverage and extraction schema once for this version
+            artifacts = ensure_compiled(supabase, dict(questionnaire_data))
             
             # Send response
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type')
             self.end_headers()
             
@@ -68,6 +58,7 @@ class handler(BaseHTTPRequestHandler):
                 'questionnaire_id': data['questionnaire_id'],
                 'questionnaire': questionnaire_result,
                 'questions_count': len(questions_inserted),
+                'questionnaire_version': artifacts['source_hash'],
                 'message': 'Questionnaire created successfully'
             }
             
@@ -82,6 +73,87 @@ class handler(BaseHTTPRequestHandler):
             error_response = {'error': str(e), 'success': False}
             self.wfile.write(json.dumps(error_response).encode('utf-8'))
     
+    def do_PUT(self):
+        """Update a questionnaire; its compiled artifacts are rebuilt for the new version"""
+        try:
+            content_length = int(self.headers['Content-Length'])
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            questionnaire_id = data['questionnaire_id']
+            
+            print(f"DEBUG: Updating questionnaire {questionnaire_id} with data: {data}")
+            
+            supabase = SupabaseClient()
+            
+            updatable = ('title', 'description', 'questionnaire_type', 'category', 'questions',
+                         'estimated_duration', 'is_public', 'is_active')
+            updates = {key: data[key] for key in updatable if key in data}
+            if not updates:
+                raise ValueError('No questionnaire fields to update')
+            
+            result = supabase.update_custom_questionnaire(questionnaire_id, updates)
+            questionnaire = result[0] if isinstance(result, list) and result else None
+            if not questionnaire:
+                self.send_response(404)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                self.wfile.write(json.dumps({'error': f'Questionnaire {questionnaire_id} not found',
+                                             'success': False}).encode('utf-8'))
+                return
+            
+            questions_count = None
+            if 'questions' in updates:
+                # Replace the per-question rows to match the new question list
+                supabase.delete_questionnaire_questions(questionnaire_id)
+                questions_count = len(self._insert_questions(supabase, questionnaire_id, updates['questions']))
+            
+            artifacts = ensure_compiled(supabase, questionnaire)
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                'questionnaire_id': questionnaire_id,
+                'questionnaire': questionnaire,
+                'questions_count': questions_count if questions_count is not None else len(questionnaire.get('questions') or []),
+                'questionnaire_version': artifacts['source_hash'],
+                'message': 'Questionnaire updated successfully'
+            }
+            
+            self.wfile.write(json.dumps(response).encode('utf-8'))
+            
+        except Exception as e:
+            print(f"Error updating questionnaire: {str(e)}")
+            self.send_response(500)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            error_response = {'error': str(e), 'success': False}
+            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+    
+    def _insert_questions(self, supabase, questionnaire_id, questions):
+        questions_inserted = []
+        for question in questions:
+            question_data = {
+                'questionnaire_id': questionnaire_id,
+                'question_id': question['id'],
+                'question_text': question['text'],
+                'question_type': question['type'],
+                'options': question.get('options'),
+                'is_required': question.get('required', True),
+                'question_order': question.get('question_order', 1),
+                'help_text': question.get('helpText', '')
+            }
+            
+            question_result = supabase.add_questionnaire_question(question_data)
+            questions_inserted.append(question_result)
+        return questions_inserted
+    
     def do_GET(self):
         try:
             # Parse query parameters
@@ -103,7 +175,7 @@ class handler(BaseHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type')
             self.end_headers()
             
@@ -127,6 +199,6 @@ class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
\ No newline at end of file
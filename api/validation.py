@@ -3,59 +3,116 @@ import json
 import sys
 import os
 import time
+import hashlib
+from collections import OrderedDict
 
 # Add the lib directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from lib.response_predictor import ResponsePredictor, SurveyQuestion
-from lib.profile_extractor import ProfileExtractor, PaiProfile
+from lib.profile_extractor import ProfileExtractor, PaiProfile, convert_structured_profile_to_legacy
+from lib.profile_digest import ensure_profile_digest
+from lib.prediction_prefetch import PredictionPrefetcher
+from lib.tracing import request_trace, tag
+from lib.llm_gateway import call_config
+from lib.llm_scheduler import NEAR_REAL_TIME
+from lib.validation_tester import adaptive_validate, ADAPTIVE_TOLERANCE, ADAPTIVE_MIN_QUESTIONS, ADAPTIVE_TARGET_ACCURACY
 
-def _convert_structured_profile_to_legacy(structured_profile: dict) -> dict:
-    """Convert new structured profile format to legacy format expected by ResponsePredictor"""
+# Converted PaiProfile objects keyed by (profile_id, updated_at), so a whole
+# validation test converts the stored profile once per profile version.
+# Conversions are also persisted to /tmp so warm containers can reuse them.
+CONVERTED_PROFILE_DIR = '/tmp/pai_converted_profiles'
+MAX_CONVERTED_PROFILES = 64
+_converted_profiles = OrderedDict()
+_predictor = None
+
+# Predictions fired when a test begins, looked up per question on compare
+PREFETCH_DIR = '/tmp/pai_prefetched_predictions'
+PREFETCH_WAIT_SECONDS = 60
+_prefetcher = PredictionPrefetcher(max_workers=8, persist_dir=PREFETCH_DIR)
+
+def _get_predictor(api_key: str) -> ResponsePredictor:
+    """Reuse one ResponsePredictor (and its HTTP client) across requests"""
+    global _predictor
+    if _predictor is None:
+        _predictor = ResponsePredictor(api_key)
+    return _predictor
+
+def _converted_profile_path(profile_id: str, updated_at: str) -> str:
+    version_hash = hashlib.sha1(f"{profile_id}|{updated_at}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CONVERTED_PROFILE_DIR, f"{profile_id}_{version_hash}.json")
+
+def _remember_converted_profile(key, pai_profile: PaiProfile):
+    _converted_profiles[key] = pai_profile
+    _converted_profiles.move_to_end(key)
+    while len(_converted_profiles) > MAX_CONVERTED_PROFILES:
+        _converted_profiles.popitem(last=False)
+
+def get_converted_profile(supabase, profile_id: str) -> PaiProfile:
+    """Get the PaiProfile for a stored profile version, converting it at most once per version"""
+    stamp = supabase.get_profile_version_stamp(profile_id)
+    if not stamp:
+        raise Exception(f'Profile not found in database: {profile_id}')
+    
+    key = (profile_id, stamp.get('updated_at') or '')
+    if key in _converted_profiles:
+        _converted_profiles.move_to_end(key)
+        return _converted_profiles[key]
+    
+    persisted_path = _converted_profile_path(*key)
+    if os.path.exists(persisted_path):
+        try:
+            with open(persisted_path, 'r', encoding='utf-8') as f:
+                persisted = json.load(f)
+            pai_profile = PaiProfile(**persisted)
+            pai_profile._digest = persisted.get('profile_digest')
+            _remember_converted_profile(key, pai_profile)
+            print(f"DEBUG: Loaded persisted converted profile for {profile_id}")
+            return pai_profile
+        except Exception as e:
+            print(f"DEBUG: Ignoring unreadable converted profile {persisted_path}: {e}")
+    
+    profile_data = supabase.get_profile_version(profile_id)
+    if not profile_data:
+        raise Exception(f'Profile not found in database: {profile_id}')
+    
+    # Key by the version we actually fetched in case it changed since the stamp check
+    key = (profile_id, profile_data.get('updated_at') or key[1])
+    raw_profile_data = profile_data.get('profile_data', {})
+    
+    # Convert new structured profile to legacy format for ResponsePredictor
+    if 'profile_data' in raw_profile_data:
+        # New structure with metadata - extract just the values
+        profile = convert_structured_profile_to_legacy(raw_profile_data['profile_data'])
+    else:
+        # Legacy structure - use as-is
+        profile = raw_profile_data
+    
+    pai_profile = PaiProfile(**profile) if isinstance(profile, dict) else profile
+    pai_profile._digest = ensure_profile_digest(supabase, profile_data)['text']
+    _remember_converted_profile(key, pai_profile)
+    
     try:
-        legacy_profile = {
-            "pai_id": "converted_profile",
-            "demographics": {},
-            "core_attitudes": {},
-            "decision_psychology": {},
-            "usage_patterns": {},
-            "value_system": {},
-            "behavioral_quotes": [],
-            "prediction_weights": {}
-        }
-        
-        # Extract values from the structured format and map to legacy categories
-        for section_name, fields in structured_profile.items():
-            for field_name, field_data in fields.items():
-                if isinstance(field_data, dict) and 'value' in field_data:
-                    value = field_data['value']
-                    
-                    # Map sections to legacy categories based on content
-                    if section_name in ['lifestyle', 'media_and_culture']:
-                        legacy_profile['demographics'][f'{section_name}_{field_name}'] = value
-                    elif section_name in ['personality', 'values_and_beliefs']:
-                        legacy_profile['core_attitudes'][f'{section_name}_{field_name}'] = value
-                    elif section_name in ['routine', 'skin_and_hair_type']:
-                        legacy_profile['usage_patterns'][f'{section_name}_{field_name}'] = value
-                    else:
-                        # Default to decision_psychology for other sections
-                        legacy_profile['decision_psychology'][f'{section_name}_{field_name}'] = value
-        
-        return legacy_profile
-        
+        os.makedirs(CONVERTED_PROFILE_DIR, exist_ok=True)
+        with open(_converted_profile_path(*key), 'w', encoding='utf-8') as f:
+            json.dump(dict(pai_profile.dict(), profile_digest=pai_profile._digest), f)
     except Exception as e:
-        print(f"Error converting structured profile: {e}")
-        # Return minimal structure if conversion fails
-        return {
-            "pai_id": "conversion_error",
-            "demographics": {"error": str(e)},
-            "core_attitudes": {},
-            "decision_psychology": {},
-            "usage_patterns": {},
-            "value_system": {},
-            "behavioral_quotes": [],
-            "prediction_weights": {}
-        }
+        print(f"DEBUG: Could not persist converted profile for {profile_id}: {e}")
+    
+    return pai_profile
+
+def _build_survey_questions(survey_data: dict) -> dict:
+    """Convert database survey questions to SurveyQuestion objects keyed by question id"""
+    survey_questions = {}
+    for question_data in survey_data['questions']:
+        q_id = question_data.get('id')
+        survey_questions[q_id] = SurveyQuestion(
+            id=q_id,
+            category=question_data.get('category', 'General'),
+            question=question_data.get('question', ''),
+            options=question_data.get('options', [])
+        )
+    return survey_questions
 
 def get_validation_survey_data(survey_name: str = 'validation_survey_1'):
     """Load survey data from Supabase survey_templates table"""
@@ -212,6 +269,10 @@ def _get_fallback_survey_data():
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        with request_trace("api/validation GET"):
+            self._handle_get()
+    
+    def _handle_get(self):
         try:
             # Parse query parameters to determine operation
             from urllib.parse import urlparse, parse_qs
@@ -325,7 +386,7 @@ class handler(BaseHTTPRequestHandler):
                         'correct_answers': result['correct_responses'],
                         'timestamp': result.get('created_at', ''),
                         'digital_twin_version': result['profile_id'],
-                        'model_version': 'claude-3-5-sonnet-20241022',
+                        'model_version': (result.get('test_metadata') or {}).get('model_version') or call_config('prediction')['model'],
                         'comparisons': []
                     }
                     
@@ -372,7 +433,7 @@ class handler(BaseHTTPRequestHandler):
                         'filename': f"{result['survey_name']}_{result['profile_id']}.json",
                         'profile_id': result['profile_id'],
                         'digital_twin_version': result['profile_id'],
-                        'model_version': 'claude-3-5-sonnet-20241022',
+                        'model_version': (result.get('test_metadata') or {}).get('model_version') or call_config('prediction')['model'],
                         'accuracy_percentage': result['accuracy_score'],
                         'total_questions': result['total_questions'],
                         'correct_answers': result['correct_responses'],
@@ -401,6 +462,10 @@ class handler(BaseHTTPRequestHandler):
             self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
     
     def do_POST(self):
+        with request_trace("api/validation POST"):
+            self._handle_post()
+    
+    def _handle_post(self):
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
@@ -408,7 +473,20 @@ class handler(BaseHTTPRequestHandler):
             
             print(f"DEBUG: POST received with keys: {list(data.keys())}")
             
-            # Check if this is a single question validation or results saving
+            tag(
+                operation=data.get('action') or ('compare' if 'question_id' in data else 'save_results'),
+                profile_id=data.get('profile_id'),
+                test_session_id=data.get('test_session_id'),
+                question_id=data.get('question_id')
+            )
+            
+            # Check if this is a test start, single question validation or results saving
+            if data.get('action') == 'begin_test':
+                return self._handle_begin_test(data)
+            
+            if data.get('action') == 'adaptive_validate':
+                return self._handle_adaptive_validate(data)
+            
             if 'question_id' in data and 'human_answer' in data:
                 print("DEBUG: Taking single question validation path")
                 # Single question validation using real ResponsePredictor
@@ -417,6 +495,7 @@ class handler(BaseHTTPRequestHandler):
                 human_answer = data.get('human_answer')
                 profile_id = data.get('profile_id', 'rachita_v1')
                 survey_name = data.get('survey_name', 'validation_survey_1')
+                test_session_id = data.get('test_session_id')
                 
                 # Get API key from environment
                 api_key = os.getenv('ANTHROPIC_API_KEY')
@@ -424,56 +503,33 @@ class handler(BaseHTTPRequestHandler):
                     raise Exception('ANTHROPIC_API_KEY environment variable is required')
                 
                 try:
-                    # Load the profile from Supabase
-                    from lib.supabase import SupabaseClient
-                    supabase = SupabaseClient()
-                    
-                    profile_data = supabase.get_profile_version(profile_id)
-                    if not profile_data:
-                        raise Exception(f'Profile not found in database: {profile_id}')
-                    
-                    # Extract and convert the profile data
-                    raw_profile_data = profile_data.get('profile_data', {})
+                    prediction = None
+                    if test_session_id:
+                        # Prediction was started when the test began - usually already done
+                        prediction = _prefetcher.get(test_session_id, question_id, profile_id=profile_id,
+                                                     timeout=PREFETCH_WAIT_SECONDS)
+                        print(f"DEBUG: Prefetched prediction {'hit' if prediction else 'miss'} for {question_id}")
                     
-                    # Convert new structured profile to legacy format for ResponsePredictor
-                    if 'profile_data' in raw_profile_data:
-                        # New structure with metadata - extract just the values
-                        profile = _convert_structured_profile_to_legacy(raw_profile_data['profile_data'])
-                    else:
-                        # Legacy structure - use as-is
-                        profile = raw_profile_data
-                    
-                    # Load the survey questions dynamically from database
-                    survey_data = get_validation_survey_data(survey_name)
-                    survey_questions = {}
-                    
-                    # Convert database questions to SurveyQuestion objects
-                    for question_data in survey_data['questions']:
-                        q_id = question_data.get('id')
-                        q_text = question_data.get('question', '')
-                        q_options = question_data.get('options', [])
-                        q_category = question_data.get('category', 'General')
+                    if prediction is None:
+                        # Load the profile from Supabase
+                        from lib.supabase import SupabaseClient
+                        supabase = SupabaseClient()
                         
-                        survey_questions[q_id] = SurveyQuestion(
-                            id=q_id,
-                            category=q_category,
-                            question=q_text,
-                            options=q_options
-                        )
-                    
-                    if question_id not in survey_questions:
-                        raise Exception(f'Question not found: {question_id}')
-                    
-                    # Get prediction using ResponsePredictor
-                    predictor = ResponsePredictor(api_key)
-                    
-                    # Create a PaiProfile object from the converted data
-                    if isinstance(profile, dict):
-                        pai_profile = PaiProfile(**profile)
-                    else:
-                        pai_profile = profile
-                    
-                    prediction = predictor.predict_response(pai_profile, survey_questions[question_id])
+                        # Converted once per profile version and reused for the rest of the test
+                        pai_profile = get_converted_profile(supabase, profile_id)
+                        
+                        # Load the survey questions dynamically from database
+                        survey_questions = _build_survey_questions(get_validation_survey_data(survey_name))
+                        
+                        if question_id not in survey_questions:
+                            raise Exception(f'Question not found: {question_id}')
+                        
+                        # Get prediction using ResponsePredictor
+                        predictor = _get_predictor(api_key)
+                        
+                        # Someone is looking at the results page - ahead of prefetch/batch work
+                        prediction = predictor.predict_response(pai_profile, survey_questions[question_id],
+                                                                priority=NEAR_REAL_TIME)
                     
                     # Compare with human answer
                     is_match = human_answer.strip() == prediction.predicted_answer.strip()
@@ -508,7 +564,8 @@ class handler(BaseHTTPRequestHandler):
                 survey_name = data.get('survey_name', 'validation_survey_1')
                 total_questions = data.get('total_questions', 0)
                 correct_answers = data.get('correct_answers', 0)
-                model_version = data.get('model_version', 'claude-3-5-sonnet-20241022')
+                model_version = data.get('model_version') or call_config('prediction')['model']
+                stopping_rule = data.get('stopping_rule')
                 
                 print(f"DEBUG: Results saving payload - session_id: {test_session_id}, profile: {profile_id}")
                 print(f"DEBUG: Comparisons: {len(comparisons)}, accuracy: {accuracy_percentage}%")
@@ -536,9 +593,10 @@ class handler(BaseHTTPRequestHandler):
                         'profile_version': profile_id,
                         'test_counter': test_counter,
                         'llm_model': model_version,
-                        'test_type': 'digital_twin_validation',
+                        'test_type': 'adaptive_digital_twin_validation' if stopping_rule else 'digital_twin_validation',
                         'total_questions': total_questions,
-                        'questions_answered': len(comparisons)
+                        'questions_answered': len(comparisons),
+                        'stopping_rule': stopping_rule
                     },
                     'accuracy_metrics': {
                         'overall_accuracy': accuracy_percentage,
@@ -672,7 +730,7 @@ class handler(BaseHTTPRequestHandler):
                         'test_metadata': {
                             'model_version': model_version,
                             'survey_version': survey_data.get('version', 1),
-                            'test_type': 'digital_twin_validation'
+                            'test_type': 'adaptive_digital_twin_validation' if stopping_rule else 'digital_twin_validation'
                         }
                     }
                     print(f"DEBUG: About to save validation_test_results")
@@ -703,7 +761,7 @@ class handler(BaseHTTPRequestHandler):
                                 'improvement_trend': 'improving' if accuracy_percentage > existing_summary['average_accuracy'] else 'stable'
                             }
                             try:
-                                summary_result = supabase.update_test_history_summary(profile_id, summary_update)
+                                summary_result = supabase.upsert_test_history_summary(profile_id, summary_update)
                                 print(f"DEBUG: Successfully updated test_history_summary: {summary_result}")
                             except Exception as summary_error:
                                 print(f"ERROR: Failed to update test_history_summary: {summary_error}")
@@ -720,7 +778,7 @@ class handler(BaseHTTPRequestHandler):
                                 'improvement_trend': 'new'
                             }
                             try:
-                                new_summary_result = supabase._make_request('POST', 'test_history_summary', summary_data)
+                                new_summary_result = supabase.upsert_test_history_summary(profile_id, summary_data)
                                 print(f"DEBUG: Successfully created test_history_summary: {new_summary_result}")
                             except Exception as new_summary_error:
                                 print(f"ERROR: Failed to create test_history_summary: {new_summary_error}")
@@ -769,6 +827,124 @@ class handler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
     
+    def _handle_begin_test(self, data):
+        """Start predicting every survey question for a test session in the background"""
+        test_session_id = data.get('test_session_id')
+        profile_id = data.get('profile_id', 'rachita_v1')
+        survey_name = data.get('survey_name', 'validation_survey_1')
+        
+        try:
+            if not test_session_id:
+                raise Exception('test_session_id is required to begin a test')
+            
+            api_key = os.getenv('ANTHROPIC_API_KEY')
+            if not api_key:
+                raise Exception('ANTHROPIC_API_KEY environment variable is required')
+            
+            from lib.supabase import SupabaseClient
+            supabase = SupabaseClient()
+            
+            pai_profile = get_converted_profile(supabase, profile_id)
+            survey_questions = _build_survey_questions(get_validation_survey_data(survey_name))
+            
+            queued = _prefetcher.begin(
+                test_session_id,
+                profile_id,
+                _get_predictor(api_key),
+                pai_profile,
+                list(survey_questions.values())
+            )
+            
+            result = {
+                'status': 'started',
+                'test_session_id': test_session_id,
+                'predictions_queued': queued
+            }
+            
+        except Exception as e:
+            # Not fatal - compare falls back to on-demand predictions
+            print(f"DEBUG: Could not begin prediction prefetch: {e}")
+            result = {
+                'status': 'prefetch_unavailable',
+                'test_session_id': test_session_id,
+                'message': str(e)
+            }
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        
+        self.wfile.write(json.dumps(result).encode('utf-8'))
+    
+    def _handle_adaptive_validate(self, data):
+        """Validate a twin on just enough of the human's answers to estimate its accuracy"""
+        profile_id = data.get('profile_id', 'rachita_v1')
+        survey_name = data.get('survey_name', 'validation_survey_1')
+        responses = data.get('responses', {})
+        
+        try:
+            api_key = os.getenv('ANTHROPIC_API_KEY')
+            if not api_key:
+                raise Exception('ANTHROPIC_API_KEY environment variable is required')
+            if not responses:
+                raise Exception('responses (question_id -> human answer) are required')
+            
+            from lib.supabase import SupabaseClient
+            supabase = SupabaseClient()
+            
+            pai_profile = get_converted_profile(supabase, profile_id)
+            survey_questions = _build_survey_questions(get_validation_survey_data(survey_name))
+            
+            validation = adaptive_validate(
+                _get_predictor(api_key),
+                pai_profile,
+                list(survey_questions.values()),
+                responses,
+                tolerance=float(data.get('tolerance', ADAPTIVE_TOLERANCE)),
+                min_questions=int(data.get('min_questions', ADAPTIVE_MIN_QUESTIONS)),
+                target_accuracy=data.get('target_accuracy', ADAPTIVE_TARGET_ACCURACY),
+                priority=NEAR_REAL_TIME
+            )
+            
+            # Same shape as single-question compares, so the results can be saved as usual
+            comparisons = [{
+                'question_id': r['question_id'],
+                'human_answer': r['real_answer'],
+                'predicted_answer': r['predicted_answer'],
+                'is_match': r['is_correct'],
+                'confidence': r['confidence'],
+                'reasoning': r['reasoning']
+            } for r in validation.question_results]
+            
+            result = {
+                'profile_id': profile_id,
+                'survey_name': survey_name,
+                'comparisons': comparisons,
+                'total_questions': validation.total_questions,
+                'correct_answers': validation.correct_predictions,
+                'accuracy_percentage': round(validation.accuracy_rate * 100, 1),
+                'accuracy_interval': validation.accuracy_interval,
+                'stopping_rule': validation.stopping_rule
+            }
+            status = 200
+            
+        except Exception as e:
+            print(f"DEBUG: Adaptive validation failed: {e}")
+            result = {'error': str(e)}
+            status = 500
+        
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        
+        self.wfile.write(json.dumps(result).encode('utf-8'))
+    
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
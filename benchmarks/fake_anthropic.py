@@ -0,0 +1,264 @@
+"""
+Fake Anthropic Backend
+Local stand-in for the Messages API with configurable latency and token distributions
+"""
+
+import re
+import json
+import time
+import random
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any
+
+
+FILLER_WORDS = (
+    "that sounds really interesting tell me more about how you decide what goes into "
+    "your routine and what made you start thinking about it that way"
+).split()
+
+
+@dataclass
+class LatencyProfile:
+    """Shape of the simulated model latency and output size"""
+    first_token_ms: float = 300.0        # time before the first token
+    ms_per_output_token: float = 8.0     # decode time per output token
+    jitter: float = 0.25                 # lognormal sigma applied to the total
+    output_tokens_mean: int = 180        # free-text replies (interviewer, chat)
+    output_tokens_std: int = 60
+    overload_rate: float = 0.0           # fraction of calls answered with 529
+    seed: Optional[int] = 7
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used for the fake usage block (~4 chars per token)"""
+    return max(1, len(text) // 4)
+
+
+class FakeAnthropicBackend:
+    """Serves POST /v1/messages with canned, shape-correct responses.
+
+    The reply is picked from the prompt so every caller in the pipeline gets
+    something it can parse: predictions get prediction JSON, profile extraction
+    gets a profile, everything else gets free text of a sampled length.
+    """
+
+    def __init__(self, latency: Optional[LatencyProfile] = None, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency or LatencyProfile()
+        self._rng = random.Random(self.latency.seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+        backend = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                backend._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAnthropicBackend":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-anthropic", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats = {
+                "calls": 0,
+                "overloaded": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "calls_by_kind": {},
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return json.loads(json.dumps(self.stats))
+
+    # ------------------------------------------------------------------
+    # Request handling
+    # ------------------------------------------------------------------
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length)
+
+        if not request.path.startswith("/v1/messages"):
+            self._send(request, 404, {"type": "error", "error": {"type": "not_found_error", "message": request.path}}, len(body))
+            return
+
+        payload = json.loads(body.decode("utf-8"))
+
+        with self._rng_lock:
+            overloaded = self._rng.random() < self.latency.overload_rate
+        if overloaded:
+            with self._stats_lock:
+                self.stats["calls"] += 1
+                self.stats["overloaded"] += 1
+            self._send(request, 529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}, len(body))
+            return
+
+        kind, text = self._reply_for(payload)
+        input_tokens = estimate_tokens(payload.get("system", "") if isinstance(payload.get("system"), str) else json.dumps(payload.get("system", "")))
+        input_tokens += sum(estimate_tokens(self._content_text(m.get("content"))) for m in payload.get("messages", []))
+        output_tokens = estimate_tokens(text)
+
+        time.sleep(self._sample_delay(output_tokens))
+
+        response = {
+            "id": f"msg_bench_{int(time.time() * 1000000)}",
+            "type": "message",
+            "role": "assistant",
+            "model": payload.get("model", "claude-3-5-sonnet-20241022"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        }
+
+        with self._stats_lock:
+            self.stats["calls"] += 1
+            self.stats["input_tokens"] += input_tokens
+            self.stats["output_tokens"] += output_tokens
+            self.stats["calls_by_kind"][kind] = self.stats["calls_by_kind"].get(kind, 0) + 1
+
+        self._send(request, 200, response, len(body))
+
+    def _send(self, request: BaseHTTPRequestHandler, status: int, payload: Dict, bytes_in: int):
+        data = json.dumps(payload).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.send_header("request-id", "req_bench")
+        request.end_headers()
+        request.wfile.write(data)
+
+        with self._stats_lock:
+            self.stats["bytes_in"] += bytes_in
+            self.stats["bytes_out"] += len(data)
+
+    def _sample_delay(self, output_tokens: int) -> float:
+        with self._rng_lock:
+            noise = self._rng.lognormvariate(0, self.latency.jitter) if self.latency.jitter else 1.0
+        base_ms = self.latency.first_token_ms + self.latency.ms_per_output_token * output_tokens
+        return base_ms * noise / 1000.0
+
+    def _sample_output_tokens(self, max_tokens: int) -> int:
+        with self._rng_lock:
+            tokens = int(self._rng.gauss(self.latency.output_tokens_mean, self.latency.output_tokens_std))
+        return max(5, min(tokens, max_tokens))
+
+    @staticmethod
+    def _content_text(content: Any) -> str:
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        return ""
+
+    # ------------------------------------------------------------------
+    # Canned replies
+    # ------------------------------------------------------------------
+
+    def _reply_for(self, payload: Dict[str, Any]):
+        system = payload.get("system", "")
+        system = system if isinstance(system, str) else self._content_text(system)
+        prompt = "\n".join(self._content_text(m.get("content")) for m in payload.get("messages", []))
+
+        if "predicting how a specific person" in prompt:
+            return "prediction", json.dumps(self._prediction(prompt))
+        if "Extract a structured Pai profile" in prompt:
+            return "legacy_profile", json.dumps(self._legacy_profile())
+        if "digital twin creator" in system:
+            return "structured_profile", json.dumps(self._structured_profile(system))
+
+        tokens = self._sample_output_tokens(payload.get("max_tokens", 1000))
+        return "text", self._filler(tokens)
+
+    def _filler(self, tokens: int) -> str:
+        # ~4 chars per token keeps estimate_tokens() honest
+        words = []
+        length = 0
+        i = 0
+        while length < tokens * 4:
+            word = FILLER_WORDS[i % len(FILLER_WORDS)]
+            words.append(word)
+            length += len(word) + 1
+            i += 1
+        return " ".join(words).capitalize() + "?"
+
+    def _prediction(self, prompt: str) -> Dict[str, Any]:
+        options_block = prompt.split("OPTIONS:", 1)[-1]
+        options = [line[2:].strip() for line in options_block.splitlines() if line.startswith("- ")]
+        with self._rng_lock:
+            answer = self._rng.choice(options) if options else "Unknown"
+            confidence = round(self._rng.uniform(0.5, 0.95), 2)
+        return {
+            "predicted_answer": answer,
+            "confidence": confidence,
+            "reasoning": "Benchmark prediction based on the profile's stated preferences.",
+            "uncertainty_flags": [],
+            "option_analysis": {option: "benchmark" for option in options}
+        }
+
+    @staticmethod
+    def _legacy_profile() -> Dict[str, Any]:
+        return {
+            "pai_id": "benchmark",
+            "demographics": {"age_range": "25-34", "lifestyle": "urban_professional", "context": "benchmark"},
+            "core_attitudes": {"aging_approach": "proactive_prevention", "beauty_philosophy": "scientific",
+                               "risk_tolerance": "moderate", "trust_orientation": "science_driven"},
+            "decision_psychology": {"research_style": "deep_researcher",
+                                    "influence_hierarchy": ["scientific_studies", "reviews"]},
+            "usage_patterns": {"routine_adherence": "rigid", "complexity_preference": "moderate"},
+            "value_system": {"price_sensitivity": "moderate"},
+            "behavioral_quotes": ["I read the ingredient list before anything else."],
+            "prediction_weights": {"science_driven": 0.8, "price_sensitivity": 0.4}
+        }
+
+    @staticmethod
+    def _structured_profile(system: str) -> Dict[str, Any]:
+        """Echo back the schema embedded in the extraction prompt with values filled in"""
+        match = re.search(r"fill in the values:\s*(\{.*\})\s*STRICT REQUIREMENTS", system, re.DOTALL)
+        if not match:
+            return {"profile_data": {}}
+        try:
+            schema = json.loads(match.group(1))
+        except json.JSONDecodeError:
+            return {"profile_data": {}}
+
+        for fields in schema.get("profile_data", {}).values():
+            if not isinstance(fields, dict):
+                continue
+            for field in fields.values():
+                if isinstance(field, dict) and "value" in field:
+                    field["value"] = "Benchmark insight drawn from the interview transcript."
+        return schema
+
+
+def create_backend(latency: Optional[LatencyProfile] = None) -> FakeAnthropicBackend:
+    """Start a fake Anthropic backend on an ephemeral local port"""
+    return FakeAnthropicBackend(latency).start()
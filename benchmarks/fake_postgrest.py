@@ -0,0 +1,287 @@
+"""
+Fake PostgREST Server
+In-memory stand-in for the Supabase REST API that counts round-trips and bytes
+"""
+
+import json
+import time
+import fnmatch
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import urlparse, parse_qsl, unquote
+
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    return str(value)
+
+
+def _compare(left: Any, right: str) -> Optional[int]:
+    """Order a row value against a filter literal, numerically when both sides allow it"""
+    if left is None:
+        return None
+    try:
+        a, b = float(left), float(right)
+    except (TypeError, ValueError):
+        a, b = _as_text(left), right
+    return (a > b) - (a < b)
+
+
+def _sort_key(value: Any) -> Tuple:
+    if value is None:
+        return (1, 0, 0.0, "")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, 0, float(value), "")
+    return (0, 1, 0.0, _as_text(value))
+
+
+def _like(value: Any, pattern: str, case_insensitive: bool) -> bool:
+    text = _as_text(value)
+    pattern = pattern.replace("%", "*")
+    if case_insensitive:
+        return fnmatch.fnmatchcase(text.lower(), pattern.lower())
+    return fnmatch.fnmatchcase(text, pattern)
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+
+    op, _, literal = expression.partition(".")
+    value = row.get(column)
+
+    if op == "eq":
+        result = _as_text(value) == literal
+    elif op == "neq":
+        result = _as_text(value) != literal
+    elif op in ("gt", "gte", "lt", "lte"):
+        order = _compare(value, literal)
+        result = order is not None and {
+            "gt": order > 0, "gte": order >= 0, "lt": order < 0, "lte": order <= 0
+        }[op]
+    elif op in ("like", "ilike"):
+        result = _like(value, literal, op == "ilike")
+    elif op == "in":
+        options = [o.strip().strip('"') for o in literal.strip("()").split(",")]
+        result = _as_text(value) in options
+    elif op == "is":
+        result = _as_text(value) == literal
+    else:
+        raise ValueError(f"Unsupported filter operator: {op}")
+
+    return not result if negate else result
+
+
+class FakePostgREST:
+    """Serves /rest/v1/{table} for GET/POST/PATCH/DELETE over in-memory tables.
+
+    Supports the subset of PostgREST the app uses: column filters (eq, neq, gt,
+    gte, lt, lte, like, ilike, in, is), select, order, limit, offset and
+    `Prefer: resolution=merge-duplicates` upserts with on_conflict. RPCs answer
+    404 PGRST202, as for a database where the function isn't installed.
+    """
+
+    def __init__(self, seed: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency_ms = latency_ms
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._next_id: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        for table, rows in (seed or {}).items():
+            for row in rows:
+                self._insert(table, dict(row))
+
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def do_PATCH(self):
+                server._handle(self, "PATCH")
+
+            def do_DELETE(self):
+                server._handle(self, "DELETE")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakePostgREST":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-postgrest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "errors": 0, "by_endpoint": {}}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self.stats))
+
+    # ------------------------------------------------------------------
+    # Table operations
+    # ------------------------------------------------------------------
+
+    def _insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        rows = self.tables.setdefault(table, [])
+        if "id" not in row:
+            self._next_id[table] = self._next_id.get(table, 0) + 1
+            row["id"] = self._next_id[table]
+        row.setdefault("created_at", _now())
+        row.setdefault("updated_at", row["created_at"])
+        rows.append(row)
+        return row
+
+    def _filtered(self, table: str, filters: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        return [row for row in self.tables.get(table, [])
+                if all(_matches(row, column, expression) for column, expression in filters)]
+
+    @staticmethod
+    def _shape(rows: List[Dict[str, Any]], params: Dict[str, str]) -> List[Dict[str, Any]]:
+        for clause in reversed([c for c in params.get("order", "").split(",") if c]):
+            parts = clause.split(".")
+            column, descending = parts[0], "desc" in parts[1:]
+            rows = sorted(rows, key=lambda r: _sort_key(r.get(column)), reverse=descending)
+
+        offset = int(params.get("offset", 0))
+        if "limit" in params:
+            rows = rows[offset:offset + int(params["limit"])]
+        elif offset:
+            rows = rows[offset:]
+
+        select = params.get("select", "*")
+        if select != "*":
+            columns = [c.strip() for c in select.split(",")]
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        return rows
+
+    def _execute(self, method: str, table: str, params: Dict[str, str], filters: List[Tuple[str, str]],
+                 body: Any, prefer: str) -> Tuple[int, Any]:
+        with self._lock:
+            if method == "GET":
+                return 200, self._shape(self._filtered(table, filters), params)
+
+            if method == "POST":
+                rows = body if isinstance(body, list) else [body]
+                conflict = [c for c in params.get("on_conflict", "").split(",") if c]
+                merge = "resolution=merge-duplicates" in prefer
+                written = []
+                for row in rows:
+                    existing = None
+                    if merge and conflict:
+                        existing = next((r for r in self.tables.get(table, [])
+                                         if all(_as_text(r.get(c)) == _as_text(row.get(c)) for c in conflict)), None)
+                    if existing is not None:
+                        existing.update(row)
+                        existing["updated_at"] = row.get("updated_at", _now())
+                        written.append(existing)
+                    else:
+                        written.append(self._insert(table, dict(row)))
+                return 201, written
+
+            if method == "PATCH":
+                updated = self._filtered(table, filters)
+                for row in updated:
+                    row.update(body or {})
+                    if "updated_at" not in (body or {}):
+                        row["updated_at"] = _now()
+                return 200, updated
+
+            if method == "DELETE":
+                removed = self._filtered(table, filters)
+                removed_ids = {id(r) for r in removed}
+                self.tables[table] = [r for r in self.tables.get(table, []) if id(r) not in removed_ids]
+                return 200, removed
+
+        return 405, {"message": f"Unsupported method {method}"}
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    def _handle(self, request: BaseHTTPRequestHandler, method: str):
+        length = int(request.headers.get("Content-Length") or 0)
+        raw_body = request.rfile.read(length) if length else b""
+        parsed = urlparse(request.path)
+
+        status, payload = 404, {"message": f"Unknown path {parsed.path}"}
+        endpoint = parsed.path
+        if parsed.path.startswith("/rest/v1/"):
+            table = unquote(parsed.path[len("/rest/v1/"):])
+            endpoint = f"{method} {table}"
+            params: Dict[str, str] = {}
+            filters: List[Tuple[str, str]] = []
+            for key, value in parse_qsl(parsed.query, keep_blank_values=True):
+                if key in RESERVED_PARAMS:
+                    params[key] = value
+                else:
+                    filters.append((key, value))
+
+            try:
+                body = json.loads(raw_body.decode("utf-8")) if raw_body else None
+                if table.startswith("rpc/"):
+                    # No Postgres functions here - answered like a database without the migration
+                    status, payload = 404, {"code": "PGRST202", "message": f"Could not find the function {table[4:]}"}
+                else:
+                    status, payload = self._execute(method, table, params, filters, body, request.headers.get("Prefer", ""))
+            except Exception as e:
+                status, payload = 400, {"message": str(e)}
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        data = json.dumps(payload).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += len(raw_body) + len(request.path)
+            self.stats["bytes_out"] += len(data)
+            if status >= 400:
+                self.stats["errors"] += 1
+            self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(endpoint, 0) + 1
+
+
+def create_server(seed: Optional[Dict[str, List[Dict[str, Any]]]] = None, latency_ms: float = 0.0) -> FakePostgREST:
+    """Start a fake PostgREST server on an ephemeral local port"""
+    return FakePostgREST(seed, latency_ms=latency_ms).start()
@@ -0,0 +1,105 @@
+"""
+Benchmark Fixtures
+Seed rows for the fake PostgREST server and local files for the FastAPI server
+"""
+
+import os
+import json
+from typing import Dict, List, Any
+
+
+BENCH_PERSON = "Bench Twin"
+BENCH_PROFILE_ID = "bench_twin_v1"
+BENCH_QUESTIONNAIRE_ID = "bench_questionnaire"
+BENCH_SURVEY_NAME = "validation_survey_1"
+
+BENCH_QUESTIONS = [
+    {"id": "q1", "tags": ["lifestyle", "daily_life_work"], "text": "Walk me through an average weekday in your life.", "type": "open_ended", "required": True, "question_order": 1},
+    {"id": "q2", "tags": ["lifestyle", "activity_wellness"], "text": "In a typical week, how active are you?", "type": "open_ended", "required": True, "question_order": 2},
+    {"id": "q3", "tags": ["media_and_culture", "social_media_use"], "text": "How often are you on social media, and which platforms do you like most?", "type": "open_ended", "required": True, "question_order": 3},
+    {"id": "q4", "tags": ["personality", "self_description"], "text": "If you had to describe yourself in a few words, what would you say?", "type": "open_ended", "required": True, "question_order": 4},
+    {"id": "q5", "tags": ["values_and_beliefs", "core_values"], "text": "What's most important to you in life, and why?", "type": "open_ended", "required": True, "question_order": 5},
+    {"id": "q6", "tags": ["routine", "skincare_steps"], "text": "What does your skincare routine look like on a normal day?", "type": "open_ended", "required": True, "question_order": 6},
+]
+
+
+def _structured_profile() -> Dict[str, Any]:
+    """A stored profile in the tagged section/field format produced by interview completion"""
+    profile_data: Dict[str, Dict[str, Any]] = {}
+    for question in BENCH_QUESTIONS:
+        section, field = question["tags"]
+        profile_data.setdefault(section, {})[field] = {
+            "value": f"Benchmark answer covering {field.replace('_', ' ')} in some detail.",
+            "source": {"questionnaire_id": BENCH_QUESTIONNAIRE_ID, "question_id": question["id"],
+                       "session_id": "bench_session"}
+        }
+    return {"profile_data": profile_data, "metadata": {"profile_id": BENCH_PROFILE_ID, "version": 1}}
+
+
+def _legacy_profile() -> Dict[str, Any]:
+    """The same twin in the PaiProfile format the FastAPI server reads from disk"""
+    return {
+        "pai_id": BENCH_PROFILE_ID,
+        "demographics": {"age_range": "25-34", "lifestyle": "urban_professional", "context": "benchmark"},
+        "core_attitudes": {"aging_approach": "proactive_prevention", "beauty_philosophy": "scientific"},
+        "decision_psychology": {"research_style": "deep_researcher"},
+        "usage_patterns": {"routine_adherence": "rigid"},
+        "value_system": {"price_sensitivity": "moderate"},
+        "behavioral_quotes": ["I read the ingredient list before anything else."],
+        "prediction_weights": {"science_driven": 0.8}
+    }
+
+
+def survey_questions() -> List[Dict[str, Any]]:
+    """The repo's own test survey questions, as stored in survey_templates"""
+    from lib.response_predictor import get_test_survey_questions
+    return [q.dict() for q in get_test_survey_questions()]
+
+
+def build_seed() -> Dict[str, List[Dict[str, Any]]]:
+    """Rows the fake PostgREST server starts with"""
+    return {
+        "people": [{"name": BENCH_PERSON}],
+        "profile_versions": [{
+            "profile_id": BENCH_PROFILE_ID,
+            "person_name": BENCH_PERSON,
+            "version_number": 1,
+            "is_active": True,
+            "profile_data": _structured_profile()
+        }],
+        "survey_templates": [{
+            "survey_name": BENCH_SURVEY_NAME,
+            "title": "Benchmark Validation Survey",
+            "description": "Survey used by the offline benchmarks",
+            "target_accuracy": 0.6,
+            "questions": survey_questions(),
+            "version": 1,
+            "is_active": True
+        }],
+        "custom_questionnaires": [{
+            "questionnaire_id": BENCH_QUESTIONNAIRE_ID,
+            "title": "Benchmark Questionnaire",
+            "description": "Questionnaire used by the offline benchmarks",
+            "questionnaire_type": "centrepiece",
+            "category": "general_life",
+            "questions": BENCH_QUESTIONS,
+            "is_public": True,
+            "is_active": True,
+            "usage_count": 0
+        }],
+    }
+
+
+def write_local_files(workdir: str):
+    """Files lib/server.py and PaiOrchestrator expect under data/"""
+    os.makedirs(os.path.join(workdir, "data", "profiles"), exist_ok=True)
+    with open(os.path.join(workdir, "data", "profiles", f"{BENCH_PROFILE_ID}_profile.json"), 'w', encoding='utf-8') as f:
+        json.dump(_legacy_profile(), f, indent=2)
+
+    with open(os.path.join(workdir, "data", "validation_survey.json"), 'w', encoding='utf-8') as f:
+        json.dump({
+            "survey_title": "Benchmark Validation Survey",
+            "description": "Survey used by the offline benchmarks",
+            "target_accuracy": 0.6,
+            "questions": survey_questions()
+        }, f, indent=2)
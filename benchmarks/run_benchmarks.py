@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+Offline Benchmark Suite
+Measures the interview -> profile -> predict -> validate pipeline against local fake backends
+
+Usage (from the repo root):
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenarios api_validation_compare,api_chat --concurrency 8
+    python -m benchmarks.run_benchmarks --json-out bench.json --baseline previous.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+import threading
+import contextlib
+import importlib.util
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Any
+
+from .fake_anthropic import LatencyProfile, create_backend
+from .fake_postgrest import create_server
+from . import fixtures
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Recorder:
+    """Collects per-label latencies and errors from concurrent operations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.client_bytes = 0
+
+    def record(self, label: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self.latencies.setdefault(label, []).append(seconds)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self.client_bytes += count
+
+    @contextlib.contextmanager
+    def step(self, label: str):
+        """Time a sub-step of an operation; raising inside marks it as an error"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(label, time.perf_counter() - start, ok=False)
+            raise
+        self.record(label, time.perf_counter() - start)
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    operation: Callable[[int, Recorder], None]
+    default_iterations: Optional[int] = None
+    # Claude calls one operation must make; fewer means ops shared cached work instead of measuring it
+    llm_calls_per_op: Optional[int] = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    operations: int
+    errors: int
+    wall_seconds: float
+    latencies: Dict[str, List[float]]
+    step_errors: Dict[str, int]
+    supabase: Dict[str, Any]
+    anthropic: Dict[str, Any]
+    client_bytes: int
+    first_error: Optional[str] = None
+    failed_checks: List[str] = field(default_factory=list)
+    summary: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def valid(self) -> bool:
+        """A scenario with any failed operation or step measured error paths, not the pipeline"""
+        return self.errors == 0 and not any(self.step_errors.values()) and not self.failed_checks
+
+    def summarize(self) -> Dict[str, Any]:
+        ops = max(self.operations, 1)
+        steps = {}
+        for label, values in self.latencies.items():
+            steps[label] = {
+                "count": len(values),
+                "errors": self.step_errors.get(label, 0),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(max(values) * 1000, 1) if values else 0.0,
+            }
+
+        self.summary = {
+            "operations": self.operations,
+            "errors": self.errors,
+            "valid": self.valid,
+            "error_rate": round(self.errors / ops, 3),
+            "first_error": self.first_error,
+            "failed_checks": self.failed_checks,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "requests_per_second": round(self.operations / self.wall_seconds, 2) if self.wall_seconds else 0.0,
+            "latency": steps,
+            "supabase_round_trips_per_op": round(self.supabase["requests"] / ops, 2),
+            "supabase_bytes_per_op": int((self.supabase["bytes_in"] + self.supabase["bytes_out"]) / ops),
+            "supabase_by_endpoint": self.supabase["by_endpoint"],
+            "llm_calls_per_op": round(self.anthropic["calls"] / ops, 2),
+            "llm_input_tokens_per_op": int(self.anthropic["input_tokens"] / ops),
+            "llm_output_tokens_per_op": int(self.anthropic["output_tokens"] / ops),
+            "llm_bytes_per_op": int((self.anthropic["bytes_in"] + self.anthropic["bytes_out"]) / ops),
+            "client_bytes_per_op": int(self.client_bytes / ops),
+        }
+        return self.summary
+
+
+# ============================================================================
+# HARNESS
+# ============================================================================
+
+class BenchmarkHarness:
+    """Owns the fake backends and runs scenarios against them"""
+
+    def __init__(self, latency: LatencyProfile, db_latency_ms: float, quiet: bool = True):
+        self.anthropic = create_backend(latency)
+        self.postgrest = create_server(fixtures.build_seed(), latency_ms=db_latency_ms)
+        self.quiet = quiet
+        self._handler_servers: Dict[str, ThreadingHTTPServer] = {}
+
+    def stop(self):
+        for server in self._handler_servers.values():
+            server.shutdown()
+            server.server_close()
+        self.anthropic.stop()
+        self.postgrest.stop()
+
+    def handler_url(self, api_name: str) -> str:
+        """Serve an api/*.py Vercel handler on a local port and return its base URL"""
+        if api_name not in self._handler_servers:
+            path = os.path.join(REPO_ROOT, "api", f"{api_name}.py")
+            spec = importlib.util.spec_from_file_location(f"bench_api_{api_name.replace('-', '_')}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+
+            server = ThreadingHTTPServer(("127.0.0.1", 0), module.handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f"api-{api_name}", daemon=True).start()
+            self._handler_servers[api_name] = server
+
+        host, port = self._handler_servers[api_name].server_address[:2]
+        return f"http://{host}:{port}/api/{api_name}"
+
+    @contextlib.contextmanager
+    def _quiet(self):
+        # The handlers print a lot of DEBUG output; keep it out of the report
+        if not self.quiet:
+            yield
+            return
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def run(self, scenario: Scenario, iterations: int, concurrency: int, warmup: int) -> ScenarioResult:
+        with self._quiet():
+            for i in range(warmup):
+                try:
+                    scenario.operation(-(i + 1), Recorder())
+                except Exception:
+                    pass
+
+            self.anthropic.reset_stats()
+            self.postgrest.reset_stats()
+            recorder = Recorder()
+            errors = [0]
+            first_error: List[Optional[str]] = [None]
+            errors_lock = threading.Lock()
+
+            def run_one(i: int):
+                start = time.perf_counter()
+                ok = True
+                try:
+                    scenario.operation(i, recorder)
+                except Exception as e:
+                    ok = False
+                    with errors_lock:
+                        errors[0] += 1
+                        if errors[0] == 1:
+                            first_error[0] = str(e)[:300]
+                            sys.stderr.write(f"[{scenario.name}] first error: {e}\n")
+                recorder.record(scenario.name, time.perf_counter() - start, ok)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(run_one, range(iterations)))
+            wall = time.perf_counter() - started
+
+        anthropic = self.anthropic.snapshot()
+        failed_checks = []
+        if scenario.llm_calls_per_op is not None:
+            expected = scenario.llm_calls_per_op
+            if anthropic["calls"] < expected * iterations:
+                failed_checks.append(f"expected {expected} LLM calls/op, got "
+                                     f"{anthropic['calls'] / max(iterations, 1):.2f} (ops reused each other's work)")
+
+        return ScenarioResult(
+            name=scenario.name,
+            operations=iterations,
+            errors=errors[0],
+            wall_seconds=wall,
+            latencies=recorder.latencies,
+            step_errors=recorder.errors,
+            supabase=self.postgrest.snapshot(),
+            anthropic=anthropic,
+            client_bytes=recorder.client_bytes,
+            first_error=first_error[0],
+            failed_checks=failed_checks,
+        )
+
+
+def http_json(method: str, url: str, payload: Optional[Dict] = None, recorder: Optional[Recorder] = None) -> Any:
+    """Call a local handler; non-2xx responses raise so they count as errors"""
+    body = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=body, method=method, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=300) as response:
+            data = response.read()
+    except urllib.error.HTTPError as e:
+        raise Exception(f"{method} {url} -> {e.code}: {e.read()[:200]!r}")
+
+    if recorder:
+        recorder.add_bytes(len(body or b"") + len(data))
+    return json.loads(data.decode('utf-8')) if data else {}
+
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+
+def build_scenarios(harness: BenchmarkHarness, turns: int) -> Dict[str, Scenario]:
+    question_ids = [q["id"] for q in fixtures.survey_questions()]
+    scenarios: Dict[str, Scenario] = {}
+
+    def add(scenario: Scenario):
+        scenarios[scenario.name] = scenario
+
+    # -- Vercel handlers (what the frontend actually calls) -------------------
+
+    def validation_compare(i: int, recorder: Recorder):
+        http_json('POST', harness.handler_url("validation"), {
+            'profile_id': fixtures.BENCH_PROFILE_ID,
+            'question_id': question_ids[i % len(question_ids)],
+            'human_answer': 'NO_ANSWER',
+            'survey_name': fixtures.BENCH_SURVEY_NAME
+        }, recorder)
+
+    add(Scenario("api_validation_compare", "One on-demand twin prediction + comparison via api/validation.py",
+                 validation_compare))
+
+    def validation_test(i: int, recorder: Recorder):
+        url = harness.handler_url("validation")
+        test_session_id = f"bench_test_{uuid.uuid4().hex[:12]}"
+        with recorder.step("validation_test.begin"):
+            http_json('POST', url, {
+                'action': 'begin_test',
+                'profile_id': fixtures.BENCH_PROFILE_ID,
+                'test_session_id': test_session_id,
+                'survey_name': fixtures.BENCH_SURVEY_NAME
+            }, recorder)
+
+        comparisons = []
+        for question_id in question_ids:
+            with recorder.step("validation_test.compare"):
+                comparisons.append(http_json('POST', url, {
+                    'profile_id': fixtures.BENCH_PROFILE_ID,
+                    'question_id': question_id,
+                    'human_answer': 'NO_ANSWER',
+                    'survey_name': fixtures.BENCH_SURVEY_NAME,
+                    'test_session_id': test_session_id
+                }, recorder))
+
+        matches = sum(1 for c in comparisons if c.get('is_match'))
+        with recorder.step("validation_test.save"):
+            http_json('POST', url, {
+                'profile_id': fixtures.BENCH_PROFILE_ID,
+                'test_session_id': test_session_id,
+                'comparisons': comparisons,
+                'accuracy_percentage': round(100 * matches / max(len(comparisons), 1)),
+                'total_questions': len(comparisons),
+                'correct_answers': matches,
+                'model_version': 'claude-3-5-sonnet-20241022',
+                'digital_twin_version': None,
+                'survey_name': fixtures.BENCH_SURVEY_NAME
+            }, recorder)
+
+    add(Scenario("api_validation_test", "Full validation test (begin, compare every question, save) via api/validation.py",
+                 validation_test, default_iterations=4))
+
+    def chat(i: int, recorder: Recorder):
+        http_json('POST', harness.handler_url("chat"), {
+            'profile_id': fixtures.BENCH_PROFILE_ID,
+            'message': 'How do you usually pick a new moisturizer?'
+        }, recorder)
+
+    add(Scenario("api_chat", "One digital twin chat message via api/chat.py", chat))
+
+    def interview_flow(i: int, recorder: Recorder):
+        url = harness.handler_url("interview")
+        with recorder.step("interview.start"):
+            # Session ids only go down to the second, so concurrent ops need their own participant
+            started = http_json('POST', url, {
+                'participant_name': f"{fixtures.BENCH_PERSON} {i}",
+                'questionnaire_id': fixtures.BENCH_QUESTIONNAIRE_ID
+            }, recorder)
+        session_id = started['session_id']
+
+        for turn in range(turns):
+            with recorder.step("interview.turn"):
+                http_json('POST', url, {
+                    'session_id': session_id,
+                    'message': 'I keep it simple: cleanser, moisturizer and sunscreen most days.',
+                    'exchange_count': turn,
+                    'questionnaire_id': fixtures.BENCH_QUESTIONNAIRE_ID
+                }, recorder)
+
+        with recorder.step("interview.complete"):
+            http_json('POST', f"{url}?action=complete", {
+                'session_id': session_id,
+                'questionnaires_completed': [fixtures.BENCH_QUESTIONNAIRE_ID],
+                'profile_action': 'new'
+            }, recorder)
+
+    add(Scenario("api_interview_flow", "Start, N turns and completion with profile extraction via api/interview.py",
+                 interview_flow, default_iterations=4,
+                 llm_calls_per_op=turns + 1))  # one reply per turn and the profile extraction
+
+    # -- PaiOrchestrator ------------------------------------------------------
+
+    def full_pipeline(i: int, recorder: Recorder):
+        from lib.main import PaiOrchestrator
+        orchestrator = PaiOrchestrator(os.environ["ANTHROPIC_API_KEY"])
+        results = orchestrator.run_full_pipeline(f"Bench Participant {i}", interactive=False)
+        if not results.get("validation_file"):
+            raise Exception("pipeline did not reach validation")
+
+    add(Scenario("pipeline_full", "PaiOrchestrator.run_full_pipeline with the simulated interview "
+                 "(includes its 0.5s pause per scripted answer)", full_pipeline, default_iterations=2))
+
+    # -- FastAPI server (lib/server.py) ---------------------------------------
+
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        TestClient = None
+
+    if TestClient is not None:
+        clients = threading.local()
+
+        def client():
+            if not hasattr(clients, "client"):
+                from lib.server import app
+                clients.client = TestClient(app)
+            return clients.client
+
+        def server_call(method: str, path: str, recorder: Recorder, payload: Optional[Dict] = None):
+            response = client().request(method, path, json=payload)
+            recorder.add_bytes(len(json.dumps(payload or {})) + len(response.content))
+            if response.status_code >= 400:
+                raise Exception(f"{method} {path} -> {response.status_code}: {response.text[:200]}")
+            return response.json()
+
+        def server_compare(i: int, recorder: Recorder):
+            server_call('POST', "/validation/compare", recorder, {
+                "profile_id": fixtures.BENCH_PROFILE_ID,
+                "question_id": question_ids[i % len(question_ids)],
+                "human_answer": "NO_ANSWER"
+            })
+
+        add(Scenario("server_validation_compare", "POST /validation/compare on lib/server.py", server_compare))
+
+        def server_chat(i: int, recorder: Recorder):
+            server_call('POST', "/chat/message", recorder, {
+                "profile_id": fixtures.BENCH_PROFILE_ID,
+                "message": "How do you usually pick a new moisturizer?"
+            })
+
+        add(Scenario("server_chat", "POST /chat/message on lib/server.py", server_chat))
+
+        def server_predict(i: int, recorder: Recorder):
+            server_call('POST', f"/predict/{fixtures.BENCH_PROFILE_ID}", recorder)
+
+        add(Scenario("server_predict", "POST /predict/{pai_id} (batch prediction) on lib/server.py",
+                     server_predict, default_iterations=4))
+
+    return scenarios
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def print_report(results: List[ScenarioResult], baseline: Optional[Dict[str, Any]] = None):
+    print("\n" + "=" * 100)
+    print("PAI OFFLINE BENCHMARKS")
+    print("=" * 100)
+
+    for result in results:
+        summary = result.summary
+        if not result.valid:
+            failed_steps = ", ".join(f"{label} {count}" for label, count in sorted(result.step_errors.items()) if count)
+            print(f"\n{result.name}: INVALID - {summary['errors']} of {summary['operations']} ops failed"
+                  f"{f' (failed steps: {failed_steps})' if failed_steps else ''}")
+            if summary['first_error']:
+                print(f"  first error: {summary['first_error']}")
+            for check in result.failed_checks:
+                print(f"  failed check: {check}")
+            print("  latencies not reported: they would time error paths or shared work, not the pipeline")
+            continue
+        print(f"\n{result.name}: {summary['operations']} ops, {summary['errors']} errors, "
+              f"{summary['requests_per_second']} ops/s over {summary['wall_seconds']}s")
+        print(f"  {'step':<32}{'count':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for label, stats in sorted(summary["latency"].items(), key=lambda item: item[0] != result.name):
+            print(f"  {label:<32}{stats['count']:>7}{stats['errors']:>5}{stats['p50_ms']:>10}"
+                  f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+        print(f"  supabase: {summary['supabase_round_trips_per_op']} round-trips/op, "
+              f"{summary['supabase_bytes_per_op']} bytes/op")
+        print(f"  llm:      {summary['llm_calls_per_op']} calls/op, {summary['llm_input_tokens_per_op']} in / "
+              f"{summary['llm_output_tokens_per_op']} out tokens/op, {summary['llm_bytes_per_op']} bytes/op")
+        print(f"  client:   {summary['client_bytes_per_op']} bytes/op")
+
+        previous = (baseline or {}).get("scenarios", {}).get(result.name)
+        if previous and previous.get("valid", True):
+            print("  vs baseline:")
+            for key, label in [("requests_per_second", "ops/s"),
+                               ("supabase_round_trips_per_op", "round-trips/op"),
+                               ("supabase_bytes_per_op", "supabase bytes/op"),
+                               ("llm_calls_per_op", "llm calls/op")]:
+                print(f"    {label:<20}{_delta(previous.get(key), summary[key])}")
+            old = previous.get("latency", {}).get(result.name, {})
+            new = summary["latency"].get(result.name, {})
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                print(f"    {key:<20}{_delta(old.get(key), new.get(key))}")
+
+    print("\n" + "=" * 100)
+
+
+def _delta(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return f"{new}"
+    if not old:
+        return f"{old} -> {new}"
+    return f"{old} -> {new} ({(new - old) / old * 100:+.1f}%)"
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Pai backend")
+    parser.add_argument("--scenarios", default="all", help="Comma-separated scenario names, or 'all'")
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    parser.add_argument("--iterations", type=int, default=None, help="Operations per scenario (default per scenario)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent operations")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured operations before each scenario")
+    parser.add_argument("--turns", type=int, default=3, help="Interview turns in api_interview_flow")
+
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-ms-per-token", type=float, default=8.0)
+    parser.add_argument("--llm-jitter", type=float, default=0.25, help="Lognormal sigma on model latency")
+    parser.add_argument("--llm-output-tokens", type=int, default=180, help="Mean output tokens for free-text replies")
+    parser.add_argument("--llm-output-tokens-std", type=int, default=60)
+    parser.add_argument("--llm-overload-rate", type=float, default=0.0, help="Fraction of calls answered with 529")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="Added latency per PostgREST request")
+    parser.add_argument("--seed", type=int, default=7)
+
+    parser.add_argument("--json-out", help="Write the summary as JSON for later comparison")
+    parser.add_argument("--baseline", help="Previous --json-out file to diff against")
+    parser.add_argument("--verbose", action="store_true", help="Show handler DEBUG output")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    json_out = os.path.abspath(args.json_out) if args.json_out else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    latency = LatencyProfile(
+        first_token_ms=args.llm_first_token_ms,
+        ms_per_output_token=args.llm_ms_per_token,
+        jitter=args.llm_jitter,
+        output_tokens_mean=args.llm_output_tokens,
+        output_tokens_std=args.llm_output_tokens_std,
+        overload_rate=args.llm_overload_rate,
+        seed=args.seed
+    )
+
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    harness = BenchmarkHarness(latency, args.db_latency_ms, quiet=not args.verbose)
+
+    # Point every client at the fakes before any app module is imported
+    os.environ["ANTHROPIC_API_KEY"] = "bench-key"
+    os.environ["ANTHROPIC_BASE_URL"] = harness.anthropic.base_url
+    os.environ["SUPABASE_URL"] = harness.postgrest.base_url
+    os.environ["SUPABASE_ANON_KEY"] = "bench-key"
+
+    # lib/server.py and PaiOrchestrator read and write relative data/ paths
+    workdir = tempfile.mkdtemp(prefix="pai_bench_")
+    fixtures.write_local_files(workdir)
+    os.chdir(workdir)
+
+    try:
+        scenarios = build_scenarios(harness, args.turns)
+
+        if args.list:
+            for scenario in scenarios.values():
+                print(f"{scenario.name:<28}{scenario.description}")
+            return
+
+        names = list(scenarios) if args.scenarios == "all" else [n.strip() for n in args.scenarios.split(",")]
+        unknown = [n for n in names if n not in scenarios]
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (see --list)")
+
+        results = []
+        for name in names:
+            scenario = scenarios[name]
+            iterations = args.iterations or scenario.default_iterations or 20
+            print(f"Running {name} ({iterations} ops, concurrency {args.concurrency})...", flush=True)
+            result = harness.run(scenario, iterations, args.concurrency, args.warmup)
+            result.summarize()
+            results.append(result)
+
+        baseline = None
+        if baseline_path:
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        print_report(results, baseline)
+
+        if json_out:
+            output = {
+                "config": {k: v for k, v in vars(args).items() if k not in ("json_out", "baseline", "list")},
+                "scenarios": {r.name: r.summary for r in results}
+            }
+            with open(json_out, 'w', encoding='utf-8') as f:
+                json.dump(output, f, indent=2)
+            print(f"Summary written to {json_out}")
+
+        invalid = [r.name for r in results if not r.valid]
+        if invalid:
+            print(f"\nInvalid scenarios (errors or failed checks during the run): {', '.join(invalid)}", file=sys.stderr)
+            sys.exit(1)
+
+    finally:
+        harness.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Adaptive Concurrency Limiter
+AIMD control of how many Claude calls may be in flight, driven by latency and 429/529s
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Any
+
+
+HISTORY_SIZE = 200
+OUTCOME_WINDOW = 50
+
+
+class AIMDLimiter:
+    """Additive-increase / multiplicative-decrease concurrency limit.
+
+    The limit grows by roughly one slot per `limit` healthy completions while
+    calls are actually using the available concurrency, and is cut when the API
+    pushes back (429/529), when the recent error rate climbs, or when latency
+    rises well above its baseline for the same call type. Cuts are rate-limited
+    by a cooldown so one burst of rejections only backs off once.
+    """
+
+    def __init__(self, initial: int, min_limit: int = 1, max_limit: int = 32,
+                 overload_backoff: float = 0.5, latency_backoff: float = 0.8,
+                 latency_tolerance: float = 2.0, error_rate_threshold: float = 0.2,
+                 cooldown_seconds: float = 2.0, on_change: Optional[Callable[[int], None]] = None):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.overload_backoff = overload_backoff
+        self.latency_backoff = latency_backoff
+        self.latency_tolerance = latency_tolerance
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.on_change = on_change
+
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+        self._baseline: Dict[str, float] = {}   # slow EWMA of latency per call type
+        self._recent: Dict[str, float] = {}     # fast EWMA of latency ratio per call type
+        self._outcomes = deque(maxlen=OUTCOME_WINDOW)
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._history.append({"at": time.time(), "limit": self.limit, "reason": "initial"})
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def record_success(self, call_type: str, latency_seconds: float, in_flight: int):
+        """A call completed normally; `in_flight` is how many were running when it started"""
+        with self._lock:
+            self._outcomes.append(True)
+
+            baseline = self._baseline.get(call_type)
+            if baseline is None:
+                self._baseline[call_type] = latency_seconds
+                return
+
+            ratio = latency_seconds / baseline if baseline > 0 else 1.0
+            recent = 0.7 * self._recent.get(call_type, 1.0) + 0.3 * ratio
+            self._recent[call_type] = recent
+
+            if recent > self.latency_tolerance:
+                self._decrease(self.latency_backoff, f"{call_type} latency {recent:.1f}x baseline")
+                return
+
+            # Only learn the baseline from healthy calls so it doesn't drift up under load
+            self._baseline[call_type] = 0.95 * baseline + 0.05 * latency_seconds
+
+            # Growing the limit only means something when we're using it
+            if in_flight >= self._limit - 1:
+                self._set(min(self.max_limit, self._limit + 1.0 / self._limit), "healthy")
+
+    def record_overload(self, call_type: str, status: int):
+        """The API answered 429/529"""
+        with self._lock:
+            self._outcomes.append(False)
+            self._decrease(self.overload_backoff, f"{call_type} got {status}")
+
+    def record_error(self, call_type: str):
+        """Any other failed call (timeouts, connection errors, 5xx)"""
+        with self._lock:
+            self._outcomes.append(False)
+            if len(self._outcomes) >= 10:
+                error_rate = self._outcomes.count(False) / len(self._outcomes)
+                if error_rate > self.error_rate_threshold:
+                    self._decrease(self.latency_backoff, f"error rate {error_rate:.0%}")
+
+    def _decrease(self, factor: float, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_seconds:
+            return
+        self._last_decrease = now
+        self._set(max(self.min_limit, self._limit * factor), reason)
+
+    def _set(self, value: float, reason: str):
+        previous = self.limit
+        self._limit = value
+        if self.limit != previous:
+            self._history.append({"at": time.time(), "limit": self.limit, "reason": reason})
+            print(f"DEBUG: LLM concurrency limit {previous} -> {self.limit} ({reason})")
+            if self.on_change:
+                self.on_change(self.limit)
+
+    def history(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._history)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            outcomes = len(self._outcomes)
+            return {
+                "limit": self.limit,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "recent_error_rate": round(self._outcomes.count(False) / outcomes, 3) if outcomes else 0.0,
+                "latency_baseline_ms": {k: round(v * 1000, 1) for k, v in self._baseline.items()},
+                "latency_ratio": {k: round(v, 2) for k, v in self._recent.items()},
+                "history": list(self._history)[-20:],
+            }
@@ -6,10 +6,11 @@ Conducts A&U research interviews using Claude API
 import os
 import json
 from datetime import datetime
-from typing import List, Dict, Optional
-import anthropic
+from typing import Iterator, List, Dict, Optional
 from pydantic import BaseModel
 
+from .llm_gateway import get_gateway
+
 
 class InterviewMessage(BaseModel):
     id: str
@@ -30,24 +31,29 @@ class InterviewSession(BaseModel):
 
 class AIInterviewer:
     def __init__(self, api_key: str, questionnaire_context: Optional[Dict] = None):
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.llm = get_gateway(api_key)
         self.questionnaire_context = questionnaire_context
         self.system_prompt = self._get_system_prompt()
     
     def _get_system_prompt(self) -> str:
+        """System prompt for this interview - the questionnaire's compiled prompt when it has one"""
+        compiled = (self.questionnaire_context or {}).get('compiled')
+        if compiled and compiled.get('interviewer_prompt'):
+            return compiled['interviewer_prompt']
+        return self.build_system_prompt(self.questionnaire_context)
+    
+    @classmethod
+    def build_system_prompt(cls, questionnaire_context: Optional[Dict] = None) -> str:
         """Generate system prompt based on questionnaire context"""
-        if self.questionnaire_context:
+        if questionnaire_context:
             # Custom questionnaire prompt
-            category = self.questionnaire_context.get('category', 'general')
-            title = self.questionnaire_context.get('title', 'Custom Questionnaire')
-            description = self.questionnaire_context.get('description', '')
-            questions = self.questionnaire_context.get('questions', [])
-            
-            # Extract conversational themes from questionnaire questions based on profile tags
-            themes = self._extract_conversation_themes(questions, category)
+            category = questionnaire_context.get('category', 'general')
+            title = questionnaire_context.get('title', 'Custom Questionnaire')
+            description = questionnaire_context.get('description', '')
+            questions = questionnaire_context.get('questions', [])
             
             # Get detailed field mappings for systematic coverage
-            detailed_coverage = self._get_detailed_field_coverage(questions)
+            detailed_coverage = cls._get_detailed_field_coverage(questions)
             
             return f"""You are a warm, curious researcher having a genuine conversation to understand this person's life and experiences around {category}. Your goal is to learn about their psychology, attitudes, and behaviors through natural dialogue while SYSTEMATICALLY covering all profile areas.
 
@@ -184,7 +190,8 @@ Remember: This should feel like a fascinating conversation about their personal
 
 CRITICAL: Always ask ONE focused question per response. Keep responses conversational and brief (1-2 sentences). Never overwhelm with multiple questions at once."""
     
-    def _get_detailed_field_coverage(self, questions):
+    @classmethod
+    def _get_detailed_field_coverage(cls, questions):
         """Generate detailed list of all profile fields that must be covered"""
         if not questions:
             return "- General background and experiences\n- Personal values and motivations\n- Current situation and lifestyle"
@@ -200,7 +207,7 @@ CRITICAL: Always ask ONE focused question per response. Keep responses conversat
                 field = tags[1]    # e.g., 'daily_life_work', 'self_description'
                 
                 # Convert technical field names to conversational descriptions
-                field_description = self._field_to_description(section, field)
+                field_description = cls._field_to_description(section, field)
                 # Use section.field as key to avoid duplicates even if descriptions are similar
                 field_key = f"{section}.{field}"
                 if field_description and field_key not in [area[1] if isinstance(area, tuple) else None for area in coverage_areas]:
@@ -228,7 +235,8 @@ CRITICAL: Always ask ONE focused question per response. Keep responses conversat
         else:
             return "- Their background and current situation\n- Personal interests and values\n- Daily life and experiences"
     
-    def _field_to_description(self, section, field):
+    @staticmethod
+    def _field_to_description(section, field):
         """Convert technical tag fields to conversational descriptions"""
         # Lifestyle fields
         if section == 'lifestyle':
@@ -352,7 +360,8 @@ CRITICAL: Always ask ONE focused question per response. Keep responses conversat
             return any(keyword in area.lower() for keyword in section_keywords[section])
         return False
 
-    def _extract_conversation_themes(self, questions, category):
+    @staticmethod
+    def _extract_conversation_themes(questions, category):
         """Extract natural conversation themes based on profile tag sections"""
         if not questions:
             return f"- Their general relationship with {category}\n- Personal experiences and stories\n- What matters most to them in this area"
@@ -469,9 +478,8 @@ CRITICAL: Always ask ONE focused question per response. Keep responses conversat
             conversation_history = self._build_conversation_history(session, user_message)
             
             # Call Claude API
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1000,
+            response = self.llm.create(
+                "interview_turn",
                 temperature=0.7,
                 system=self.system_prompt,
                 messages=conversation_history
@@ -482,7 +490,27 @@ CRITICAL: Always ask ONE focused question per response. Keep responses conversat
         except Exception as e:
             print(f"Error getting AI response: {e}")
             return "I apologize, but I'm having trouble processing your response right now. Could you please try again?"
-    
+
+    def stream_ai_response(self, session: InterviewSession, user_message: str) -> Iterator[str]:
+        """Get AI response using Claude API, yielding text as it is generated"""
+        emitted = False
+        try:
+            conversation_history = self._build_conversation_history(session, user_message)
+            for text in self.llm.stream(
+                "interview_turn",
+                temperature=0.7,
+                system=self.system_prompt,
+                messages=conversation_history
+            ):
+                emitted = True
+                yield text
+        except Exception as e:
+            print(f"Error streaming AI response: {e}")
+            if not emitted:
+                yield "I apologize, but I'm having trouble processing your response right now. Could you please try again?"
+            else:
+                raise
+
     def _build_conversation_history(self, session: InterviewSession, new_user_message: str) -> List[Dict]:
         """Build conversation history for Claude API"""
         messages = []
@@ -0,0 +1,292 @@
+"""
+Batch Validation Runner
+Validates many twins against stored human responses in parallel, with resumable checkpoints
+"""
+
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Tuple
+
+from .profile_extractor import PaiProfile, profile_from_version
+from .response_predictor import ResponsePredictor, SurveyQuestion, get_test_survey_questions
+from .validation_tester import (ValidationResult, summarize_results, adaptive_validate, score_prediction,
+                                ADAPTIVE_TOLERANCE, ADAPTIVE_MIN_QUESTIONS)
+from .panel_simulation import survey_questions_from_template
+from .tracing import wrap_context
+
+
+BATCH_VALIDATION_DIR = os.getenv('PAI_BATCH_VALIDATION_DIR', 'data/validation/batch')
+TARGET_ACCURACY = 0.60
+QUESTION_WORKERS = 4
+
+
+class ValidationJob:
+    """One twin to validate, the human answers to validate it against and the questions they answer"""
+
+    def __init__(self, profile_id: str, person_name: str, profile: PaiProfile,
+                 responses: Dict[str, str], responses_source: str,
+                 questions: Optional[List[SurveyQuestion]] = None, survey_name: Optional[str] = None):
+        self.profile_id = profile_id
+        self.person_name = person_name
+        self.profile = profile
+        self.responses = responses
+        self.responses_source = responses_source
+        self.questions = questions or []
+        self.survey_name = survey_name
+
+
+def load_human_responses(supabase, profile_versions: List[Dict[str, Any]],
+                         survey_name: Optional[str] = None) -> Dict[str, Tuple[str, Dict[str, str]]]:
+    """Latest human answer per question for each person, from survey_responses, with the survey they answered.
+
+    Answers belong to the person rather than a profile version, so sessions
+    recorded against any of the person's versions count and a new twin
+    version is validated against what the person said when testing older
+    ones. Without `survey_name` each person's answers come from the survey
+    of their most recent session only, so question ids of different surveys
+    are never mixed.
+    """
+    people = sorted({row['person_name'] for row in profile_versions})
+    person_by_profile = {row['profile_id']: row['person_name']
+                         for row in supabase.get_profile_versions_for_people(people)}
+    person_by_profile.update({row['profile_id']: row['person_name'] for row in profile_versions})
+    sessions = supabase.get_validation_test_sessions(list(person_by_profile))
+
+    # Sessions arrive newest first
+    survey_by_person: Dict[str, str] = {}
+    for session in sessions:
+        person = person_by_profile.get(session['profile_id'])
+        if person and (not survey_name or session.get('survey_name') == survey_name):
+            survey_by_person.setdefault(person, session.get('survey_name'))
+    sessions = [s for s in sessions
+                if survey_by_person.get(person_by_profile.get(s['profile_id'])) == s.get('survey_name')]
+
+    # Older sessions only fill in questions the newer ones lack
+    session_order = {s['test_session_id']: i for i, s in enumerate(sessions)}
+    session_person = {s['test_session_id']: person_by_profile.get(s['profile_id']) for s in sessions}
+    rows = supabase.get_survey_responses(list(session_order))
+
+    responses: Dict[str, Dict[str, str]] = {}
+    for row in sorted(rows, key=lambda r: session_order.get(r['test_session_id'], len(session_order))):
+        person = session_person.get(row['test_session_id'])
+        if person and row.get('human_response'):
+            responses.setdefault(person, {}).setdefault(row['question_id'], row['human_response'])
+    return {person: (survey_by_person[person], answers) for person, answers in responses.items()}
+
+
+def load_local_responses(responses_dir: str, keys: List[str]) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """ValidationTester-style {key}_responses.json for the first key that has one"""
+    for key in keys:
+        path = os.path.join(responses_dir, f"{key}_responses.json")
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("responses", {}), path
+    return None, None
+
+
+class BatchValidationRunner:
+    """Validates a set of twins concurrently, one result file per twin.
+
+    A twin whose result file already exists in the run directory is skipped, so
+    an interrupted nightly run continues from where it stopped when started
+    again with the same run id. Without explicit `questions` each twin is
+    validated on the survey its human answers came from (the built-in
+    questions for ValidationTester response files).
+    """
+
+    def __init__(self, predictor: ResponsePredictor, questions: Optional[List[SurveyQuestion]] = None,
+                 output_dir: str = BATCH_VALIDATION_DIR, workers: int = 8, adaptive: bool = False,
+                 tolerance: float = ADAPTIVE_TOLERANCE, min_questions: int = ADAPTIVE_MIN_QUESTIONS,
+                 target_accuracy: float = TARGET_ACCURACY):
+        self.predictor = predictor
+        self.questions = questions
+        self.output_dir = output_dir
+        self.workers = workers
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.min_questions = min_questions
+        self.target_accuracy = target_accuracy
+
+    # ------------------------------------------------------------------
+    # Building jobs
+    # ------------------------------------------------------------------
+
+    def jobs_from_supabase(self, supabase, profile_ids: Optional[List[str]] = None,
+                           survey_name: Optional[str] = None,
+                           responses_dir: Optional[str] = None) -> Tuple[List[ValidationJob], List[str]]:
+        """Jobs for active twins; returns (jobs, profile ids skipped for lack of human answers to their questions)"""
+        rows = supabase.get_active_profiles()
+        if profile_ids:
+            rows = [row for row in rows if row['profile_id'] in profile_ids]
+
+        stored = load_human_responses(supabase, rows, survey_name)
+        templates: Dict[str, List[SurveyQuestion]] = {}
+        jobs, skipped = [], []
+        for row in rows:
+            survey, responses = stored.get(row['person_name'], (None, None))
+            source, questions = "survey_responses", self.questions
+            if responses and not questions:
+                if survey not in templates:
+                    template = supabase.get_survey_template(survey)
+                    templates[survey] = survey_questions_from_template(template) if template else []
+                questions = templates[survey]
+            if not responses and responses_dir:
+                survey = None
+                responses, source = load_local_responses(responses_dir, [row['profile_id'], row['person_name']])
+                questions = self.questions or get_test_survey_questions()
+            if not self._has_overlap(row['profile_id'], questions, responses):
+                skipped.append(row['profile_id'])
+                continue
+            try:
+                profile = profile_from_version(row)
+            except Exception as e:
+                print(f"DEBUG: Skipping {row['profile_id']} - profile could not be loaded: {e}")
+                skipped.append(row['profile_id'])
+                continue
+            jobs.append(ValidationJob(row['profile_id'], row['person_name'], profile, responses, source,
+                                      questions, survey))
+        return jobs, skipped
+
+    def jobs_from_files(self, profiles_dir: str, responses_dir: str) -> Tuple[List[ValidationJob], List[str]]:
+        """Jobs for local *_profile.json files with matching *_responses.json files"""
+        jobs, skipped = [], []
+        for filename in sorted(os.listdir(profiles_dir)):
+            if not filename.endswith('_profile.json'):
+                continue
+            with open(os.path.join(profiles_dir, filename), 'r', encoding='utf-8') as f:
+                profile = PaiProfile(**json.load(f))
+            responses, source = load_local_responses(responses_dir, [profile.pai_id])
+            questions = self.questions or get_test_survey_questions()
+            if not self._has_overlap(profile.pai_id, questions, responses):
+                skipped.append(profile.pai_id)
+                continue
+            jobs.append(ValidationJob(profile.pai_id, profile.pai_id, profile, responses, source, questions))
+        return jobs, skipped
+
+    @staticmethod
+    def _has_overlap(profile_id: str, questions: Optional[List[SurveyQuestion]],
+                     responses: Optional[Dict[str, str]]) -> bool:
+        """Whether any question has a human answer; a 0/0 result would only skew the run's accuracy"""
+        if not responses:
+            return False
+        if not any(q.id in responses for q in questions or []):
+            print(f"DEBUG: Skipping {profile_id} - none of its {len(responses)} human answers match the questions")
+            return False
+        return True
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def run(self, jobs: List[ValidationJob], run_id: Optional[str] = None,
+            skipped: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Validate every job not already checkpointed and write the consolidated summary"""
+        run_id = run_id or f"validation_{datetime.now().strftime('%Y%m%d')}"
+        run_dir = os.path.join(self.output_dir, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+
+        pending = [job for job in jobs if not os.path.exists(self._result_path(run_dir, job.profile_id))]
+        print(f"DEBUG: Batch validation {run_id}: {len(pending)} twins to validate, "
+              f"{len(jobs) - len(pending)} already done")
+
+        started = time.time()
+        failures: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pai-validate") as executor:
+            futures = {executor.submit(wrap_context(self._validate), job): job for job in pending}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures[job.profile_id] = str(e)
+                    print(f"DEBUG: Validation failed for {job.profile_id}: {e}")
+                    continue
+                self._write_result(run_dir, job, result)
+                print(f"DEBUG: {job.profile_id}: {result.accuracy_rate:.1%} "
+                      f"({result.correct_predictions}/{result.total_questions})")
+
+        summary = self._summarize(run_id, run_dir, jobs, failures, skipped or [], time.time() - started)
+        with open(os.path.join(run_dir, "summary.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+    def _validate(self, job: ValidationJob) -> ValidationResult:
+        if self.adaptive:
+            return adaptive_validate(
+                self.predictor, job.profile, job.questions, job.responses,
+                tolerance=self.tolerance, min_questions=self.min_questions,
+                target_accuracy=self.target_accuracy
+            )
+
+        def predict(question: SurveyQuestion):
+            try:
+                return self.predictor.predict_response(job.profile, question)
+            except Exception as e:
+                print(f"DEBUG: {job.profile_id} prediction for {question.id} failed: {e}")
+                return None
+
+        questions = [q for q in job.questions if q.id in job.responses]
+        with ThreadPoolExecutor(max_workers=QUESTION_WORKERS) as executor:
+            predictions = list(executor.map(wrap_context(predict), questions))
+        if questions and not any(predictions):
+            raise Exception("every prediction failed")
+
+        results = [score_prediction(q, pred, job.responses[q.id])
+                   for q, pred in zip(questions, predictions) if pred is not None]
+        return summarize_results(job.profile_id, results)
+
+    @staticmethod
+    def _result_path(run_dir: str, profile_id: str) -> str:
+        return os.path.join(run_dir, f"{profile_id}_validation.json")
+
+    def _write_result(self, run_dir: str, job: ValidationJob, result: ValidationResult):
+        record = dict(result.dict(), person_name=job.person_name, responses_source=job.responses_source,
+                      survey_name=job.survey_name, completed_at=datetime.now().isoformat())
+        path = self._result_path(run_dir, job.profile_id)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=2, ensure_ascii=False)
+        # Only a complete file counts as a checkpoint
+        os.replace(path + ".tmp", path)
+
+    def _summarize(self, run_id: str, run_dir: str, jobs: List[ValidationJob], failures: Dict[str, str],
+                   skipped: List[str], duration: float) -> Dict[str, Any]:
+        profiles = []
+        for job in jobs:
+            path = self._result_path(run_dir, job.profile_id)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            profiles.append({
+                "profile_id": job.profile_id,
+                "person_name": job.person_name,
+                "survey_name": saved.get("survey_name"),
+                "accuracy_rate": saved["accuracy_rate"],
+                "accuracy_interval": saved.get("accuracy_interval"),
+                "correct_predictions": saved["correct_predictions"],
+                "total_questions": saved["total_questions"],
+                "avg_confidence": saved["avg_confidence"],
+                "meets_target": saved["accuracy_rate"] >= self.target_accuracy,
+                "stopped_early": bool(saved.get("stopping_rule") and saved["stopping_rule"]["predictions_saved"]),
+            })
+
+        profiles.sort(key=lambda p: p["accuracy_rate"])
+        total_questions = sum(p["total_questions"] for p in profiles)
+        return {
+            "run_id": run_id,
+            "generated_at": datetime.now().isoformat(),
+            "mode": "adaptive" if self.adaptive else "full",
+            "target_accuracy": self.target_accuracy,
+            "profiles_validated": len(profiles),
+            "profiles_failed": failures,
+            "profiles_skipped_no_responses": skipped,
+            "profiles_meeting_target": sum(1 for p in profiles if p["meets_target"]),
+            "mean_accuracy": sum(p["accuracy_rate"] for p in profiles) / len(profiles) if profiles else 0,
+            "pooled_accuracy": sum(p["correct_predictions"] for p in profiles) / total_questions if total_questions else 0,
+            "questions_predicted": total_questions,
+            "duration_seconds": round(duration, 1),
+            "profiles": profiles,
+        }
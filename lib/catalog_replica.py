@@ -0,0 +1,289 @@
+"""
+Catalog Replica
+Local SQLite mirror of the questionnaire and template catalogs, synced incrementally from Supabase
+"""
+
+import os
+import copy
+import json
+import hashlib
+import time
+import sqlite3
+import threading
+import urllib.parse
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Off until supabase_migration_catalog_updated_at.sql is applied; incremental sync needs its updated_at columns
+CATALOG_REPLICA = os.getenv('PAI_CATALOG_REPLICA', '0') == '1'
+CATALOG_REPLICA_DIR = os.getenv('PAI_CATALOG_REPLICA_DIR', '/tmp/pai_catalog')
+SYNC_INTERVAL_SECONDS = float(os.getenv('PAI_CATALOG_SYNC_INTERVAL', '30'))
+SWEEP_INTERVAL_SECONDS = float(os.getenv('PAI_CATALOG_SWEEP_INTERVAL', '300'))
+
+# Rows committed with an updated_at up to this far behind the newest one seen are still picked up
+SYNC_OVERLAP_SECONDS = 60
+
+# Mirrored table -> primary key columns (see supabase_migration_catalog_updated_at.sql)
+CATALOG_TABLES = {
+    'custom_questionnaires': ('questionnaire_id',),
+    'questionnaire_questions': ('questionnaire_id', 'question_id'),
+    'survey_templates': ('survey_name',),
+    'interview_templates': ('template_name',),
+}
+
+
+def _as_text(value: Any) -> str:
+    """A row value as PostgREST filter literals spell it"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    return str(value)
+
+
+def _sort_key(value: Any) -> Tuple:
+    if value is None:
+        return (1, 0, 0.0, "")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, 0, float(value), "")
+    return (0, 1, 0.0, str(value))
+
+
+def replica_path(supabase_url: str) -> str:
+    """One mirror file per Supabase project, so switching projects never serves another project's rows"""
+    digest = hashlib.sha1((supabase_url or '').encode('utf-8')).hexdigest()[:12]
+    return os.path.join(CATALOG_REPLICA_DIR, f"catalog_{digest}.sqlite3")
+
+
+def _overlap_cursor(cursor: str) -> str:
+    try:
+        moment = datetime.fromisoformat(cursor.replace('Z', '+00:00'))
+    except ValueError:
+        return cursor
+    return (moment - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+
+
+class CatalogReplica:
+    """Answers catalog GETs locally from a SQLite mirror.
+
+    Each table syncs on its own. An incremental pull fetches rows whose
+    updated_at is at or after the newest one already mirrored, minus a short
+    overlap. A periodic tombstone sweep fetches only primary keys and deletes
+    local rows Supabase no longer has. The SQLite file keeps the mirror across
+    restarts; reads are served from an in-memory copy of it.
+
+    A table that has never synced isn't answered locally, and one whose first
+    sync is refused by Supabase (a 4xx, e.g. no updated_at column before the
+    migration) is left to Supabase for the rest of the process. A table past its
+    sync interval is still answered while a background sync runs. A table
+    this process wrote to syncs before its next read, so writes are visible
+    to the writer straight away.
+    """
+
+    def __init__(self, path: str, sync_interval: float = SYNC_INTERVAL_SECONDS,
+                 sweep_interval: float = SWEEP_INTERVAL_SECONDS):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._sync_locks = {table: threading.Lock() for table in CATALOG_TABLES}
+        self._rows: Dict[str, Dict[str, Dict[str, Any]]] = {table: {} for table in CATALOG_TABLES}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._dirty = set()
+        self._syncing = set()
+        self._disabled = set()
+        self.stats = {"local_reads": 0, "passthrough": 0, "syncs": 0, "rows_pulled": 0,
+                      "tombstones": 0, "sync_failures": 0}
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS catalog_rows (table_name TEXT NOT NULL, pk TEXT NOT NULL, "
+                         "updated_at TEXT, data TEXT NOT NULL, PRIMARY KEY (table_name, pk))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS catalog_sync (table_name TEXT PRIMARY KEY, cursor TEXT, "
+                         "synced_at REAL, swept_at REAL)")
+        self._load()
+
+    def _load(self):
+        with self._lock:
+            for table_name, pk, data in self._db.execute("SELECT table_name, pk, data FROM catalog_rows"):
+                if table_name in self._rows:
+                    self._rows[table_name][pk] = json.loads(data)
+            for table_name, cursor, synced_at, swept_at in self._db.execute("SELECT * FROM catalog_sync"):
+                self._state[table_name] = {"cursor": cursor, "synced_at": synced_at or 0.0,
+                                           "swept_at": swept_at or 0.0}
+
+    @staticmethod
+    def _pk(table: str, row: Dict[str, Any]) -> str:
+        return "\x1f".join(_as_text(row.get(column)) for column in CATALOG_TABLES[table])
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def query(self, client, endpoint: str) -> Optional[List[Dict[str, Any]]]:
+        """Rows for a PostgREST GET endpoint, or None if it must go to Supabase"""
+        table, _, query_string = endpoint.partition('?')
+        if table not in CATALOG_TABLES:
+            return None
+
+        filters, order, select, limit, offset = [], [], '*', None, 0
+        for key, value in urllib.parse.parse_qsl(query_string, keep_blank_values=True):
+            if key == 'order':
+                order = [clause for clause in value.split(',') if clause]
+            elif key == 'select':
+                select = value
+            elif key == 'limit':
+                limit = int(value)
+            elif key == 'offset':
+                offset = int(value)
+            elif value.startswith('eq.'):
+                filters.append((key, value[3:]))
+            else:
+                # Operators the mirror doesn't evaluate
+                self.stats["passthrough"] += 1
+                return None
+
+        if table in self._disabled or not self._ready(client, table):
+            self.stats["passthrough"] += 1
+            return None
+
+        with self._lock:
+            rows = [row for row in self._rows[table].values()
+                    if all(_as_text(row.get(column)) == literal for column, literal in filters)]
+            self.stats["local_reads"] += 1
+        for clause in reversed(order):
+            parts = clause.split('.')
+            rows = sorted(rows, key=lambda row: _sort_key(row.get(parts[0])), reverse='desc' in parts[1:])
+        rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+        if select != '*':
+            columns = [column.strip() for column in select.split(',')]
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        return copy.deepcopy(rows)
+
+    def _ready(self, client, table: str) -> bool:
+        with self._lock:
+            state = self._state.get(table)
+            dirty = table in self._dirty
+            due = state is not None and time.time() - state["synced_at"] >= self.sync_interval
+            start_background = due and not dirty and table not in self._syncing
+            if start_background:
+                self._syncing.add(table)
+
+        if state is None or dirty:
+            # First sync for this mirror, or our own write: catch up before answering
+            try:
+                self.sync(client, table, sweep=dirty)
+            except Exception as e:
+                status = getattr(e, 'status', None)
+                if state is None and status is not None and 400 <= status < 500:
+                    with self._lock:
+                        self._disabled.add(table)
+                    print(f"DEBUG: Catalog replica disabled for {table}, reading it from Supabase: {e}")
+                else:
+                    print(f"DEBUG: Catalog replica sync of {table} failed: {e}")
+                return state is not None
+            return True
+
+        if start_background:
+            threading.Thread(target=self._background_sync, args=(client, table),
+                             name="pai-catalog-sync", daemon=True).start()
+        return True
+
+    def _background_sync(self, client, table: str):
+        try:
+            self.sync(client, table)
+        except Exception as e:
+            print(f"DEBUG: Catalog replica sync of {table} failed, serving last synced rows: {e}")
+        finally:
+            with self._lock:
+                self._syncing.discard(table)
+
+    def mark_dirty(self, table: str):
+        """This process wrote to the table; the next read syncs first (with a sweep, in case it was a delete)"""
+        if table in CATALOG_TABLES:
+            with self._lock:
+                self._dirty.add(table)
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def sync(self, client, table: str, sweep: bool = False):
+        """Pull rows changed since the last sync; sweep deleted rows when asked or when the sweep is due"""
+        with self._sync_locks[table]:
+            with self._lock:
+                state = dict(self._state.get(table) or {"cursor": None, "synced_at": 0.0, "swept_at": 0.0})
+                self._dirty.discard(table)
+
+            # Paged by offset, so the order must be total: rows sharing an updated_at are ordered by primary key
+            pk_order = ','.join(f"{column}.asc" for column in CATALOG_TABLES[table])
+            endpoint = f"{table}?order=updated_at.asc,{pk_order}"
+            if state["cursor"]:
+                endpoint += f"&updated_at=gte.{urllib.parse.quote(_overlap_cursor(state['cursor']))}"
+            try:
+                changed = self._fetch_all(client, endpoint)
+            except Exception:
+                with self._lock:
+                    self.stats["sync_failures"] += 1
+                    if sweep:
+                        self._dirty.add(table)
+                raise
+
+            cursor = max([row.get('updated_at') or '' for row in changed] + [state["cursor"] or '']) or None
+            removed: List[str] = []
+            swept_at = state["swept_at"]
+            if sweep or state["cursor"] is None or time.time() - swept_at >= self.sweep_interval:
+                columns = ','.join(CATALOG_TABLES[table])
+                live = {self._pk(table, row)
+                        for row in self._fetch_all(client, f"{table}?select={columns}&order={pk_order}")}
+                with self._lock:
+                    removed = [pk for pk in self._rows[table] if pk not in live]
+                swept_at = time.time()
+
+            synced_at = time.time()
+            with self._lock:
+                self._db.execute("BEGIN")
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO catalog_rows (table_name, pk, updated_at, data) VALUES (?, ?, ?, ?)",
+                        [(table, self._pk(table, row), row.get('updated_at'), json.dumps(row)) for row in changed])
+                    self._db.executemany("DELETE FROM catalog_rows WHERE table_name = ? AND pk = ?",
+                                         [(table, pk) for pk in removed])
+                    self._db.execute("INSERT OR REPLACE INTO catalog_sync (table_name, cursor, synced_at, swept_at) "
+                                     "VALUES (?, ?, ?, ?)", (table, cursor, synced_at, swept_at))
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+                for row in changed:
+                    self._rows[table][self._pk(table, row)] = row
+                for pk in removed:
+                    self._rows[table].pop(pk, None)
+                self._state[table] = {"cursor": cursor, "synced_at": synced_at, "swept_at": swept_at}
+                self.stats["syncs"] += 1
+                self.stats["rows_pulled"] += len(changed)
+                self.stats["tombstones"] += len(removed)
+
+            if changed or removed:
+                print(f"DEBUG: Catalog replica {table}: {len(changed)} row(s) pulled, {len(removed)} removed")
+
+    @staticmethod
+    def _fetch_all(client, endpoint: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+        # Straight to Supabase - not through the replica or the read cache
+        rows: List[Dict[str, Any]] = []
+        while True:
+            page = client._send('GET', f"{endpoint}&limit={page_size}&offset={len(rows)}")
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            return dict(self.stats, tables={
+                table: {"rows": len(self._rows[table]), "disabled": table in self._disabled,
+                        "age_seconds": round(now - self._state[table]["synced_at"], 1) if table in self._state else None}
+                for table in CATALOG_TABLES
+            })
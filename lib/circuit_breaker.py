@@ -0,0 +1,92 @@
+"""
+Circuit Breaker
+Stops calling a failing backend for a while, so requests fail fast (or fall back) instead of waiting on timeouts
+"""
+
+import time
+import threading
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The call wasn't made because the circuit is open"""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures.
+
+    While open, calls are rejected with CircuitOpenError. Once `reset_timeout`
+    seconds have passed, a single trial call goes through (half-open): success
+    closes the circuit, failure opens it again for another `reset_timeout`.
+    before_call() returns a token naming the trial; passing it back to the
+    record_*/release calls keeps a call that started before the circuit opened
+    from re-opening it or letting a second trial through.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_token = 0
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def before_call(self) -> Optional[int]:
+        """Raises CircuitOpenError unless the call may go ahead; returns the trial token for a half-open trial, else None"""
+        with self._lock:
+            token = None
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_token += 1
+                token = self._trial_token
+            elif self._state != CLOSED:
+                self.stats["rejected"] += 1
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+                raise CircuitOpenError(f"{self.name} circuit open after repeated failures, retrying in {retry_in:.0f}s")
+            self.stats["calls"] += 1
+            return token
+
+    def _is_trial(self, token: Optional[int]) -> bool:
+        return token is not None and token == self._trial_token and self._trial_in_flight
+
+    def record_success(self, token: Optional[int] = None):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"DEBUG: {self.name} circuit closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, token: Optional[int] = None):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._failures += 1
+            # While half-open only the trial decides; a straggler from before the circuit opened doesn't
+            if (self._state == HALF_OPEN and self._is_trial(token)) or \
+                    (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self.stats["opened"] += 1
+                print(f"DEBUG: {self.name} circuit opened after {self._failures} consecutive failure(s)")
+
+    def release(self, token: Optional[int] = None):
+        """The call ended without saying anything about the backend; let the next trial through if this was one"""
+        with self._lock:
+            if self._is_trial(token):
+                self._trial_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, state=self._state, consecutive_failures=self._failures)
@@ -0,0 +1,122 @@
+"""
+Parsed File Cache
+Bounded in-process cache of parsed profile and survey files, validated by mtime and size
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .profile_extractor import PaiProfile
+from .response_predictor import SurveyQuestion
+
+
+class FileCache:
+    """LRU cache of parsed files keyed by path.
+
+    Entries are revalidated against the file's (mtime, size) at most once every
+    `revalidate_after` seconds, so hot paths don't touch the disk in steady state.
+    """
+
+    def __init__(self, loader: Callable[[str], Any], max_entries: int = 128, revalidate_after: float = 2.0):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _signature(filepath: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(filepath)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, filepath: str) -> Optional[Any]:
+        """Return the parsed contents of a file, or None if it doesn't exist"""
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry and now - entry[1] < self.revalidate_after:
+                self._entries.move_to_end(filepath)
+                self.hits += 1
+                return entry[2]
+
+        signature = self._signature(filepath)
+        if signature is None:
+            self.invalidate(filepath)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry and entry[0] == signature:
+                # File unchanged - just push the next revalidation out
+                self._entries[filepath] = (signature, now, entry[2])
+                self._entries.move_to_end(filepath)
+                self.hits += 1
+                return entry[2]
+
+        value = self.loader(filepath)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[filepath] = (signature, now, value)
+            self._entries.move_to_end(filepath)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self, filepath: str):
+        """Drop a cached entry, e.g. after the file has been rewritten"""
+        with self._lock:
+            self._entries.pop(filepath, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class CachedSurvey:
+    """Parsed validation survey with a question-id index"""
+
+    def __init__(self, survey: Dict[str, Any]):
+        self.raw = survey
+        self.questions: Dict[str, SurveyQuestion] = {}
+        self.question_data: Dict[str, Dict[str, Any]] = {}
+
+        for q in survey.get("questions", []):
+            self.question_data[q["id"]] = q
+            self.questions[q["id"]] = SurveyQuestion(
+                id=q["id"],
+                category=q["category"],
+                question=q["question"],
+                options=q["options"]
+            )
+
+
+def _load_profile(filepath: str) -> PaiProfile:
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return PaiProfile(**json.load(f))
+
+
+def _load_survey(filepath: str) -> CachedSurvey:
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return CachedSurvey(json.load(f))
+
+
+def create_profile_cache(max_entries: int = 256) -> FileCache:
+    """Cache of PaiProfile objects loaded from data/profiles/*_profile.json"""
+    return FileCache(_load_profile, max_entries=max_entries)
+
+
+def create_survey_cache(max_entries: int = 16) -> FileCache:
+    """Cache of CachedSurvey objects loaded from survey JSON files"""
+    return FileCache(_load_survey, max_entries=max_entries)
@@ -0,0 +1,140 @@
+"""
+Idempotency Cache
+Remembers the result of a request by idempotency key so retries get the same answer without redoing the work
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('PAI_IDEMPOTENCY_TTL', '600'))
+
+# Persisted results past the TTL are deleted by a sweep of persist_dir at most this often
+PERSIST_SWEEP_SECONDS = 60
+
+
+def request_key(*parts: Any) -> str:
+    """Stable key from the parts of a request that identify it (used when the client sends no key)"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class IdempotencyCache:
+    """Runs each keyed computation once per window.
+
+    The first request for a key computes the result; a concurrent duplicate
+    waits for that computation instead of starting its own, and a later retry
+    within `ttl_seconds` gets the stored result. Failures aren't remembered, so
+    a retry after an error runs again. With `persist_dir` set, results are also
+    written to disk for other requests served by the same container, and
+    deleted again once expired.
+    """
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, persist_dir: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.persist_dir = persist_dir
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._swept_at = 0.0
+        self.stats = {"computed": 0, "replayed": 0, "coalesced": 0, "files_removed": 0}
+
+    def run(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(result, replayed) - replayed is True when the result came from an earlier or in-flight request"""
+        self._expire()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                persisted = self._load_persisted(key)
+                if persisted is not None:
+                    self.stats["replayed"] += 1
+                    return persisted, True
+                entry = {"future": Future(), "created_at": time.time()}
+                self._entries[key] = entry
+                owner = True
+            else:
+                owner = False
+                self.stats["coalesced" if not entry["future"].done() else "replayed"] += 1
+
+        future: Future = entry["future"]
+        if not owner:
+            return future.result(), True
+
+        try:
+            result = compute()
+        except BaseException as e:
+            with self._lock:
+                self._entries.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        future.set_result(result)
+        with self._lock:
+            self.stats["computed"] += 1
+        self._persist(key, result)
+        return result, False
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [key for key, entry in self._entries.items()
+                       if entry["created_at"] < cutoff and entry["future"].done()]
+            for key in expired:
+                del self._entries[key]
+            sweep = bool(self.persist_dir) and time.time() - self._swept_at >= PERSIST_SWEEP_SECONDS
+            if sweep:
+                self._swept_at = time.time()
+        if sweep:
+            self._sweep_persisted(cutoff)
+
+    def _sweep_persisted(self, cutoff: float):
+        """Delete persisted results (and abandoned temp files) written before `cutoff`"""
+        removed = 0
+        try:
+            names = os.listdir(self.persist_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(('.json', '.tmp')):
+                continue
+            path = os.path.join(self.persist_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            with self._lock:
+                self.stats["files_removed"] += removed
+
+    def _persist_path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _persist(self, key: str, result: Any):
+        if not self.persist_dir:
+            return
+        try:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            tmp_path = self._persist_path(key) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"created_at": time.time(), "result": result}, f)
+            os.replace(tmp_path, self._persist_path(key))
+        except Exception as e:
+            print(f"DEBUG: Could not persist idempotent result {key}: {e}")
+
+    def _load_persisted(self, key: str) -> Optional[Any]:
+        if not self.persist_dir:
+            return None
+        try:
+            with open(self._persist_path(key), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if data.get("created_at", 0) < time.time() - self.ttl_seconds:
+            return None
+        return data.get("result")
@@ -0,0 +1,124 @@
+"""
+Interview Socket
+Helpers for the WebSocket interview channel: streaming Claude text into the event loop and batched session saves
+"""
+
+import os
+import time
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from .tracing import wrap_context
+
+
+# A connection's session is saved at most this often while turns keep coming (and always on close)
+PERSIST_INTERVAL_SECONDS = float(os.getenv('PAI_INTERVIEW_WS_PERSIST_INTERVAL', '5'))
+
+_DONE = object()
+
+
+async def iterate_in_thread(make_iterator: Callable[[], Iterator[str]]) -> AsyncIterator[str]:
+    """Run a blocking iterator (a Claude stream) on a worker thread and yield its items in the event loop"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def produce():
+        iterator = make_iterator()
+        try:
+            for item in iterator:
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            # Releases the LLM slot if the consumer went away mid-stream
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    worker = threading.Thread(target=wrap_context(produce), name="pai-interview-stream", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+class BatchedSessionWriter:
+    """Saves one connection's interview session in the background, coalescing turns.
+
+    mark_dirty() is called after every turn. The writer saves a snapshot of
+    the session at most once per `interval` seconds, so a burst of turns costs
+    one write, and never blocks the turn that triggered it. close() waits for
+    a final save of anything not yet written.
+    """
+
+    def __init__(self, save: Callable[[object], str], interval: float = PERSIST_INTERVAL_SECONDS):
+        self.save = save
+        self.interval = interval
+        self._dirty = asyncio.Event()
+        self._session = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_in_flight: Optional[asyncio.Future] = None
+        self._closed = False
+        self.saves = 0
+        self.turns = 0
+        self.last_path: Optional[str] = None
+
+    def mark_dirty(self, session):
+        self._session = session
+        self.turns += 1
+        self._dirty.set()
+        if self._task is None and not self._closed:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._dirty.wait()
+            started = time.monotonic()
+            # Shielded, so close() cancelling the loop never abandons a save half-way
+            self._write_in_flight = asyncio.ensure_future(self._write())
+            await asyncio.shield(self._write_in_flight)
+            # Turns arriving during the pause are folded into the next save
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def _write(self):
+        if not self._dirty.is_set() or self._session is None:
+            return
+        self._dirty.clear()
+        # Snapshot in the event loop, where turns are applied, so a save never sees half a turn
+        snapshot = self._session.model_copy(deep=True)
+        try:
+            self.last_path = await asyncio.to_thread(self.save, snapshot)
+            self.saves += 1
+        except Exception as e:
+            self._dirty.set()
+            print(f"DEBUG: Interview session save failed for {snapshot.session_id}, will retry: {e}")
+
+    async def close(self) -> Optional[str]:
+        """Stop the background saves and write whatever is still unsaved; returns the saved file"""
+        if self._closed:
+            return self.last_path
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._write_in_flight is not None:
+            await self._write_in_flight
+        await self._write()
+        if self.turns:
+            print(f"DEBUG: Interview socket saved {self.turns} turn(s) in {self.saves} write(s)")
+        return self.last_path
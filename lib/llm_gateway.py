@@ -0,0 +1,257 @@
+"""
+LLM Gateway
+Single entry point for Claude calls: shared client, per-call-type config, concurrency, retries and deadlines
+"""
+
+import os
+import time
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Any
+
+import anthropic
+
+from .tracing import traced_messages_create, traced_messages_stream, span
+from .llm_scheduler import LLMScheduler, LLMAdmissionRejected, INTERACTIVE, NEAR_REAL_TIME, BATCH
+from .adaptive_limiter import AIMDLimiter
+
+
+DEFAULT_MODEL = os.getenv('PAI_LLM_MODEL', 'claude-3-5-sonnet-20241022')
+
+# Calls allowed in flight at once across the process; waiting calls are
+# ordered by priority class (see llm_scheduler). With adaptive concurrency on,
+# this is the starting point and the limit moves between the min and ceiling.
+MAX_CONCURRENCY = int(os.getenv('PAI_LLM_MAX_CONCURRENCY', '8'))
+# Slots only interactive calls (live interview turns, twin chat) may use
+INTERACTIVE_RESERVED = int(os.getenv('PAI_LLM_INTERACTIVE_RESERVED', '2'))
+ADAPTIVE_CONCURRENCY = os.getenv('PAI_LLM_ADAPTIVE', '1') != '0'
+MIN_CONCURRENCY = int(os.getenv('PAI_LLM_MIN_CONCURRENCY', '2'))
+CONCURRENCY_CEILING = int(os.getenv('PAI_LLM_CONCURRENCY_CEILING', '32'))
+
+MAX_ATTEMPTS = int(os.getenv('PAI_LLM_MAX_ATTEMPTS', '4'))
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 8.0
+RETRYABLE_STATUS = {429, 529}
+
+# model / max_tokens / deadline (seconds) / default priority class
+CALL_TYPES: Dict[str, Dict[str, Any]] = {
+    "interview_turn": {"max_tokens": 1000, "deadline": 30, "priority": INTERACTIVE},
+    "twin_chat": {"max_tokens": 300, "deadline": 30, "priority": INTERACTIVE},
+    "profile_extraction": {"max_tokens": 2000, "deadline": 120, "priority": NEAR_REAL_TIME},
+    "structured_profile_extraction": {"max_tokens": 8000, "deadline": 240, "priority": NEAR_REAL_TIME},
+    "prediction": {"max_tokens": 1500, "deadline": 60, "priority": BATCH},
+}
+
+
+class LLMDeadlineExceeded(Exception):
+    """Raised when a call can't complete (including queueing and retries) within its deadline"""
+
+
+def call_config(call_type: str) -> Dict[str, Any]:
+    """Config for a call type; PAI_LLM_MODEL_<TYPE> / PAI_LLM_MAX_TOKENS_<TYPE> override the defaults"""
+    if call_type not in CALL_TYPES:
+        raise ValueError(f"Unknown LLM call type: {call_type}")
+
+    config = dict(CALL_TYPES[call_type])
+    env_key = call_type.upper()
+    config["model"] = os.getenv(f'PAI_LLM_MODEL_{env_key}', config.get("model", DEFAULT_MODEL))
+    config["max_tokens"] = int(os.getenv(f'PAI_LLM_MAX_TOKENS_{env_key}', config["max_tokens"]))
+    config["deadline"] = float(os.getenv(f'PAI_LLM_DEADLINE_{env_key}', config["deadline"]))
+    return config
+
+
+class LLMGateway:
+    """Shared Anthropic client that every LLM call in the app goes through"""
+
+    def __init__(self, api_key: str, max_concurrency: int = MAX_CONCURRENCY,
+                 interactive_reserved: int = INTERACTIVE_RESERVED):
+        # Retries are handled here so they respect the concurrency limit and deadline
+        self.client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+        self.max_concurrency = max_concurrency
+        self.scheduler = LLMScheduler(max_concurrency, interactive_reserved=interactive_reserved)
+        self.limiter = None
+        if ADAPTIVE_CONCURRENCY:
+            self.limiter = AIMDLimiter(
+                initial=max_concurrency,
+                min_limit=MIN_CONCURRENCY,
+                max_limit=max(CONCURRENCY_CEILING, max_concurrency),
+                on_change=self.scheduler.set_capacity
+            )
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "deadline_exceeded": 0, "in_flight": 0}
+
+    def create(self, call_type: str, messages: List[Dict[str, Any]], system: Optional[str] = None,
+               temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+               deadline: Optional[float] = None, priority: Optional[str] = None, model: Optional[str] = None):
+        """Make a messages.create call for a configured call type.
+
+        Waits for a slot in its priority class (the call type's default unless
+        `priority` is given), retries 429/529 with jittered backoff and gives up
+        with LLMDeadlineExceeded once `deadline` seconds have passed. `model`
+        overrides the call type's model for one-off comparisons.
+        """
+        config, kwargs, deadline_at = self._prepare(call_type, messages, system, temperature, max_tokens,
+                                                    deadline, priority, model)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return self._attempt(call_type, config, kwargs, deadline_at)
+            except anthropic.APIStatusError as e:
+                self._retry(call_type, attempt, e, deadline_at)
+
+    def stream(self, call_type: str, messages: List[Dict[str, Any]], system: Optional[str] = None,
+               temperature: Optional[float] = None, max_tokens: Optional[int] = None,
+               deadline: Optional[float] = None, priority: Optional[str] = None, model: Optional[str] = None
+               ) -> Iterator[str]:
+        """Like create(), but yields the response text as it is generated.
+
+        The call holds its slot until the stream is exhausted or closed. 429/529
+        are retried only before the first text arrives; after that an error
+        propagates to the caller, who already has part of the response.
+        """
+        config, kwargs, deadline_at = self._prepare(call_type, messages, system, temperature, max_tokens,
+                                                    deadline, priority, model)
+        attempt = 0
+        while True:
+            attempt += 1
+            emitted = False
+            try:
+                for text in self._stream_attempt(call_type, config, kwargs, deadline_at):
+                    emitted = True
+                    yield text
+                return
+            except anthropic.APIStatusError as e:
+                if emitted:
+                    raise
+                self._retry(call_type, attempt, e, deadline_at)
+
+    def _prepare(self, call_type, messages, system, temperature, max_tokens, deadline, priority, model):
+        config = call_config(call_type)
+        if priority:
+            config["priority"] = priority
+        if model:
+            config["model"] = model
+        deadline_at = time.monotonic() + (deadline or config["deadline"])
+
+        kwargs: Dict[str, Any] = {
+            "model": config["model"],
+            "max_tokens": max_tokens or config["max_tokens"],
+            "messages": messages,
+        }
+        if system is not None:
+            kwargs["system"] = system
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+
+        with self._stats_lock:
+            self.stats["calls"] += 1
+        return config, kwargs, deadline_at
+
+    def _retry(self, call_type: str, attempt: int, error: anthropic.APIStatusError, deadline_at: float):
+        """Sleep before retrying a failed attempt, or re-raise if it can't be retried"""
+        if error.status_code not in RETRYABLE_STATUS or attempt >= MAX_ATTEMPTS:
+            raise error
+        delay = self._backoff(attempt, error)
+        if time.monotonic() + delay >= deadline_at:
+            self._deadline_exceeded()
+            raise LLMDeadlineExceeded(
+                f"{call_type} still failing with {error.status_code} after {attempt} attempts"
+            ) from error
+
+        print(f"DEBUG: {call_type} got {error.status_code}, retrying in {delay:.1f}s (attempt {attempt})")
+        with self._stats_lock:
+            self.stats["retries"] += 1
+        time.sleep(delay)
+
+    def _attempt(self, call_type: str, config: Dict[str, Any], kwargs: Dict[str, Any], deadline_at: float):
+        with self._slot(call_type, config, deadline_at) as started:
+            return traced_messages_create(self.client, call_type, timeout=deadline_at - started, **kwargs)
+
+    def _stream_attempt(self, call_type: str, config: Dict[str, Any], kwargs: Dict[str, Any], deadline_at: float):
+        with self._slot(call_type, config, deadline_at) as started:
+            yield from traced_messages_stream(self.client, call_type, timeout=deadline_at - started, **kwargs)
+
+    @contextmanager
+    def _slot(self, call_type: str, config: Dict[str, Any], deadline_at: float):
+        """Hold a scheduler slot for one attempt, feeding its outcome to the adaptive limiter"""
+        priority = config["priority"]
+        with span("llm_queue", call_type, priority=priority):
+            remaining = deadline_at - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError
+                self.scheduler.acquire(priority, timeout=remaining)
+            except TimeoutError as e:
+                self._deadline_exceeded()
+                raise LLMDeadlineExceeded(f"{call_type} waited too long for a free LLM slot") from e
+
+        started = time.monotonic()
+        in_flight = self.scheduler.in_flight
+        with self._stats_lock:
+            self.stats["in_flight"] += 1
+        try:
+            yield started
+            if self.limiter:
+                self.limiter.record_success(call_type, time.monotonic() - started, in_flight)
+        except anthropic.APITimeoutError as e:
+            if self.limiter:
+                self.limiter.record_error(call_type)
+            self._deadline_exceeded()
+            raise LLMDeadlineExceeded(f"{call_type} timed out") from e
+        except anthropic.APIStatusError as e:
+            if self.limiter:
+                if e.status_code in RETRYABLE_STATUS:
+                    self.limiter.record_overload(call_type, e.status_code)
+                else:
+                    self.limiter.record_error(call_type)
+            raise
+        except anthropic.APIConnectionError:
+            if self.limiter:
+                self.limiter.record_error(call_type)
+            raise
+        finally:
+            with self._stats_lock:
+                self.stats["in_flight"] -= 1
+            self.scheduler.release(priority, time.monotonic() - started)
+
+    @staticmethod
+    def _backoff(attempt: int, error: anthropic.APIStatusError) -> float:
+        """Full-jitter exponential backoff, honouring retry-after when the API sends one"""
+        retry_after = None
+        try:
+            retry_after = float(error.response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            pass
+
+        ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _deadline_exceeded(self):
+        with self._stats_lock:
+            self.stats["deadline_exceeded"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats, max_concurrency=self.max_concurrency)
+        stats["scheduler"] = self.scheduler.metrics()
+        stats["concurrency_limit"] = self.limiter.snapshot() if self.limiter else {"limit": self.scheduler.capacity}
+        return stats
+
+
+_gateways: Dict[str, LLMGateway] = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(api_key: Optional[str] = None) -> LLMGateway:
+    """Process-wide gateway (one per API key) so every caller shares the client and limits"""
+    api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        raise Exception('ANTHROPIC_API_KEY environment variable is required')
+
+    with _gateways_lock:
+        if api_key not in _gateways:
+            _gateways[api_key] = LLMGateway(api_key)
+        return _gateways[api_key]
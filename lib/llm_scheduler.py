@@ -0,0 +1,196 @@
+"""
+LLM Scheduler
+Priority-aware admission and weighted fair queuing for Claude calls
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any
+
+
+INTERACTIVE = "interactive"        # a participant is waiting on this turn
+NEAR_REAL_TIME = "near_real_time"  # someone will look at the result shortly
+BATCH = "batch"                    # bulk predictions, prefetch, offline runs
+
+PRIORITIES = [INTERACTIVE, NEAR_REAL_TIME, BATCH]
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 8.0, NEAR_REAL_TIME: 3.0, BATCH: 1.0}
+DEFAULT_MAX_QUEUE = {INTERACTIVE: 64, NEAR_REAL_TIME: 128, BATCH: 512}
+
+WAIT_SAMPLES = 500
+
+
+class LLMAdmissionRejected(Exception):
+    """Raised when a call is turned away instead of queued (queue full or it can't start in time)"""
+
+
+class _Waiter:
+    __slots__ = ("priority", "finish_tag", "enqueued_at", "granted")
+
+    def __init__(self, priority: str, finish_tag: float):
+        self.priority = priority
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class LLMScheduler:
+    """Hands out a fixed number of in-flight slots across priority classes.
+
+    Waiting calls are ordered by weighted fair queuing: each class advances its
+    own virtual finish tag by 1/weight per request, and the waiter with the
+    smallest tag is granted the next free slot. Interactive work therefore gets
+    most of the capacity under contention without starving batch work entirely.
+    Slots are not preempted, so `interactive_reserved` of them (always leaving
+    one for the other classes) are kept for interactive calls; a burst of batch
+    work can never make a live turn wait for a whole Claude call to finish.
+    """
+
+    def __init__(self, capacity: int, weights: Optional[Dict[str, float]] = None,
+                 max_queue: Optional[Dict[str, int]] = None, interactive_reserved: int = 0):
+        self.capacity = capacity
+        self.interactive_reserved = max(0, interactive_reserved)
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.max_queue = dict(DEFAULT_MAX_QUEUE, **(max_queue or {}))
+
+        self._cond = threading.Condition()
+        self._waiters: List[_Waiter] = []
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._last_finish = {p: 0.0 for p in PRIORITIES}
+
+        # Recent service time, used to estimate how long a new arrival would wait
+        self._service_ewma: Optional[float] = None
+
+        self._counters = {p: {"admitted": 0, "rejected": 0, "timed_out": 0, "completed": 0, "in_flight": 0}
+                          for p in PRIORITIES}
+        self._waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITIES}
+
+    def set_capacity(self, capacity: int):
+        """Change how many calls may be in flight; extra slots are handed out immediately"""
+        with self._cond:
+            self.capacity = max(1, capacity)
+            self._dispatch()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def shared_capacity(self) -> int:
+        """Slots the non-interactive classes may hold at once"""
+        return max(1, self.capacity - self.interactive_reserved)
+
+    @contextmanager
+    def slot(self, priority: str, timeout: Optional[float] = None):
+        """Hold an in-flight slot for the duration of the block"""
+        self.acquire(priority, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(priority, time.monotonic() - started)
+
+    def acquire(self, priority: str, timeout: Optional[float] = None):
+        """Wait for a slot; raises LLMAdmissionRejected, or TimeoutError if `timeout` passes first"""
+        if priority not in self.weights:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        with self._cond:
+            queued = sum(1 for w in self._waiters if w.priority == priority)
+            if queued >= self.max_queue[priority]:
+                self._counters[priority]["rejected"] += 1
+                raise LLMAdmissionRejected(f"{priority} queue is full ({queued} waiting)")
+
+            finish_tag = max(self._virtual_time, self._last_finish[priority]) + 1.0 / self.weights[priority]
+            if timeout is not None and self._estimated_wait(priority, finish_tag) > timeout:
+                self._counters[priority]["rejected"] += 1
+                raise LLMAdmissionRejected(f"{priority} call would not start within {timeout:.1f}s")
+            # Only admitted calls advance the class's virtual clock
+            self._last_finish[priority] = finish_tag
+
+            waiter = _Waiter(priority, finish_tag)
+            self._waiters.append(waiter)
+            self._counters[priority]["admitted"] += 1
+            self._dispatch()
+
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            while not waiter.granted:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(waiter)
+                    self._counters[priority]["timed_out"] += 1
+                    raise TimeoutError(f"{priority} call waited {timeout:.1f}s for an LLM slot")
+                self._cond.wait(remaining)
+
+            self._waits[priority].append(time.monotonic() - waiter.enqueued_at)
+
+    def release(self, priority: str, service_seconds: Optional[float] = None):
+        with self._cond:
+            self._in_flight -= 1
+            self._counters[priority]["in_flight"] -= 1
+            self._counters[priority]["completed"] += 1
+            if service_seconds is not None:
+                self._service_ewma = service_seconds if self._service_ewma is None \
+                    else 0.8 * self._service_ewma + 0.2 * service_seconds
+            self._dispatch()
+
+    def _shared_in_flight(self) -> int:
+        return self._in_flight - self._counters[INTERACTIVE]["in_flight"]
+
+    def _dispatch(self):
+        """Grant free slots to the waiters with the smallest finish tags (lock held)"""
+        granted_any = False
+        while self._in_flight < self.capacity and self._waiters:
+            candidates = self._waiters
+            if self._shared_in_flight() >= self.shared_capacity:
+                # Only the reserved slots are left
+                candidates = [w for w in self._waiters if w.priority == INTERACTIVE]
+                if not candidates:
+                    break
+            waiter = min(candidates, key=lambda w: w.finish_tag)
+            self._waiters.remove(waiter)
+            waiter.granted = True
+            self._virtual_time = max(self._virtual_time, waiter.finish_tag)
+            self._in_flight += 1
+            self._counters[waiter.priority]["in_flight"] += 1
+            granted_any = True
+        if granted_any:
+            self._cond.notify_all()
+
+    def _estimated_wait(self, priority: str, finish_tag: float) -> float:
+        """Rough wait for a new arrival: the work queued ahead of it spread over the slots it may use (lock held)"""
+        if self._service_ewma is None:
+            return 0.0
+        ahead = sum(1 for w in self._waiters if w.finish_tag <= finish_tag)
+        free = self.capacity - self._in_flight
+        slots = self.capacity
+        if priority != INTERACTIVE:
+            free = min(free, self.shared_capacity - self._shared_in_flight())
+            slots = self.shared_capacity
+        if ahead < free:
+            return 0.0
+        return self._service_ewma * (ahead - max(free, 0) + 1) / max(slots, 1)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, in-flight and wait-time percentiles per priority class"""
+        with self._cond:
+            result: Dict[str, Any] = {
+                "capacity": self.capacity,
+                "interactive_reserved": self.capacity - self.shared_capacity,
+                "in_flight": self._in_flight,
+                "service_ewma_ms": round(self._service_ewma * 1000, 1) if self._service_ewma is not None else None,
+                "classes": {}
+            }
+            for priority in PRIORITIES:
+                waits = sorted(self._waits[priority])
+                result["classes"][priority] = dict(
+                    self._counters[priority],
+                    weight=self.weights[priority],
+                    queue_depth=sum(1 for w in self._waiters if w.priority == priority),
+                    wait_p50_ms=round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+                    wait_p95_ms=round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+                )
+            return result
@@ -0,0 +1,494 @@
+"""
+Panel Simulation
+Fields a survey to every active digital twin and aggregates the predicted answers
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from .profile_extractor import PaiProfile, profile_from_version
+from .response_predictor import ResponsePredictor, SurveyQuestion, PredictionResult
+from .llm_gateway import call_config
+from .llm_scheduler import BATCH
+from .tracing import wrap_context
+from .sampling_stats import wilson_interval, CI_LEVEL
+
+
+PANEL_DIR = os.getenv('PAI_PANEL_DIR', '/tmp/pai_panel_runs')
+STORE_BATCH_SIZE = 100
+OTHER_ANSWER = "(other)"
+MISSING_VALUE = "(missing)"
+
+# Profile fields are only offered as cross-tab dimensions when they split the
+# panel into a handful of groups
+MAX_AUTO_DIMENSIONS = 5
+MAX_DIMENSION_VALUES = 8
+
+# Sequential sampling never stops before this many twins have answered
+MIN_SEQUENTIAL_TWINS = 20
+
+
+class PanelFilter(BaseModel):
+    """Which active twins take part in a panel run"""
+    profile_ids: Optional[List[str]] = None
+    person_names: Optional[List[str]] = None
+    attributes: Dict[str, List[str]] = {}  # "section.field" -> accepted values
+    latest_version_only: bool = True
+    limit: Optional[int] = None
+
+
+class PanelMember(BaseModel):
+    profile_id: str
+    person_name: str
+    version_number: int
+    attributes: Dict[str, str]  # flattened "section.field" -> value, used for filters and cross-tabs
+    profile: PaiProfile
+
+
+def flatten_profile_attributes(profile_version: Dict[str, Any]) -> Dict[str, str]:
+    """Scalar profile values keyed by "section.field" (structured and legacy profiles)"""
+    raw_profile_data = profile_version.get('profile_data') or {}
+    sections = raw_profile_data.get('profile_data', raw_profile_data)
+
+    attributes = {}
+    for section_name, fields in sections.items():
+        if not isinstance(fields, dict):
+            continue
+        for field_name, field_data in fields.items():
+            value = field_data.get('value') if isinstance(field_data, dict) else field_data
+            if isinstance(value, list) and all(isinstance(v, (str, int, float, bool)) for v in value):
+                value = ", ".join(str(v) for v in value)
+            if isinstance(value, (str, int, float, bool)) and str(value).strip():
+                attributes[f"{section_name}.{field_name}"] = str(value).strip()
+    return attributes
+
+
+def stratified_order(members: List[PanelMember], stratify_by: Optional[str], seed: str) -> List[PanelMember]:
+    """Random order in which every prefix keeps each stratum close to its share of the panel.
+
+    Twins are shuffled within their stratum, and the k-th twin of a stratum of
+    size n is placed at (k + u) / n for a random offset u, so strata interleave
+    proportionally. Seeded by the run id, so a resumed run samples the same order.
+    """
+    rng = random.Random(seed)
+    strata: Dict[str, List[PanelMember]] = {}
+    for member in members:
+        key = member.attributes.get(stratify_by, MISSING_VALUE) if stratify_by else ""
+        strata.setdefault(key, []).append(member)
+
+    keyed = []
+    for key in sorted(strata):
+        group = strata[key]
+        rng.shuffle(group)
+        offset = rng.random()
+        keyed.extend(((k + offset) / len(group), rng.random(), member) for k, member in enumerate(group))
+    return [member for _, _, member in sorted(keyed, key=lambda item: item[:2])]
+
+
+def survey_questions_from_template(survey_template: Dict[str, Any]) -> List[SurveyQuestion]:
+    return [
+        SurveyQuestion(
+            id=q.get('id'),
+            category=q.get('category', 'General'),
+            question=q.get('question', ''),
+            options=q.get('options', [])
+        )
+        for q in survey_template.get('questions', [])
+    ]
+
+
+class PanelCheckpoint:
+    """Append-only NDJSON log of a run's predictions, so an interrupted run picks up where it stopped"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.stored: set = set()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from a crash
+                if record.get('type') == 'stored':
+                    self.stored.update(tuple(key) for key in record['keys'])
+                else:
+                    self.results[(record['profile_id'], record['question_id'])] = record
+
+    def _append(self, record: Dict[str, Any]):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+
+    def add_result(self, record: Dict[str, Any]):
+        self._append(dict(record, type='result'))
+        with self._lock:
+            self.results[(record['profile_id'], record['question_id'])] = record
+
+    def mark_stored(self, keys: List[Tuple[str, str]]):
+        self._append({'type': 'stored', 'keys': [list(key) for key in keys]})
+        with self._lock:
+            self.stored.update(keys)
+
+
+class PanelSimulator:
+    """Runs a survey against a panel of twins with checkpointing, bulk storage and NumPy aggregates.
+
+    Every (twin, question) prediction goes through the shared LLM gateway at
+    BATCH priority, so a large panel run yields to interview turns and the
+    validation pages instead of competing with them.
+    """
+
+    def __init__(self, predictor: ResponsePredictor, supabase=None, max_workers: int = 8,
+                 panel_dir: str = PANEL_DIR, store_results: bool = True):
+        self.predictor = predictor
+        self.supabase = supabase
+        self.max_workers = max_workers
+        self.panel_dir = panel_dir
+        self.store_results = store_results and supabase is not None
+        self.model_version = call_config('prediction')['model']
+
+    # ------------------------------------------------------------------
+    # Panel selection
+    # ------------------------------------------------------------------
+
+    def load_panel(self, twin_filter: Optional[PanelFilter] = None) -> List[PanelMember]:
+        """Active twins from profile_versions that match the filter"""
+        twin_filter = twin_filter or PanelFilter()
+        rows = self.supabase.get_active_profiles() if self.supabase else []
+
+        if twin_filter.latest_version_only and twin_filter.profile_ids is None:
+            latest: Dict[str, Dict[str, Any]] = {}
+            for row in rows:
+                current = latest.get(row['person_name'])
+                if current is None or row.get('version_number', 1) > current.get('version_number', 1):
+                    latest[row['person_name']] = row
+            rows = list(latest.values())
+
+        members = []
+        for row in sorted(rows, key=lambda r: r['profile_id']):
+            if twin_filter.profile_ids is not None and row['profile_id'] not in twin_filter.profile_ids:
+                continue
+            if twin_filter.person_names is not None and row['person_name'] not in twin_filter.person_names:
+                continue
+
+            attributes = flatten_profile_attributes(row)
+            if any(attributes.get(key) not in accepted for key, accepted in twin_filter.attributes.items()):
+                continue
+
+            try:
+                profile = profile_from_version(row)
+            except Exception as e:
+                print(f"DEBUG: Skipping twin {row['profile_id']} - profile could not be loaded: {e}")
+                continue
+
+            members.append(PanelMember(
+                profile_id=row['profile_id'],
+                person_name=row['person_name'],
+                version_number=row.get('version_number', 1),
+                attributes=attributes,
+                profile=profile
+            ))
+            if twin_filter.limit and len(members) >= twin_filter.limit:
+                break
+
+        print(f"DEBUG: Panel has {len(members)} twins")
+        return members
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def default_run_id(survey_name: str, members: List[PanelMember], questions: List[SurveyQuestion]) -> str:
+        """Same survey + same twins + same questions -> same run id, so re-running resumes"""
+        fingerprint = "|".join([survey_name]
+                               + sorted(m.profile_id for m in members)
+                               + sorted(q.id for q in questions))
+        return f"panel_{survey_name}_{hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:12]}"
+
+    def run(self, survey_template: Dict[str, Any], twin_filter: Optional[PanelFilter] = None,
+            run_id: Optional[str] = None, members: Optional[List[PanelMember]] = None,
+            dimensions: Optional[List[str]] = None, target_ci_width: Optional[float] = None,
+            stratify_by: Optional[str] = None, min_twins: int = MIN_SEQUENTIAL_TWINS) -> Dict[str, Any]:
+        """Predict every question for every twin (skipping anything already checkpointed) and aggregate.
+
+        With `target_ci_width`, twins are sampled in stratified random order and
+        the run stops once every option share's confidence interval is at most
+        that wide. Running again without it completes the same run.
+        """
+        survey_name = survey_template.get('survey_name', 'survey')
+        questions = survey_questions_from_template(survey_template)
+        members = members if members is not None else self.load_panel(twin_filter)
+        run_id = run_id or self.default_run_id(survey_name, members, questions)
+
+        os.makedirs(self.panel_dir, exist_ok=True)
+        checkpoint = PanelCheckpoint(os.path.join(self.panel_dir, f"{run_id}.ndjson"))
+
+        resumed = sum(1 for m in members for q in questions if (m.profile_id, q.id) in checkpoint.results)
+        print(f"DEBUG: Panel run {run_id}: {len(members) * len(questions) - resumed} predictions to make, "
+              f"{resumed} already checkpointed")
+
+        started = time.time()
+        panel_size = len(members)
+        sequential = None
+        if target_ci_width:
+            members, failures, sequential = self._run_sequential(
+                members, questions, checkpoint, run_id, target_ci_width, stratify_by, min_twins)
+        else:
+            failures = self._predict_all(self._pending(members, questions, checkpoint), checkpoint)
+        self._store_pending(checkpoint)
+
+        summary = {
+            "run_id": run_id,
+            "survey_name": survey_name,
+            "twins": panel_size,
+            "questions": len(questions),
+            "predictions": len(checkpoint.results),
+            "resumed_from_checkpoint": resumed,
+            "failed": failures,
+            "stored": len(checkpoint.stored),
+            "duration_seconds": round(time.time() - started, 1),
+            "sequential": sequential,
+            "aggregates": aggregate_panel(questions, members, checkpoint.results, dimensions),
+        }
+
+        with open(os.path.join(self.panel_dir, f"{run_id}_summary.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+    @staticmethod
+    def _pending(members: List[PanelMember], questions: List[SurveyQuestion],
+                 checkpoint: PanelCheckpoint) -> List[Tuple[PanelMember, SurveyQuestion]]:
+        return [(member, question) for member in members for question in questions
+                if (member.profile_id, question.id) not in checkpoint.results]
+
+    def _run_sequential(self, members: List[PanelMember], questions: List[SurveyQuestion],
+                        checkpoint: PanelCheckpoint, run_id: str, target_ci_width: float,
+                        stratify_by: Optional[str], min_twins: int) -> Tuple[List[PanelMember], int, Dict[str, Any]]:
+        """Sample twins a round at a time until every option share's CI is narrow enough"""
+        order = stratified_order(members, stratify_by, run_id)
+        round_size = max(self.max_workers, 1)
+        sampled: List[PanelMember] = []
+        failures = 0
+        calls_made = 0
+        width = None
+
+        for start in range(0, len(order), round_size):
+            batch = order[start:start + round_size]
+            jobs = self._pending(batch, questions, checkpoint)
+            calls_made += len(jobs)
+            failures += self._predict_all(jobs, checkpoint)
+            sampled.extend(batch)
+
+            if len(sampled) >= min(min_twins, len(order)):
+                width = max_ci_width(questions, sampled, checkpoint.results)
+                print(f"DEBUG: Panel run {run_id}: {len(sampled)}/{len(order)} twins, widest CI {width:.3f}")
+                if width <= target_ci_width:
+                    break
+
+        total_calls = len(order) * len(questions)
+        remaining = len(order) - len(sampled)
+        return sampled, failures, {
+            "target_ci_width": target_ci_width,
+            "ci_level": CI_LEVEL,
+            "stratify_by": stratify_by,
+            "widest_ci": round(width, 4) if width is not None else None,
+            "stopped_early": remaining > 0,
+            "twins_sampled": len(sampled),
+            "twins_remaining": remaining,
+            "llm_calls_made": calls_made,
+            "llm_calls_saved": remaining * len(questions),
+            "llm_calls_full_panel": total_calls,
+        }
+
+    def _predict_all(self, jobs: List[Tuple[PanelMember, SurveyQuestion]], checkpoint: PanelCheckpoint) -> int:
+        """Fan predictions out over the worker pool; returns the number that failed"""
+        failures = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pai-panel") as executor:
+            futures = {
+                executor.submit(wrap_context(self.predictor.predict_response), member.profile, question, BATCH):
+                    (member, question)
+                for member, question in jobs
+            }
+            for future in as_completed(futures):
+                member, question = futures[future]
+                try:
+                    prediction: PredictionResult = future.result()
+                except Exception as e:
+                    failures += 1
+                    print(f"DEBUG: Panel prediction failed for {member.profile_id}/{question.id}: {e}")
+                    continue
+
+                checkpoint.add_result({
+                    "profile_id": member.profile_id,
+                    "question_id": question.id,
+                    "predicted_answer": prediction.predicted_answer,
+                    "confidence": prediction.confidence,
+                    "reasoning": prediction.reasoning,
+                })
+                if len(checkpoint.results) - len(checkpoint.stored) >= STORE_BATCH_SIZE:
+                    self._store_pending(checkpoint)
+        return failures
+
+    def _store_pending(self, checkpoint: PanelCheckpoint):
+        """Write checkpointed predictions that haven't reached ai_predictions yet, in bulk"""
+        if not self.store_results:
+            return
+
+        pending = [key for key in list(checkpoint.results) if key not in checkpoint.stored]
+        for start in range(0, len(pending), STORE_BATCH_SIZE):
+            keys = pending[start:start + STORE_BATCH_SIZE]
+            rows = [{
+                'profile_id': checkpoint.results[key]['profile_id'],
+                'question_id': checkpoint.results[key]['question_id'],
+                'predicted_response': checkpoint.results[key]['predicted_answer'],
+                'confidence_score': checkpoint.results[key]['confidence'],
+                'reasoning': checkpoint.results[key]['reasoning'],
+                'model_version': self.model_version,
+            } for key in keys]
+            try:
+                self.supabase.insert_ai_predictions(rows)
+                checkpoint.mark_stored(keys)
+            except Exception as e:
+                # Left unmarked so the next run (or resume) stores them
+                print(f"DEBUG: Bulk store of {len(rows)} panel predictions failed: {e}")
+                return
+
+
+# ----------------------------------------------------------------------
+# Aggregation
+# ----------------------------------------------------------------------
+
+def _pick_dimensions(members: List[PanelMember]) -> List[str]:
+    """Profile fields that split the panel into a few groups, most populated first"""
+    values: Dict[str, set] = {}
+    counts: Dict[str, int] = {}
+    for member in members:
+        for key, value in member.attributes.items():
+            values.setdefault(key, set()).add(value)
+            counts[key] = counts.get(key, 0) + 1
+
+    candidates = [key for key, vals in values.items()
+                  if 2 <= len(vals) <= min(MAX_DIMENSION_VALUES, max(2, len(members) // 2))]
+    return sorted(candidates, key=lambda key: (-counts[key], key))[:MAX_AUTO_DIMENSIONS]
+
+
+def _answer_matrix(questions: List[SurveyQuestion], members: List[PanelMember],
+                   results: Dict[Tuple[str, str], Dict[str, Any]]) -> Tuple[List[List[str]], np.ndarray, np.ndarray]:
+    """Option labels per question plus (twins x questions) answer-index and confidence matrices.
+
+    Missing predictions are -1; answers that aren't one of the options land in
+    a trailing OTHER_ANSWER bucket.
+    """
+    profile_index = {m.profile_id: i for i, m in enumerate(members)}
+
+    labels = [list(q.options) + [OTHER_ANSWER] for q in questions]
+    option_index = [{option.strip(): i for i, option in enumerate(q.options)} for q in questions]
+    question_index = {q.id: j for j, q in enumerate(questions)}
+
+    answers = np.full((len(members), len(questions)), -1, dtype=np.int64)
+    confidence = np.zeros((len(members), len(questions)), dtype=np.float64)
+    for (profile_id, question_id), record in results.items():
+        i, j = profile_index.get(profile_id), question_index.get(question_id)
+        if i is None or j is None:
+            continue
+        answer = str(record.get('predicted_answer', '')).strip()
+        answers[i, j] = option_index[j].get(answer, len(labels[j]) - 1)
+        confidence[i, j] = float(record.get('confidence') or 0.0)
+    return labels, answers, confidence
+
+
+def max_ci_width(questions: List[SurveyQuestion], members: List[PanelMember],
+                 results: Dict[Tuple[str, str], Dict[str, Any]], level: float = CI_LEVEL) -> float:
+    """Widest option-share confidence interval across all questions"""
+    labels, answers, _ = _answer_matrix(questions, members, results)
+    widest = 0.0
+    for j in range(len(questions)):
+        idx = answers[:, j][answers[:, j] >= 0]
+        low, high = wilson_interval(np.bincount(idx, minlength=len(labels[j])).astype(np.float64), len(idx), level)
+        widest = max(widest, float(np.max(high - low)) if len(low) else 1.0)
+    return widest
+
+
+def aggregate_panel(questions: List[SurveyQuestion], members: List[PanelMember],
+                    results: Dict[Tuple[str, str], Dict[str, Any]],
+                    dimensions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Option shares (with Wilson CIs), confidence-weighted distributions and cross-tabs per question.
+
+    Answers are laid out as a (twins x questions) index matrix with -1 for
+    missing predictions, so each statistic is a bincount or an np.add.at over
+    a column rather than a Python loop over twins.
+    """
+    dimensions = dimensions if dimensions is not None else _pick_dimensions(members)
+    labels, answers, confidence = _answer_matrix(questions, members, results)
+
+    # Group code per twin for each cross-tab dimension
+    groups = {}
+    for dimension in dimensions:
+        raw = np.array([m.attributes.get(dimension, MISSING_VALUE) for m in members], dtype=object)
+        values, codes = np.unique(raw.astype(str), return_inverse=True)
+        groups[dimension] = (values, codes)
+
+    aggregates = {}
+    for j, question in enumerate(questions):
+        column = answers[:, j]
+        answered = column >= 0
+        idx = column[answered]
+        weights = confidence[answered, j]
+        n_options = len(labels[j])
+
+        counts = np.bincount(idx, minlength=n_options).astype(np.float64)
+        weighted = np.bincount(idx, weights=weights, minlength=n_options)
+        total = counts.sum()
+        weight_total = weighted.sum()
+        shares = counts / total if total else counts
+        weighted_shares = weighted / weight_total if weight_total else weighted
+        mean_confidence = np.divide(weighted, counts, out=np.zeros_like(weighted), where=counts > 0)
+        ci_low, ci_high = wilson_interval(counts, int(total))
+
+        # Only report the catch-all bucket when an answer actually landed in it
+        keep = n_options if counts[-1] else n_options - 1
+        entry = {
+            "question": question.question,
+            "responses": int(total),
+            "options": labels[j][:keep],
+            "counts": counts[:keep].astype(int).tolist(),
+            "shares": np.round(shares[:keep], 4).tolist(),
+            "ci_low": np.round(ci_low[:keep], 4).tolist(),
+            "ci_high": np.round(ci_high[:keep], 4).tolist(),
+            "confidence_weighted_shares": np.round(weighted_shares[:keep], 4).tolist(),
+            "mean_confidence": np.round(mean_confidence[:keep], 3).tolist(),
+            "top_answer": labels[j][int(np.argmax(counts))] if total else None,
+            "crosstabs": {},
+        }
+
+        for dimension, (values, codes) in groups.items():
+            table = np.zeros((len(values), n_options), dtype=np.float64)
+            np.add.at(table, (codes[answered], idx), 1)
+            row_totals = table.sum(axis=1, keepdims=True)
+            row_shares = np.divide(table, row_totals, out=np.zeros_like(table), where=row_totals > 0)
+            entry["crosstabs"][dimension] = {
+                "values": values.tolist(),
+                "counts": table[:, :keep].astype(int).tolist(),
+                "row_shares": np.round(row_shares[:, :keep], 4).tolist(),
+            }
+
+        aggregates[question.id] = entry
+
+    return {"dimensions": dimensions, "questions": aggregates}
@@ -0,0 +1,251 @@
+"""
+Prediction Dependencies
+Tracks which profile fields each survey question relies on, so a profile update only re-predicts what it affects
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Set, Tuple
+
+from .profile_extractor import PaiProfile, profile_from_version
+from .response_predictor import ResponsePredictor, SurveyQuestion
+from .llm_gateway import call_config
+from .llm_scheduler import BATCH
+from .tracing import wrap_context
+
+
+REPREDICT_ON_UPDATE = os.getenv('PAI_REPREDICT_ON_UPDATE', '1') != '0'
+
+# Dependency on every profile field - untagged questions, and the change set when a diff isn't possible
+ALL_FIELDS = "*"
+
+
+def parse_tags(tags: Any) -> List[Tuple[str, Optional[str]]]:
+    """(section, field) pairs from a question's tags.
+
+    Accepts the flat ['section', 'field'] and nested [['section', 'field'], ...]
+    formats used by questionnaires, plus 'section.field' strings. A bare section
+    (field None) means the question relies on the whole section.
+    """
+    if not tags or not isinstance(tags, list):
+        return []
+    if len(tags) == 2 and all(isinstance(t, str) for t in tags) and '.' not in tags[0]:
+        return [(tags[0], tags[1])]
+
+    pairs = []
+    for entry in tags:
+        if isinstance(entry, (list, tuple)) and 1 <= len(entry) <= 2 and all(isinstance(t, str) for t in entry):
+            pairs.append((entry[0], entry[1] if len(entry) == 2 else None))
+        elif isinstance(entry, str):
+            section, _, field = entry.partition('.')
+            pairs.append((section, field or None))
+    return pairs
+
+
+def field_values(profile_data: Any) -> Optional[Dict[str, Any]]:
+    """{'section.field': value} for a profile_versions.profile_data column; None for legacy profiles"""
+    sections = profile_data.get('profile_data') if isinstance(profile_data, dict) else None
+    if not isinstance(sections, dict):
+        return None
+
+    values = {}
+    for section_name, fields in sections.items():
+        if not isinstance(fields, dict):
+            values[f"{section_name}.{ALL_FIELDS}"] = fields
+            continue
+        for field_name, field_data in fields.items():
+            # Only the value reaches the prediction prompt; a new source for the same value changes nothing
+            values[f"{section_name}.{field_name}"] = (field_data.get('value')
+                                                      if isinstance(field_data, dict) else field_data)
+    return values
+
+
+def changed_fields(before: Any, after: Any) -> Set[str]:
+    """Fields whose value differs between two versions of profile_data ({ALL_FIELDS} if either is legacy)"""
+    old, new = field_values(before), field_values(after)
+    if old is None or new is None:
+        return {ALL_FIELDS}
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+class DependencyGraph:
+    """Survey question id -> the profile fields ('section.field', 'section.*' or '*') it depends on"""
+
+    def __init__(self):
+        self.dependencies: Dict[str, Set[str]] = {}
+        self.questions: Dict[str, SurveyQuestion] = {}
+
+    @classmethod
+    def from_templates(cls, survey_templates: List[Dict[str, Any]]) -> "DependencyGraph":
+        graph = cls()
+        for template in survey_templates:
+            for question in template.get('questions', []):
+                graph.add_question(question)
+        return graph
+
+    def add_question(self, question: Dict[str, Any]):
+        question_id = question.get('id')
+        if not question_id:
+            return
+
+        pairs = parse_tags(question.get('tags'))
+        depends_on = {f"{section}.{field or ALL_FIELDS}" for section, field in pairs} or {ALL_FIELDS}
+        # Question ids aren't unique across surveys; a shared id depends on everything either version uses
+        self.dependencies.setdefault(question_id, set()).update(depends_on)
+        self.questions.setdefault(question_id, SurveyQuestion(
+            id=question_id,
+            category=question.get('category', 'General'),
+            question=question.get('question', ''),
+            options=question.get('options', [])
+        ))
+
+    def depends_on(self, question_id: str) -> Set[str]:
+        return self.dependencies.get(question_id, {ALL_FIELDS})
+
+    def is_affected(self, question_id: str, changed: Set[str]) -> bool:
+        if not changed:
+            return False
+        if ALL_FIELDS in changed:
+            return True
+
+        changed_sections = {key.split('.', 1)[0] for key in changed}
+        for dependency in self.depends_on(question_id):
+            section, _, field = dependency.partition('.')
+            if dependency == ALL_FIELDS or dependency in changed:
+                return True
+            if field == ALL_FIELDS and section in changed_sections:
+                return True
+            if f"{section}.{ALL_FIELDS}" in changed:
+                return True
+        return False
+
+    def affected(self, question_ids: List[str], changed: Set[str]) -> List[str]:
+        return [question_id for question_id in question_ids if self.is_affected(question_id, changed)]
+
+
+class SelectiveRepredictor:
+    """Refreshes a profile's stored predictions after an update, but only the ones the update touched.
+
+    ai_predictions is append-only, so the newest row per question is the
+    current prediction; stale ones are superseded by inserting a fresh row.
+    """
+
+    def __init__(self, predictor: ResponsePredictor, supabase, max_workers: int = 8):
+        self.predictor = predictor
+        self.supabase = supabase
+        self.max_workers = max_workers
+        self.model_version = call_config('prediction')['model']
+
+    def load_graph(self, profile_id: str) -> DependencyGraph:
+        """Graph over the surveys this profile was tested on first, then every other active survey"""
+        tested = [s.get('survey_name') for s in self.supabase.get_validation_test_sessions([profile_id])]
+        templates, seen = [], set()
+        for name in tested:
+            if name and name not in seen:
+                seen.add(name)
+                template = self.supabase.get_survey_template(name)
+                if template:
+                    templates.append(template)
+        templates.extend(t for t in self.supabase.get_all_survey_templates() if t.get('survey_name') not in seen)
+        return DependencyGraph.from_templates(templates)
+
+    def latest_predictions(self, profile_id: str) -> Dict[str, Dict[str, Any]]:
+        latest: Dict[str, Dict[str, Any]] = {}
+        for row in self.supabase.get_profile_predictions(profile_id) or []:
+            current = latest.get(row['question_id'])
+            if current is None or (row.get('created_at') or '') > (current.get('created_at') or ''):
+                latest[row['question_id']] = row
+        return latest
+
+    def on_profile_update(self, profile_id: str, before: Any, after: Any,
+                          profile: PaiProfile) -> Dict[str, Any]:
+        """Re-predict the stored predictions whose dependencies changed between `before` and `after`"""
+        return self.refresh(profile_id, changed_fields(before, after), profile)
+
+    def refresh(self, profile_id: str, changed: Set[str], profile: PaiProfile) -> Dict[str, Any]:
+        """Re-predict the stored predictions that depend on any of the `changed` fields"""
+        summary = {"changed_fields": sorted(changed), "stored": 0, "stale": 0, "refreshed": 0,
+                   "failed": 0, "unresolved": 0}
+        if not changed:
+            print(f"DEBUG: Profile {profile_id} update changed no field values, predictions kept")
+            return summary
+
+        stored = self.latest_predictions(profile_id)
+        summary["stored"] = len(stored)
+        if not stored:
+            return summary
+
+        graph = self.load_graph(profile_id)
+        stale = graph.affected(sorted(stored), changed)
+        # Stale but no longer in any survey - nothing to re-ask, so leave the old row
+        questions = [graph.questions[qid] for qid in stale if qid in graph.questions]
+        summary["stale"] = len(stale)
+        summary["unresolved"] = len(stale) - len(questions)
+        print(f"DEBUG: Profile {profile_id}: {len(changed)} field(s) changed, "
+              f"{len(stale)}/{len(stored)} stored predictions stale")
+
+        def predict(question: SurveyQuestion):
+            try:
+                return self.predictor.predict_response(profile, question, BATCH)
+            except Exception as e:
+                print(f"DEBUG: Re-prediction of {question.id} for {profile_id} failed: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pai-repredict") as executor:
+            predictions = list(executor.map(wrap_context(predict), questions))
+
+        rows = [{
+            'profile_id': profile_id,
+            'question_id': question.id,
+            'predicted_response': prediction.predicted_answer,
+            'confidence_score': prediction.confidence,
+            'reasoning': prediction.reasoning,
+            'model_version': self.model_version,
+        } for question, prediction in zip(questions, predictions) if prediction is not None]
+        summary["failed"] = len(questions) - len(rows)
+        if rows:
+            self.supabase.insert_ai_predictions(rows)
+            summary["refreshed"] = len(rows)
+        return summary
+
+
+def queue_refresh(supabase, profile_id: str, changed: Set[str]) -> Dict[str, Any]:
+    """Record a prediction refresh job for a profile update, to run outside the request that made it.
+
+    Returns the job; it has no id when prediction_refresh_jobs doesn't exist yet, in which case only
+    the caller's own background run will ever do it.
+    """
+    job = {'profile_id': profile_id, 'changed_fields': sorted(changed), 'status': 'pending'}
+    try:
+        return supabase.insert_prediction_refresh_job(job) or job
+    except Exception as e:
+        print(f"DEBUG: Could not queue prediction refresh for {profile_id}: {e}")
+        return job
+
+
+def run_refresh_job(api_key: str, supabase, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Claim and run a queued refresh job; returns its summary, or None if another worker claimed it"""
+    job_id = job.get('id')
+    if job_id is not None and not supabase.claim_prediction_refresh_job(job_id):
+        return None
+
+    profile_id = job['profile_id']
+    try:
+        # Re-predict from the profile as it is now - it may have changed again since the job was queued
+        version = supabase.get_profile_version(profile_id, cached=False)
+        if not version:
+            raise ValueError(f"Profile {profile_id} not found")
+        repredictor = SelectiveRepredictor(ResponsePredictor(api_key), supabase)
+        summary = repredictor.refresh(profile_id, set(job.get('changed_fields') or [ALL_FIELDS]),
+                                      profile_from_version(version))
+    except Exception as e:
+        print(f"DEBUG: Prediction refresh for {profile_id} failed: {e}")
+        if job_id is not None:
+            supabase.finish_prediction_refresh_job(job_id, 'failed', error=str(e))
+        raise
+
+    print(f"DEBUG: Prediction refresh for {profile_id}: {summary['refreshed']}/{summary['stale']} stale "
+          f"predictions refreshed")
+    if job_id is not None:
+        supabase.finish_prediction_refresh_job(job_id, 'done', summary=summary)
+    return summary
@@ -0,0 +1,162 @@
+"""
+Prediction Prefetcher
+Speculatively runs every survey prediction for a validation test in the background
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Any
+
+from .profile_extractor import PaiProfile
+from .response_predictor import ResponsePredictor, SurveyQuestion, PredictionResult
+from .tracing import wrap_context
+
+
+class PredictionPrefetcher:
+    """Fires all predictions for a test session up front and serves them by question id.
+
+    Predictions are held in memory keyed by test_session_id and, when `persist_dir`
+    is set, mirrored to a small JSON file so other requests handled by the same
+    container can pick them up.
+    """
+
+    def __init__(self, max_workers: int = 8, ttl_seconds: int = 3600, persist_dir: Optional[str] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pai-prefetch")
+        self.ttl_seconds = ttl_seconds
+        self.persist_dir = persist_dir
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, test_session_id: str, profile_id: str, predictor: ResponsePredictor,
+              profile: PaiProfile, questions: List[SurveyQuestion]) -> int:
+        """Start predicting every question for a test session; returns how many were queued"""
+        self._expire()
+
+        with self._lock:
+            existing = self._sessions.get(test_session_id)
+            if existing and existing["profile_id"] == profile_id:
+                # Retried begin - the predictions are already in flight
+                return len(existing["futures"])
+
+            session = {
+                "profile_id": profile_id,
+                "created_at": time.time(),
+                "futures": {}
+            }
+            self._sessions[test_session_id] = session
+
+        for question in questions:
+            # Keep the predictions attributed to the request that started the test
+            future = self.executor.submit(wrap_context(predictor.predict_response), profile, question)
+            with self._lock:
+                session["futures"][question.id] = future
+            future.add_done_callback(lambda f, sid=test_session_id: self._persist(sid))
+
+        print(f"DEBUG: Prefetching {len(questions)} predictions for test session {test_session_id}")
+        return len(questions)
+
+    def get(self, test_session_id: str, question_id: str, profile_id: Optional[str] = None,
+            timeout: Optional[float] = None) -> Optional[PredictionResult]:
+        """Return the prefetched prediction, waiting up to `timeout` if it is still running.
+
+        Returns None when nothing usable was prefetched, so callers can predict on demand.
+        """
+        with self._lock:
+            session = self._sessions.get(test_session_id)
+
+        if session:
+            if profile_id and session["profile_id"] != profile_id:
+                return None
+
+            future: Optional[Future] = session["futures"].get(question_id)
+            if future is None:
+                return None
+
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                print(f"DEBUG: Prefetch for {question_id} still running after {timeout}s")
+                return None
+            except Exception as e:
+                print(f"DEBUG: Prefetch for {question_id} failed: {e}")
+                return None
+
+        return self._load_persisted(test_session_id, question_id, profile_id)
+
+    def status(self, test_session_id: str) -> Dict[str, int]:
+        """Counts of queued, completed and failed predictions for a test session"""
+        with self._lock:
+            session = self._sessions.get(test_session_id)
+        if not session:
+            return {"queued": 0, "completed": 0, "failed": 0}
+
+        futures = list(session["futures"].values())
+        done = [f for f in futures if f.done() and not f.cancelled()]
+        failed = [f for f in done if f.exception() is not None]
+        return {"queued": len(futures), "completed": len(done) - len(failed), "failed": len(failed)}
+
+    def discard(self, test_session_id: str):
+        """Forget a test session, cancelling any predictions that haven't started"""
+        with self._lock:
+            session = self._sessions.pop(test_session_id, None)
+        if session:
+            for future in session["futures"].values():
+                future.cancel()
+        if self.persist_dir:
+            try:
+                os.remove(self._persist_path(test_session_id))
+            except FileNotFoundError:
+                pass
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if s["created_at"] < cutoff]
+        for sid in expired:
+            self.discard(sid)
+
+    def _persist_path(self, test_session_id: str) -> str:
+        return os.path.join(self.persist_dir, f"{test_session_id}_predictions.json")
+
+    def _persist(self, test_session_id: str):
+        """Mirror completed predictions for a session to disk"""
+        if not self.persist_dir:
+            return
+
+        with self._lock:
+            session = self._sessions.get(test_session_id)
+            if not session:
+                return
+            predictions = {}
+            for question_id, future in session["futures"].items():
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    predictions[question_id] = future.result().dict()
+
+            try:
+                os.makedirs(self.persist_dir, exist_ok=True)
+                tmp_path = self._persist_path(test_session_id) + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"profile_id": session["profile_id"], "predictions": predictions}, f)
+                os.replace(tmp_path, self._persist_path(test_session_id))
+            except Exception as e:
+                print(f"DEBUG: Could not persist prefetched predictions for {test_session_id}: {e}")
+
+    def _load_persisted(self, test_session_id: str, question_id: str,
+                        profile_id: Optional[str]) -> Optional[PredictionResult]:
+        if not self.persist_dir:
+            return None
+
+        try:
+            with open(self._persist_path(test_session_id), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if profile_id and data.get("profile_id") != profile_id:
+            return None
+
+        prediction = data.get("predictions", {}).get(question_id)
+        return PredictionResult(**prediction) if prediction else None
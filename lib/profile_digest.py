@@ -0,0 +1,136 @@
+"""
+Profile Digest
+Compact, source-free text rendering of a profile version, built once and reused in every chat and prediction prompt
+"""
+
+import os
+import re
+import json
+import hashlib
+from typing import Dict, List, Optional, Any
+
+
+USE_PROFILE_DIGEST = os.getenv('PAI_PROFILE_DIGEST', '1') != '0'
+
+# Bump when the rendering changes so stored digests are rebuilt
+DIGEST_FORMAT = 1
+
+# Extraction placeholders that carry no information about the person
+EMPTY_VALUES = {"", "n/a", "na", "unknown", "not mentioned", "not discussed", "not specified", "not provided"}
+
+
+def approx_tokens(text: str) -> int:
+    """Rough Claude token count (~4 characters per token) - deterministic, so a digest's size never drifts"""
+    return (len(text) + 3) // 4
+
+
+def _value_text(value: Any) -> str:
+    if isinstance(value, dict):
+        if 'value' in value:
+            # Structured fields: {"value": ..., "source": {...}} - the source never reaches the prompt
+            return _value_text(value['value'])
+        parts = [f"{key}: {text}" for key, text in ((k, _value_text(v)) for k, v in sorted(value.items())) if text]
+        return "; ".join(parts)
+    if isinstance(value, (list, tuple)):
+        return "; ".join(text for text in (_value_text(v) for v in value) if text)
+    if value is None or isinstance(value, bool):
+        return "" if value is None else ("yes" if value else "no")
+    text = re.sub(r"\s+", " ", str(value)).strip()
+    return "" if text.lower().rstrip('.') in EMPTY_VALUES else text
+
+
+def _sections(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Sections of a profile_data column, structured ({"profile_data": {...}}) or legacy PaiProfile"""
+    if isinstance(profile_data.get('profile_data'), dict):
+        return profile_data['profile_data']
+    return {key: value for key, value in profile_data.items() if key != 'pai_id'}
+
+
+def digest_text(profile_data: Dict[str, Any]) -> str:
+    """Render a profile as one 'field: value' line per fact, grouped by section.
+
+    Sections and fields are sorted so the same profile always renders the same
+    way (jsonb doesn't keep key order), and a value repeated under several
+    fields is written once with all of its field names.
+    """
+    entries: List[Dict[str, Any]] = []
+    by_value: Dict[str, Dict[str, Any]] = {}
+
+    for section, fields in sorted(_sections(profile_data or {}).items()):
+        if isinstance(fields, dict) and 'value' not in fields:
+            items = sorted(fields.items())
+        elif isinstance(fields, list):
+            items = [(None, item) for item in fields]
+        else:
+            items = [(None, fields)]
+
+        for field, value in items:
+            text = _value_text(value)
+            if not text:
+                continue
+            norm = text.lower()
+            if norm in by_value:
+                entry = by_value[norm]
+                if field:
+                    entry["fields"].append(field if entry["section"] == section else f"{section}.{field}")
+                continue
+            entry = {"section": section, "fields": [field] if field else [], "text": text}
+            by_value[norm] = entry
+            entries.append(entry)
+
+    lines, current = [], None
+    for entry in entries:
+        if entry["section"] != current:
+            current = entry["section"]
+            lines.append(f"[{current}]")
+        lines.append(f"{', '.join(entry['fields'])}: {entry['text']}" if entry["fields"] else f"- {entry['text']}")
+    return "\n".join(lines)
+
+
+def source_hash(profile_data: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(profile_data or {}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def build_digest(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Digest record stored alongside a profile version in profile_versions.profile_digest"""
+    text = digest_text(profile_data)
+    return {
+        "format": DIGEST_FORMAT,
+        "source_hash": source_hash(profile_data),
+        "text": text,
+        "tokens": approx_tokens(text),
+        "json_tokens": approx_tokens(json.dumps(profile_data or {}, indent=2)),
+    }
+
+
+def stored_digest(profile_version: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The digest stored with a profile_versions row, if it is current for the row's profile_data"""
+    digest = profile_version.get('profile_digest')
+    if (isinstance(digest, dict) and digest.get('format') == DIGEST_FORMAT
+            and digest.get('source_hash') == source_hash(profile_version.get('profile_data') or {})):
+        return digest
+    return None
+
+
+def ensure_profile_digest(supabase, profile_version: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored digest for a profile version, building and saving it first if missing or out of date"""
+    digest = stored_digest(profile_version)
+    if digest:
+        return digest
+
+    digest = build_digest(profile_version.get('profile_data') or {})
+    profile_version['profile_digest'] = digest
+    try:
+        supabase.save_profile_digest(profile_version['profile_id'], digest)
+        print(f"DEBUG: Built profile digest for {profile_version['profile_id']}: "
+              f"{digest['tokens']} tokens (vs {digest['json_tokens']} as JSON)")
+    except Exception as e:
+        print(f"DEBUG: Could not store profile digest for {profile_version.get('profile_id')}: {e}")
+    return digest
+
+
+def profile_prompt_text(profile) -> str:
+    """Digest text for a PaiProfile: the version's stored digest when it has one, else built (once) from the profile"""
+    if profile._digest is None:
+        profile._digest = digest_text(profile.dict())
+    return profile._digest
@@ -4,11 +4,14 @@ Converts interview transcripts into structured Pai profiles
 """
 
 import os
+import copy
 import json
 from datetime import datetime
 from typing import Dict, List, Any, Optional
-import anthropic
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+from .llm_gateway import get_gateway
+from .profile_digest import stored_digest, digest_text
 
 
 class PaiProfile(BaseModel):
@@ -21,11 +24,13 @@ class PaiProfile(BaseModel):
     value_system: Dict[str, Any]
     behavioral_quotes: List[str]
     prediction_weights: Dict[str, float]
+    # Prompt text for this profile (see profile_digest), taken from its profile version when there is one
+    _digest: Optional[str] = PrivateAttr(default=None)
 
 
 class ProfileExtractor:
     def __init__(self, api_key: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.llm = get_gateway(api_key)
         self.extraction_prompt = self._get_extraction_prompt()
     
     def _get_extraction_prompt(self) -> str:
@@ -108,9 +113,8 @@ Return ONLY the JSON profile, no additional text."""
             prompt = self.extraction_prompt.replace("{transcript}", interview_transcript)
             
             # Call Claude API for extraction
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
+            response = self.llm.create(
+                "profile_extraction",
                 temperature=0.3,  # Lower temperature for more consistent structured output
                 messages=[{"role": "user", "content": prompt}]
             )
@@ -177,6 +181,118 @@ Return ONLY the JSON profile, no additional text."""
         return PaiProfile(**profile_data)
 
 
+def convert_structured_profile_to_legacy(structured_profile: dict) -> dict:
+    """Convert new structured profile format to legacy format expected by ResponsePredictor"""
+    try:
+        legacy_profile = {
+            "pai_id": "converted_profile",
+            "demographics": {},
+            "core_attitudes": {},
+            "decision_psychology": {},
+            "usage_patterns": {},
+            "value_system": {},
+            "behavioral_quotes": [],
+            "prediction_weights": {}
+        }
+        
+        # Extract values from the structured format and map to legacy categories
+        for section_name, fields in structured_profile.items():
+            for field_name, field_data in fields.items():
+                if isinstance(field_data, dict) and 'value' in field_data:
+                    value = field_data['value']
+                    
+                    # Map sections to legacy categories based on content
+                    if section_name in ['lifestyle', 'media_and_culture']:
+                        legacy_profile['demographics'][f'{section_name}_{field_name}'] = value
+                    elif section_name in ['personality', 'values_and_beliefs']:
+                        legacy_profile['core_attitudes'][f'{section_name}_{field_name}'] = value
+                    elif section_name in ['routine', 'skin_and_hair_type']:
+                        legacy_profile['usage_patterns'][f'{section_name}_{field_name}'] = value
+                    else:
+                        # Default to decision_psychology for other sections
+                        legacy_profile['decision_psychology'][f'{section_name}_{field_name}'] = value
+        
+        return legacy_profile
+        
+    except Exception as e:
+        print(f"Error converting structured profile: {e}")
+        # Return minimal structure if conversion fails
+        return {
+            "pai_id": "conversion_error",
+            "demographics": {"error": str(e)},
+            "core_attitudes": {},
+            "decision_psychology": {},
+            "usage_patterns": {},
+            "value_system": {},
+            "behavioral_quotes": [],
+            "prediction_weights": {}
+        }
+
+
+def profile_from_version(profile_version: Dict[str, Any]) -> PaiProfile:
+    """Build a PaiProfile from a profile_versions row (structured or legacy profile_data)"""
+    raw_profile_data = profile_version.get('profile_data') or {}
+    if 'profile_data' in raw_profile_data:
+        profile = convert_structured_profile_to_legacy(raw_profile_data['profile_data'])
+    else:
+        profile = raw_profile_data
+    pai_profile = PaiProfile(**profile)
+    pai_profile._digest = (stored_digest(profile_version) or {}).get('text') or digest_text(raw_profile_data)
+    return pai_profile
+
+
+def merge_profile_data(existing: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a new extraction into a stored profile_data column, section by section.
+
+    Mirrors pai_merge_profile_data in supabase_complete_interview_rpc.sql: a
+    legacy (or empty) stored profile is replaced, legacy new data is ignored.
+    """
+    if not isinstance((existing or {}).get('profile_data'), dict):
+        return new
+    if not isinstance((new or {}).get('profile_data'), dict):
+        return copy.deepcopy(existing)
+
+    merged = copy.deepcopy(existing)
+    sections = merged['profile_data']
+    for section_name, section_data in new['profile_data'].items():
+        if isinstance(section_data, dict) and isinstance(sections.get(section_name), dict):
+            sections[section_name].update(section_data)
+        else:
+            sections[section_name] = section_data
+    return merged
+
+
+def merge_completeness_metadata(existing: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge completeness metadata (mirrors pai_merge_completeness in supabase_complete_interview_rpc.sql).
+
+    The centrepiece entry is replaced; categories and products gain the
+    entries whose name isn't already listed.
+    """
+    merged = copy.deepcopy(existing) if existing else {}
+    if not new:
+        return merged
+    if not isinstance(new, dict) or not isinstance(merged, dict):
+        return new
+
+    for key in ['centrepiece', 'categories', 'products']:
+        if key not in new:
+            continue
+        new_value = new[key]
+        if key not in merged:
+            merged[key] = new_value
+        elif key == 'centrepiece':
+            if new_value is not None:
+                merged[key] = new_value
+        elif isinstance(merged[key], list) and isinstance(new_value, list):
+            for item in new_value:
+                names = {existing_item.get('name') for existing_item in merged[key] if isinstance(existing_item, dict)}
+                if isinstance(item, dict) and item.get('name') not in names:
+                    merged[key].append(item)
+        else:
+            merged[key] = new_value
+    return merged
+
+
 # Example usage and testing
 if __name__ == "__main__":
     # Load API key from environment
@@ -211,4 +327,4 @@ if __name__ == "__main__":
         print(f"- Key behavioral quotes: {len(profile.behavioral_quotes)} identified")
     else:
         print(f"No interview file found at {interview_file}")
-        print("Run ai_interviewer.py first to create an interview session")
\ No newline at end of file
+        print("Run ai_interviewer.py first to create an interview session")
@@ -0,0 +1,109 @@
+"""
+Questionnaire Compiler
+Builds a questionnaire's derived artifacts (interviewer prompt, field coverage, extraction schema) once per version
+"""
+
+import json
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .ai_interviewer import AIInterviewer
+from .prediction_dependencies import parse_tags
+
+
+# Bump when the compiled output changes shape or content, so stored artifacts are rebuilt
+COMPILER_VERSION = 1
+
+DEFAULT_TARGET_QUESTIONS = 8
+
+
+def source_hash(questionnaire: Dict[str, Any]) -> str:
+    """Hash of the questionnaire fields the artifacts are derived from - the questionnaire's version"""
+    source = {key: questionnaire.get(key) for key in ('title', 'category', 'description', 'questions')}
+    return hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def target_questions(questions: List[Dict[str, Any]]) -> int:
+    """How many interview exchanges a questionnaire aims for"""
+    return max(3, min(len(questions) + 2, DEFAULT_TARGET_QUESTIONS))
+
+
+def extraction_schema(questionnaire_id: str, questions: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """{section: {field: placeholder}} the profile extractor fills in for this questionnaire's tags"""
+    sections: Dict[str, Dict[str, Any]] = {}
+    for question in questions:
+        tags = question.get('tags')
+        # Flat ['lifestyle', 'daily_life_work'] or nested [['facial_moisturizer_attitudes', 'benefits_sought']]
+        pairs = [(section, field) for section, field in parse_tags(tags) if field]
+        if not pairs:
+            if tags:
+                print(f"DEBUG: Skipping question {question.get('id', 'unknown')} with unsupported tag format: {tags}")
+            continue
+
+        for section, field in pairs:
+            sections.setdefault(section, {})[field] = {
+                "value": f"extracted {field.replace('_', ' ')}",
+                "source": {
+                    "questionnaire_id": questionnaire_id,
+                    "question_id": question.get('id', 'unknown'),
+                    "session_id": "session_id_placeholder"
+                }
+            }
+    return sections
+
+
+def interviewer_context(questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+    """The questionnaire_context AIInterviewer works from"""
+    questions = questionnaire.get('questions') or []
+    return {
+        'questionnaire_id': questionnaire.get('questionnaire_id'),
+        'title': questionnaire.get('title', 'Custom Questionnaire'),
+        'category': questionnaire.get('category', 'general'),
+        'description': questionnaire.get('description', ''),
+        'questions': questions,
+        'target_questions': target_questions(questions),
+    }
+
+
+def compile_questionnaire(questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+    """Every derived artifact for a questionnaire row, ready to store in custom_questionnaires.compiled_artifacts"""
+    questions = questionnaire.get('questions') or []
+    category = questionnaire.get('category', 'general')
+    return {
+        "compiler_version": COMPILER_VERSION,
+        "source_hash": source_hash(questionnaire),
+        "compiled_at": datetime.now().isoformat(),
+        "question_count": len(questions),
+        "target_questions": target_questions(questions),
+        "interviewer_themes": AIInterviewer._extract_conversation_themes(questions, category),
+        "field_coverage": AIInterviewer._get_detailed_field_coverage(questions),
+        "interviewer_prompt": AIInterviewer.build_system_prompt(interviewer_context(questionnaire)),
+        "extraction_schema": extraction_schema(questionnaire.get('questionnaire_id', 'unknown'), questions),
+    }
+
+
+def compiled_artifacts(questionnaire: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The artifacts stored with a questionnaire row, if they are current for its version"""
+    artifacts = questionnaire.get('compiled_artifacts')
+    if (isinstance(artifacts, dict) and artifacts.get('compiler_version') == COMPILER_VERSION
+            and artifacts.get('source_hash') == source_hash(questionnaire)):
+        return artifacts
+    return None
+
+
+def ensure_compiled(supabase, questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored artifacts for a questionnaire, compiling and saving them first if missing or out of date"""
+    artifacts = compiled_artifacts(questionnaire)
+    if artifacts:
+        return artifacts
+
+    artifacts = compile_questionnaire(questionnaire)
+    questionnaire['compiled_artifacts'] = artifacts
+    try:
+        supabase.save_questionnaire_artifacts(questionnaire['questionnaire_id'], artifacts)
+        print(f"DEBUG: Compiled questionnaire {questionnaire['questionnaire_id']} "
+              f"(version {artifacts['source_hash']})")
+    except Exception as e:
+        print(f"DEBUG: Could not store compiled artifacts for {questionnaire.get('questionnaire_id')}: {e}")
+    return artifacts
@@ -0,0 +1,150 @@
+"""
+Read Cache
+Single-flight coalescing, a short-TTL cache and stale-while-revalidate for reads, invalidated by writes
+"""
+
+import copy
+import time
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from .tracing import wrap_context
+
+
+class SingleFlightCache:
+    """Shares one in-flight fetch between identical concurrent reads and keeps results for a short TTL.
+
+    Entries are grouped by table so a write can invalidate everything read from
+    it. Each table has a generation counter bumped on invalidation: a fetch that
+    started before a write neither lets new readers join it nor caches its
+    (possibly pre-write) result. Callers always get their own copy of the
+    result, so mutating it never leaks into the cache or other callers.
+
+    Reads can also opt into stale-while-revalidate. For `stale_ttl` seconds
+    after the TTL, the old result is returned at once while one background
+    fetch refreshes it. Up to `max_stale` seconds after it was fetched, a
+    result (even one invalidated by a write) stands in for a fetch that fails,
+    if `fallback_on` (when given) accepts the failure.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cached: Dict[str, Dict[str, Any]] = {}
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0,
+                      "stale": 0, "stale_on_error": 0, "refresh_failures": 0}
+
+    def get(self, table: str, key: str, fetch: Callable[[], Any], ttl: float = 0,
+            stale_ttl: float = 0, max_stale: float = 0,
+            fallback_on: Optional[Callable[[Exception], bool]] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generations.get(table, 0)
+            cached = self._cached.get(key)
+            current = cached is not None and cached["generation"] == generation
+            if current and now < cached["stored_at"] + ttl:
+                self.stats["hits"] += 1
+                return copy.deepcopy(cached["value"])
+
+            flight = self._in_flight.get(key)
+            joinable = flight is not None and flight["generation"] == generation
+            if current and now < cached["stored_at"] + ttl + stale_ttl:
+                self.stats["stale"] += 1
+                mode = "stale"
+                # One background refresh at a time; later stale readers don't start another
+                refresh = None if joinable else self._start_flight(key, table, generation)
+            elif joinable:
+                self.stats["coalesced"] += 1
+                mode = "follow"
+            else:
+                self.stats["misses"] += 1
+                mode = "lead"
+                flight = self._start_flight(key, table, generation)
+
+        if mode == "stale":
+            if refresh is not None:
+                threading.Thread(target=wrap_context(self._refresh), name="pai-read-refresh", daemon=True,
+                                 args=(table, key, fetch, refresh, ttl, max_stale, fallback_on)).start()
+            return copy.deepcopy(cached["value"])
+        if mode == "follow":
+            return copy.deepcopy(flight["future"].result())
+        return copy.deepcopy(self._fill(table, key, fetch, flight, ttl, max_stale, fallback_on))
+
+    def _start_flight(self, key: str, table: str, generation: int) -> Dict[str, Any]:
+        flight = {"future": Future(), "table": table, "generation": generation}
+        self._in_flight[key] = flight
+        return flight
+
+    def _fill(self, table: str, key: str, fetch: Callable[[], Any], flight: Dict[str, Any],
+              ttl: float, max_stale: float, fallback_on: Optional[Callable[[Exception], bool]] = None) -> Any:
+        """Run the fetch as the flight's leader; a failure falls back to a recent enough result"""
+        try:
+            value = fetch()
+        except Exception as e:
+            # Only failures `fallback_on` accepts (e.g. outages, not bad requests) are masked
+            fallback = self._fallback(key) if fallback_on is None or fallback_on(e) else None
+            self._finish(key, flight)
+            if fallback is None:
+                flight["future"].set_exception(e)
+                raise
+            with self._lock:
+                self.stats["stale_on_error"] += 1
+            print(f"DEBUG: Serving stale {table} read after failed fetch: {e}")
+            flight["future"].set_result(fallback)
+            return fallback
+        except BaseException as e:
+            self._finish(key, flight)
+            flight["future"].set_exception(e)
+            raise
+
+        with self._lock:
+            if (ttl > 0 or max_stale > 0) and self._generations.get(table, 0) == flight["generation"]:
+                self._cached[key] = {"table": table, "value": value, "generation": flight["generation"],
+                                     "stored_at": time.monotonic(), "max_stale": max_stale}
+        self._finish(key, flight)
+        flight["future"].set_result(value)
+        return value
+
+    def _refresh(self, table: str, key: str, fetch: Callable[[], Any], flight: Dict[str, Any],
+                 ttl: float, max_stale: float, fallback_on: Optional[Callable[[Exception], bool]] = None):
+        try:
+            self._fill(table, key, fetch, flight, ttl, max_stale, fallback_on)
+        except Exception as e:
+            with self._lock:
+                self.stats["refresh_failures"] += 1
+            print(f"DEBUG: Background refresh of {table} failed: {e}")
+
+    def _fallback(self, key: str) -> Optional[Any]:
+        with self._lock:
+            cached = self._cached.get(key)
+            if cached and time.monotonic() - cached["stored_at"] < cached["max_stale"]:
+                return cached["value"]
+        return None
+
+    def _finish(self, key: str, flight: Dict[str, Any]):
+        with self._lock:
+            if self._in_flight.get(key) is flight:
+                del self._in_flight[key]
+
+    def invalidate(self, table: Optional[str] = None):
+        """Drop cached reads of one table (every table when None).
+
+        Entries that may stand in for a failed fetch are kept for that purpose
+        only; they are never served as current again.
+        """
+        with self._lock:
+            self.stats["invalidations"] += 1
+            tables = [table] if table else list({entry["table"] for entry in self._cached.values()}
+                                                 | {flight["table"] for flight in self._in_flight.values()}
+                                                 | set(self._generations))
+            for name in tables:
+                self._generations[name] = self._generations.get(name, 0) + 1
+            for key in [k for k, entry in self._cached.items()
+                        if entry["table"] in tables and not entry["max_stale"]]:
+                del self._cached[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, cached_entries=len(self._cached), in_flight=len(self._in_flight))
@@ -0,0 +1,293 @@
+"""
+Replay Harness
+Re-runs historical validation answers under alternative prediction configs and compares them
+"""
+
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Any
+
+from pydantic import BaseModel
+
+from .profile_extractor import PaiProfile, profile_from_version
+from .response_predictor import ResponsePredictor, SurveyQuestion
+from .panel_simulation import survey_questions_from_template
+from .llm_gateway import call_config
+from .llm_scheduler import BATCH
+from .sampling_stats import wilson_interval
+from .profile_digest import USE_PROFILE_DIGEST
+from .tracing import wrap_context
+
+
+REPLAY_CACHE_DIR = os.getenv('PAI_REPLAY_CACHE_DIR', 'data/replay_cache')
+RECORDED = "recorded"
+
+# USD per million input / output tokens, for the cost columns
+MODEL_PRICING = {
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-opus": (15.0, 75.0),
+}
+
+
+class ReplayConfig(BaseModel):
+    """One way of running ResponsePredictor; unset fields use the production defaults"""
+    name: str
+    model: Optional[str] = None
+    prompt: Optional[str] = None
+    prompt_file: Optional[str] = None
+    temperature: float = 0.3
+    max_tokens: Optional[int] = None
+    use_digest: Optional[bool] = None  # profile digest vs full JSON in the prompt; None = production default
+
+    def resolved_prompt(self) -> Optional[str]:
+        if self.prompt_file:
+            with open(self.prompt_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        return self.prompt
+
+    def digest_enabled(self) -> bool:
+        return USE_PROFILE_DIGEST if self.use_digest is None else self.use_digest
+
+    def fingerprint(self, prompt: str) -> str:
+        """Hash of everything that changes the output (given the prompt actually used) - not the name"""
+        prediction = call_config('prediction')
+        material = json.dumps({
+            "model": self.model or prediction["model"],
+            "prompt": hashlib.sha1(prompt.encode('utf-8')).hexdigest(),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens or prediction["max_tokens"],
+            "profile_format": "digest" if self.digest_enabled() else "json",
+        }, sort_keys=True)
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()[:16]
+
+
+class ReplayCase(BaseModel):
+    """A historical (profile version, question, human answer) triple"""
+    test_session_id: str
+    profile_id: str
+    profile_stamp: str  # updated_at of the profile version, so an edited profile isn't served from cache
+    question: SurveyQuestion
+    human_answer: str
+    recorded_answer: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        material = json.dumps([self.profile_id, self.profile_stamp, self.question.dict()], sort_keys=True)
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+def load_replay_cases(supabase, profile_ids: Optional[List[str]] = None,
+                      survey_name: Optional[str] = None) -> Dict[str, Any]:
+    """Pull every historical triple in bulk; returns cases plus the profiles they need"""
+    sessions = supabase.get_validation_test_sessions(profile_ids)
+    if survey_name:
+        sessions = [s for s in sessions if s.get('survey_name') == survey_name]
+    session_by_id = {s['test_session_id']: s for s in sessions}
+
+    rows = supabase.get_survey_responses(list(session_by_id))
+    versions = {row['profile_id']: row
+                for row in supabase.get_profile_versions(sorted({s['profile_id'] for s in sessions}))}
+
+    questions: Dict[str, Dict[str, SurveyQuestion]] = {}
+    for name in {s['survey_name'] for s in sessions}:
+        template = supabase.get_survey_template(name)
+        questions[name] = {q.id: q for q in survey_questions_from_template(template)} if template else {}
+
+    cases, skipped = [], 0
+    for row in rows:
+        session = session_by_id.get(row['test_session_id'])
+        version = versions.get(session['profile_id']) if session else None
+        question = questions.get(session['survey_name'], {}).get(row['question_id']) if session else None
+        if not version or not question or not row.get('human_response'):
+            skipped += 1
+            continue
+        cases.append(ReplayCase(
+            test_session_id=row['test_session_id'],
+            profile_id=session['profile_id'],
+            profile_stamp=version.get('updated_at') or '',
+            question=question,
+            human_answer=row['human_response'],
+            recorded_answer=row.get('ai_response')
+        ))
+
+    profiles = {}
+    for profile_id, version in versions.items():
+        try:
+            profiles[profile_id] = profile_from_version(version)
+        except Exception as e:
+            print(f"DEBUG: Replay can't load profile {profile_id}: {e}")
+    cases = [case for case in cases if case.profile_id in profiles]
+
+    print(f"DEBUG: Loaded {len(cases)} replay cases from {len(sessions)} test sessions ({skipped} rows skipped)")
+    return {"cases": cases, "profiles": profiles}
+
+
+class ReplayCache:
+    """Per-config NDJSON of past replay outcomes, keyed by case"""
+
+    def __init__(self, cache_dir: str, fingerprint: str):
+        self.path = os.path.join(cache_dir, f"{fingerprint}.ndjson")
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["key"]] = entry
+
+    def put(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.entries[entry["key"]] = entry
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def _price(model: Optional[str]):
+    for prefix, price in MODEL_PRICING.items():
+        if model and model.startswith(prefix):
+            return price
+    return None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ReplayHarness:
+    """Runs every config over the same historical cases and reports them side by side.
+
+    Outcomes are cached per config fingerprint (model, prompt, temperature,
+    max_tokens) and case (profile version, question), so re-running a report
+    only calls Claude for configs or cases that are new.
+    """
+
+    def __init__(self, api_key: str, configs: List[ReplayConfig], cache_dir: str = REPLAY_CACHE_DIR,
+                 max_workers: int = 8):
+        self.configs = configs
+        self.max_workers = max_workers
+        self.predictors = {
+            config.name: ResponsePredictor(api_key, prediction_prompt=config.resolved_prompt(), model=config.model,
+                                           temperature=config.temperature, max_tokens=config.max_tokens,
+                                           use_digest=config.digest_enabled())
+            for config in configs
+        }
+        self.fingerprints = {config.name: config.fingerprint(self.predictors[config.name].prediction_prompt)
+                             for config in configs}
+        self.caches = {name: ReplayCache(cache_dir, fingerprint) for name, fingerprint in self.fingerprints.items()}
+
+    def run(self, cases: List[ReplayCase], profiles: Dict[str, PaiProfile]) -> Dict[str, Any]:
+        outcomes: Dict[str, Dict[str, Dict[str, Any]]] = {config.name: {} for config in self.configs}
+        jobs = []
+        for config in self.configs:
+            cache = self.caches[config.name]
+            queued = set()
+            for case in cases:
+                if case.key in cache.entries:
+                    outcomes[config.name][case.key] = dict(cache.entries[case.key], cached=True)
+                elif case.key not in queued:
+                    # Retakes of the same survey by the same profile version share one prediction
+                    queued.add(case.key)
+                    jobs.append((config, case))
+
+        cached = sum(len(o) for o in outcomes.values())
+        print(f"DEBUG: Replay: {len(jobs)} predictions to run, {cached} served from cache")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pai-replay") as executor:
+            futures = {executor.submit(wrap_context(self._replay), config, case, profiles[case.profile_id]):
+                       (config, case) for config, case in jobs}
+            for future in as_completed(futures):
+                config, case = futures[future]
+                entry = future.result()
+                if entry is not None:
+                    self.caches[config.name].put(entry)
+                    outcomes[config.name][case.key] = dict(entry, cached=False)
+
+        return self.report(cases, outcomes)
+
+    def _replay(self, config: ReplayConfig, case: ReplayCase, profile: PaiProfile) -> Optional[Dict[str, Any]]:
+        try:
+            prediction, usage = self.predictors[config.name].predict_response_with_usage(profile, case.question, BATCH)
+        except Exception as e:
+            print(f"DEBUG: Replay {config.name} failed on {case.profile_id}/{case.question.id}: {e}")
+            return None
+        return {
+            "key": case.key,
+            "predicted_answer": prediction.predicted_answer,
+            "confidence": prediction.confidence,
+            **usage
+        }
+
+    def report(self, cases: List[ReplayCase], outcomes: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Accuracy, tokens, cost and latency per config, with deltas against the first config"""
+        def correct(answer: Optional[str], case: ReplayCase) -> bool:
+            return answer is not None and answer.strip() == case.human_answer.strip()
+
+        columns = {}
+        recorded = [case for case in cases if case.recorded_answer]
+        if recorded:
+            hits = sum(correct(case.recorded_answer, case) for case in recorded)
+            low, high = wilson_interval(hits, len(recorded))
+            columns[RECORDED] = {"cases": len(recorded), "accuracy": hits / len(recorded),
+                                 "accuracy_interval": [round(float(low), 4), round(float(high), 4)]}
+
+        baseline = self.configs[0].name if self.configs else None
+        for config in self.configs:
+            results = outcomes[config.name]
+            answered = [case for case in cases if case.key in results]
+            hits = sum(correct(results[case.key]["predicted_answer"], case) for case in answered)
+            fresh = [results[case.key] for case in answered if not results[case.key]["cached"]]
+            input_tokens = sum(results[case.key].get("input_tokens", 0) for case in answered)
+            output_tokens = sum(results[case.key].get("output_tokens", 0) for case in answered)
+            latencies = [results[case.key].get("latency_ms", 0) for case in answered]
+            price = _price(config.model or call_config('prediction')["model"])
+            low, high = wilson_interval(hits, len(answered))
+
+            column = {
+                "fingerprint": self.fingerprints[config.name],
+                "cases": len(answered),
+                "failed": len(cases) - len(answered),
+                "cache_hits": len(answered) - len(fresh),
+                "accuracy": hits / len(answered) if answered else 0.0,
+                "accuracy_interval": [round(float(low), 4), round(float(high), 4)],
+                "input_tokens_per_prediction": input_tokens / len(answered) if answered else 0,
+                "output_tokens_per_prediction": output_tokens / len(answered) if answered else 0,
+                "cost_usd": round((input_tokens * price[0] + output_tokens * price[1]) / 1e6, 4) if price else None,
+                "latency_p50_ms": _percentile(latencies, 50),
+                "latency_p95_ms": _percentile(latencies, 95),
+            }
+
+            if baseline and config.name != baseline:
+                base = outcomes[baseline]
+                paired = [case for case in answered if case.key in base]
+                # Cases only one side got right - the ones that decide which config is better
+                wins = sum(1 for case in paired if correct(results[case.key]["predicted_answer"], case)
+                           and not correct(base[case.key]["predicted_answer"], case))
+                losses = sum(1 for case in paired if not correct(results[case.key]["predicted_answer"], case)
+                             and correct(base[case.key]["predicted_answer"], case))
+                base_column = columns[baseline]
+                column["vs_" + baseline] = {
+                    "paired_cases": len(paired),
+                    "wins": wins,
+                    "losses": losses,
+                    "accuracy_delta": round(column["accuracy"] - base_column["accuracy"], 4),
+                    "input_tokens_delta": round(column["input_tokens_per_prediction"]
+                                                - base_column["input_tokens_per_prediction"], 1),
+                    "output_tokens_delta": round(column["output_tokens_per_prediction"]
+                                                 - base_column["output_tokens_per_prediction"], 1),
+                    "latency_p50_delta_ms": round(column["latency_p50_ms"] - base_column["latency_p50_ms"], 1),
+                }
+            columns[config.name] = column
+
+        return {"cases": len(cases), "baseline": baseline, "configs": columns}
@@ -5,10 +5,13 @@ Predicts how someone would answer survey questions based on their Pai profile
 
 import os
 import json
+import time
+from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
-import anthropic
 from pydantic import BaseModel
 from .profile_extractor import PaiProfile
+from .llm_gateway import get_gateway
+from .profile_digest import profile_prompt_text, USE_PROFILE_DIGEST
 
 
 class SurveyQuestion(BaseModel):
@@ -28,9 +31,16 @@ class PredictionResult(BaseModel):
 
 
 class ResponsePredictor:
-    def __init__(self, api_key: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
-        self.prediction_prompt = self._get_prediction_prompt()
+    def __init__(self, api_key: str, prediction_prompt: Optional[str] = None, model: Optional[str] = None,
+                 temperature: float = 0.3, max_tokens: Optional[int] = None, use_digest: bool = USE_PROFILE_DIGEST):
+        self.llm = get_gateway(api_key)
+        # Overrides are for trying alternative prompts/models (see replay_harness)
+        self.prediction_prompt = prediction_prompt or self._get_prediction_prompt()
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        # Compact profile digest in the prompt instead of the full profile JSON
+        self.use_digest = use_digest
     
     def _get_prediction_prompt(self) -> str:
         """Prediction system prompt from the PDF"""
@@ -83,22 +93,37 @@ Format your response as JSON:
 
 Return ONLY the JSON response, no additional text."""
     
-    def predict_response(self, profile: PaiProfile, question: SurveyQuestion) -> PredictionResult:
+    def predict_response(self, profile: PaiProfile, question: SurveyQuestion,
+                         priority: Optional[str] = None) -> PredictionResult:
         """Predict how this person would answer the survey question"""
+        return self.predict_response_with_usage(profile, question, priority)[0]
+    
+    def predict_response_with_usage(self, profile: PaiProfile, question: SurveyQuestion,
+                                    priority: Optional[str] = None) -> Tuple[PredictionResult, Dict[str, Any]]:
+        """Like predict_response, also returning token usage and latency for the call"""
         try:
             # Format the prompt
-            profile_json = json.dumps(profile.dict(), indent=2)
+            profile_json = profile_prompt_text(profile) if self.use_digest else json.dumps(profile.dict(), indent=2)
             options_text = "\n".join([f"- {opt}" for opt in question.options])
             
             prompt = self.prediction_prompt.replace("{profile}", profile_json).replace("{question}", question.question).replace("{options}", options_text)
             
             # Call Claude API
-            response = self.client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1500,
-                temperature=0.3,
+            started = time.monotonic()
+            response = self.llm.create(
+                "prediction",
+                priority=priority,
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
                 messages=[{"role": "user", "content": prompt}]
             )
+            usage = {
+                "input_tokens": getattr(response.usage, "input_tokens", 0) or 0,
+                "output_tokens": getattr(response.usage, "output_tokens", 0) or 0,
+                "latency_ms": round((time.monotonic() - started) * 1000, 1),
+                "model": getattr(response, "model", None) or self.model
+            }
             
             # Parse JSON response
             prediction_json = response.content[0].text.strip()
@@ -128,7 +153,7 @@ Return ONLY the JSON response, no additional text."""
                 option_analysis=prediction_data.get("option_analysis", {})
             )
             
-            return result
+            return result, usage
             
         except json.JSONDecodeError as e:
             print(f"Error parsing JSON response: {e}")
@@ -238,8 +263,6 @@ def get_test_survey_questions() -> List[SurveyQuestion]:
 
 # Example usage
 if __name__ == "__main__":
-    from datetime import datetime
-    
     # Load API key
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
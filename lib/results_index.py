@@ -0,0 +1,190 @@
+"""
+Validation Results Index
+Embedded SQLite index over the validation result files in data/validation_results
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Any
+
+
+class ValidationResultsIndex:
+    """Indexes saved validation results so lookups don't scan the results directory"""
+
+    SUMMARY_FIELDS = [
+        "profile_id",
+        "test_session_id",
+        "timestamp",
+        "digital_twin_version",
+        "model_version",
+        "accuracy_percentage",
+        "total_questions",
+        "correct_answers",
+    ]
+
+    def __init__(self, results_dir: str = "data/validation_results", db_path: Optional[str] = None):
+        self.results_dir = results_dir
+        self.db_path = db_path or os.path.join(results_dir, "results_index.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = None
+        # Directory mtime and wall-clock start of the last scan of results_dir
+        self._scanned_mtime = None
+        self._scanned_at = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index database, creating it on first use and picking up files written since"""
+        if self._conn is not None:
+            return self._conn
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        if os.path.exists(self.db_path):
+            # Only files touched since the index was last written need re-reading
+            self._scanned_at = os.path.getmtime(self.db_path)
+
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS validation_results (
+                filename TEXT PRIMARY KEY,
+                profile_id TEXT NOT NULL,
+                test_session_id TEXT NOT NULL,
+                timestamp TEXT,
+                digital_twin_version TEXT,
+                model_version TEXT,
+                accuracy_percentage NUMERIC,
+                total_questions INTEGER,
+                correct_answers INTEGER
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_profile ON validation_results(profile_id, timestamp)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_session ON validation_results(test_session_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_timestamp ON validation_results(timestamp)")
+        conn.commit()
+        self._conn = conn
+
+        self._rescan()
+        return conn
+
+    def _rescan(self, force: bool = False):
+        """Index result files written outside this process since the last scan
+
+        Result files also come from the CLI scripts and other workers, so the
+        directory is re-listed whenever its mtime moves past the last scan (or
+        when a lookup misses). Files already indexed are only re-read if they
+        were modified after that scan.
+        """
+        try:
+            dir_mtime = os.stat(self.results_dir).st_mtime
+        except OSError:
+            return
+        if not force and self._scanned_mtime is not None and dir_mtime <= self._scanned_mtime:
+            return
+
+        scan_started = time.time()
+        indexed = {row[0] for row in self._conn.execute("SELECT filename FROM validation_results")}
+        for filename in os.listdir(self.results_dir):
+            if not filename.endswith("_results.json"):
+                continue
+            filepath = os.path.join(self.results_dir, filename)
+            try:
+                if filename in indexed and os.path.getmtime(filepath) < self._scanned_at:
+                    continue
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    result_data = json.load(f)
+                self._upsert(filename, result_data)
+            except Exception as e:
+                print(f"Error indexing result file {filename}: {e}")
+        self._conn.commit()
+
+        self._scanned_mtime = dir_mtime
+        self._scanned_at = scan_started
+
+    def _upsert(self, filename: str, results: Dict[str, Any]):
+        """Insert or replace the summary row for a result file"""
+        row = [filename] + [results.get(field) for field in self.SUMMARY_FIELDS]
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO validation_results (filename, {', '.join(self.SUMMARY_FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in row)})",
+            row
+        )
+
+    def record(self, results_file: str, results: Dict[str, Any]):
+        """Index a result file that has just been written"""
+        with self._lock:
+            self._connect()
+            self._upsert(os.path.basename(results_file), results)
+            self._conn.commit()
+
+    def remove(self, filename: str):
+        """Drop an index row whose file no longer exists"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM validation_results WHERE filename = ?", (filename,))
+            conn.commit()
+
+    def _summary(self, row: sqlite3.Row) -> Dict[str, Any]:
+        summary = {"filename": row["filename"]}
+        for field in self.SUMMARY_FIELDS:
+            summary[field] = row[field]
+        return summary
+
+    def _query_latest_for_profile(self, profile_id: str) -> Optional[sqlite3.Row]:
+        return self._conn.execute(
+            "SELECT * FROM validation_results WHERE profile_id = ? "
+            "ORDER BY timestamp DESC, filename DESC LIMIT 1",
+            (profile_id,)
+        ).fetchone()
+
+    def _query_by_session(self, test_session_id: str) -> Optional[sqlite3.Row]:
+        return self._conn.execute(
+            "SELECT * FROM validation_results WHERE test_session_id = ? "
+            "ORDER BY timestamp DESC LIMIT 1",
+            (test_session_id,)
+        ).fetchone()
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        """Summaries of every indexed result, most recent first"""
+        with self._lock:
+            conn = self._connect()
+            self._rescan()
+            rows = conn.execute(
+                "SELECT * FROM validation_results ORDER BY timestamp DESC, filename DESC"
+            ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def get_latest_for_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Summary of the most recent result for a profile"""
+        with self._lock:
+            self._connect()
+            self._rescan()
+            row = self._query_latest_for_profile(profile_id)
+            if row is None:
+                # Miss: the file may have landed within the directory mtime's resolution
+                self._rescan(force=True)
+                row = self._query_latest_for_profile(profile_id)
+        return self._summary(row) if row else None
+
+    def get_by_session(self, test_session_id: str) -> Optional[Dict[str, Any]]:
+        """Summary of the result saved for a test session"""
+        with self._lock:
+            self._connect()
+            self._rescan()
+            row = self._query_by_session(test_session_id)
+            if row is None:
+                self._rescan(force=True)
+                row = self._query_by_session(test_session_id)
+        return self._summary(row) if row else None
+
+    def load_full_results(self, summary: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Load the full result JSON behind an index row"""
+        filepath = os.path.join(self.results_dir, summary["filename"])
+        if not os.path.exists(filepath):
+            # File was removed out from under the index
+            self.remove(summary["filename"])
+            return None
+
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
@@ -0,0 +1,25 @@
+"""
+Sampling Statistics
+Confidence intervals used to stop panel surveys and validation runs early
+"""
+
+from statistics import NormalDist
+from typing import Tuple
+
+import numpy as np
+
+
+CI_LEVEL = 0.95
+
+
+def wilson_interval(counts, n: int, level: float = CI_LEVEL) -> Tuple[np.ndarray, np.ndarray]:
+    """Wilson score interval for counts / n (counts may be a scalar or an array)"""
+    counts = np.asarray(counts, dtype=np.float64)
+    if n == 0:
+        return np.zeros_like(counts), np.ones_like(counts)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    p = counts / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return np.clip(center - half, 0, 1), np.clip(center + half, 0, 1)
@@ -5,9 +5,10 @@ Provides REST API endpoints for the frontend to connect to
 
 import os
 import json
+import asyncio
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from typing import Dict, List, Optional, Any, Set
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -17,6 +18,13 @@ from .ai_interviewer import AIInterviewer, InterviewSession, InterviewMessage
 from .profile_extractor import ProfileExtractor, PaiProfile
 from .response_predictor import ResponsePredictor, SurveyQuestion, get_test_survey_questions
 from .validation_tester import ValidationTester
+from .results_index import ValidationResultsIndex
+from .file_cache import CachedSurvey, create_profile_cache, create_survey_cache
+from .prediction_prefetch import PredictionPrefetcher
+from .tracing import request_trace
+from .interview_socket import iterate_in_thread, BatchedSessionWriter
+from .llm_gateway import call_config, get_gateway
+from .llm_scheduler import NEAR_REAL_TIME
 
 # Load environment variables
 load_dotenv()
@@ -33,6 +41,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Record a trace per request, named by route template and tagged with its path params"""
+    with request_trace(f"{request.method} {request.url.path}") as trace:
+        response = await call_next(request)
+        if trace is not None:
+            route = request.scope.get("route")
+            if route is not None:
+                trace.name = f"{request.method} {route.path}"
+            trace.tags.update(request.scope.get("path_params") or {})
+            trace.tags["status"] = response.status_code
+        return response
+
 # Initialize AI components
 api_key = os.getenv("ANTHROPIC_API_KEY")
 if not api_key:
@@ -42,10 +64,44 @@ interviewer = AIInterviewer(api_key)
 extractor = ProfileExtractor(api_key)
 predictor = ResponsePredictor(api_key)
 validator = ValidationTester(api_key)
+results_index = ValidationResultsIndex("data/validation_results")
+
+# Parsed profiles and surveys, revalidated against file mtime/size
+profile_cache = create_profile_cache()
+survey_cache = create_survey_cache()
+
+VALIDATION_SURVEY_PATH = "data/validation_survey.json"
+
+# Twin predictions started when a validation test begins
+prefetcher = PredictionPrefetcher(max_workers=8)
+PREFETCH_WAIT_SECONDS = 60
 
 # Global session storage (in production, use proper database)
 active_sessions: Dict[str, InterviewSession] = {}
 
+# Profile extractions started from WebSocket completions; the loop only keeps weak references to tasks
+extraction_tasks: Set[asyncio.Task] = set()
+
+
+def _profile_path(profile_id: str) -> str:
+    return f"data/profiles/{profile_id}_profile.json"
+
+
+def _get_cached_profile(profile_id: str) -> PaiProfile:
+    """Get a parsed profile from the cache, raising 404 if it doesn't exist"""
+    profile = profile_cache.get(_profile_path(profile_id))
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+def _get_cached_survey() -> CachedSurvey:
+    """Get the parsed validation survey from the cache, raising 404 if it doesn't exist"""
+    survey = survey_cache.get(VALIDATION_SURVEY_PATH)
+    if survey is None:
+        raise HTTPException(status_code=404, detail="Validation survey not found")
+    return survey
+
 
 def _get_digital_twin_version(profile_id: str) -> str:
     """Get simple version number for digital twin (e.g. rachita_v1)"""
@@ -54,13 +110,10 @@ def _get_digital_twin_version(profile_id: str) -> str:
         if '_v' in profile_id:
             return profile_id
         
-        profile_path = f"data/profiles/{profile_id}_profile.json"
-        if os.path.exists(profile_path):
-            with open(profile_path, 'r') as f:
-                profile_data = json.load(f)
-            
+        profile = profile_cache.get(_profile_path(profile_id))
+        if profile is not None:
             # Check if pai_id contains version info
-            pai_id = profile_data.get("pai_id", profile_id)
+            pai_id = profile.pai_id or profile_id
             if '_v' in pai_id:
                 return pai_id
             
@@ -98,10 +151,16 @@ class ValidationRequest(BaseModel):
     profile_id: str
 
 
+class BeginValidationRequest(BaseModel):
+    profile_id: str
+    test_session_id: str
+
+
 class ValidationResponseRequest(BaseModel):
     profile_id: str
     question_id: str
     human_answer: str
+    test_session_id: Optional[str] = None
 
 
 class SaveValidationResultsRequest(BaseModel):
@@ -194,6 +253,103 @@ async def send_message(request: SendMessageRequest):
         raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
 
 
+@app.websocket("/interview/ws")
+async def interview_socket(websocket: WebSocket):
+    """One interview over one connection: AI replies stream token by token, the session stays in memory
+    and is saved in batches.
+
+    Client frames: {"type": "start", "participant_name"} or {"type": "resume", "session_id"} first, then
+    {"type": "message", "content"} per turn and optionally {"type": "complete"}.
+    Server frames: "session" (as GET /interview/{id}), "token" {"text"}, "turn" (as POST /interview/message),
+    "completed" (as POST /interview/{id}/complete) and "error" {"detail"}.
+    """
+    await websocket.accept()
+    writer = BatchedSessionWriter(interviewer.save_session)
+    session = None
+    try:
+        opening = await websocket.receive_json()
+        if opening.get("type") == "resume":
+            session = active_sessions.get(opening.get("session_id"))
+            if session is None:
+                await websocket.send_json({"type": "error", "detail": "Session not found"})
+                await websocket.close(code=4404)
+                return
+        elif opening.get("type") == "start" and opening.get("participant_name"):
+            session = interviewer.start_interview(opening["participant_name"])
+            active_sessions[session.session_id] = session
+            writer.mark_dirty(session)
+        else:
+            await websocket.send_json({"type": "error", "detail": "Expected a start or resume frame first"})
+            await websocket.close(code=4400)
+            return
+
+        await websocket.send_json({"type": "session", **_session_payload(session)})
+
+        while True:
+            frame = await websocket.receive_json()
+            if frame.get("type") == "complete":
+                interview_file = await writer.close()
+                if interview_file is None:
+                    interview_file = await asyncio.to_thread(interviewer.save_session, session)
+                task = asyncio.create_task(extract_profile_background(interview_file, session.participant_name))
+                extraction_tasks.add(task)
+                task.add_done_callback(extraction_tasks.discard)
+                await websocket.send_json({"type": "completed", "interview_file": interview_file,
+                                           "profile_extraction": "started"})
+                await websocket.close()
+                return
+            if frame.get("type") != "message" or not isinstance(frame.get("content"), str):
+                await websocket.send_json({"type": "error", "detail": "Expected a message or complete frame"})
+                continue
+            if session.is_complete:
+                await websocket.send_json({"type": "error", "detail": "Interview is already complete"})
+                continue
+
+            with request_trace("WS /interview/ws message", session_id=session.session_id):
+                chunks = []
+                async for text in iterate_in_thread(lambda: interviewer.stream_ai_response(session, frame["content"])):
+                    chunks.append(text)
+                    await websocket.send_json({"type": "token", "text": text})
+                ai_response = "".join(chunks)
+
+                interviewer.update_session(session, frame["content"], ai_response)
+                writer.mark_dirty(session)
+                await websocket.send_json({
+                    "type": "turn",
+                    "ai_response": ai_response,
+                    "exchange_count": session.exchange_count,
+                    "is_complete": session.is_complete
+                })
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Interview socket error: {e}")
+        try:
+            await websocket.send_json({"type": "error", "detail": f"Failed to process message: {str(e)}"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        await writer.close()
+
+
+def _session_payload(session: InterviewSession) -> Dict[str, Any]:
+    return {
+        "session_id": session.session_id,
+        "participant_name": session.participant_name,
+        "messages": [{
+            "id": msg.id,
+            "type": msg.type,
+            "content": msg.content,
+            "timestamp": msg.timestamp.isoformat()
+        } for msg in session.messages],
+        "exchange_count": session.exchange_count,
+        "is_complete": session.is_complete,
+        "start_time": session.start_time.isoformat()
+    }
+
+
 @app.get("/interview/{session_id}", response_model=InterviewResponse)
 async def get_interview(session_id: str):
     """Get interview session details"""
@@ -251,6 +407,7 @@ async def extract_profile_background(interview_file: str, participant_name: str)
         
         # Save profile
         profile_file = extractor.save_profile(profile)
+        profile_cache.invalidate(profile_file)
         
         print(f"Profile extracted and saved to: {profile_file}")
         
@@ -268,16 +425,10 @@ async def get_survey_questions():
 @app.post("/predict/{pai_id}")
 async def predict_responses(pai_id: str):
     """Predict survey responses for a profile"""
-    profiles_dir = "data/profiles"
-    profile_file = f"{pai_id}_profile.json"
-    filepath = os.path.join(profiles_dir, profile_file)
-    
-    if not os.path.exists(filepath):
-        raise HTTPException(status_code=404, detail="Profile not found")
+    profile = _get_cached_profile(pai_id)
     
     try:
-        # Load profile and questions
-        profile = extractor.load_profile(filepath)
+        # Load questions
         questions = get_test_survey_questions()
         
         # Generate predictions
@@ -330,16 +481,10 @@ async def chat_with_digital_twin(request: ChatMessageRequest):
     """Chat with a digital twin using their extracted profile"""
     try:
         # Load the profile
-        profile_path = f"data/profiles/{request.profile_id}_profile.json"
-        if not os.path.exists(profile_path):
-            raise HTTPException(status_code=404, detail="Profile not found")
-        
-        profile = extractor.load_profile(profile_path)
+        profile = _get_cached_profile(request.profile_id)
         
         # Create a survey question from the user's message  
         # This converts any question into a structured format for prediction
-        from response_predictor import SurveyQuestion
-        
         # Determine response options based on message type
         if "skincare" in request.message.lower():
             options = [
@@ -404,15 +549,10 @@ async def get_active_sessions():
 async def get_validation_survey():
     """Get the validation survey questions"""
     try:
-        survey_path = "data/validation_survey.json"
-        if not os.path.exists(survey_path):
-            raise HTTPException(status_code=404, detail="Validation survey not found")
-        
-        with open(survey_path, 'r') as f:
-            survey = json.load(f)
-        
-        return survey
+        return _get_cached_survey().raw
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load survey: {str(e)}")
 
@@ -422,26 +562,15 @@ async def predict_validation_responses(request: ValidationRequest):
     """Get digital twin predictions for all validation questions"""
     try:
         # Load the profile
-        profile_path = f"data/profiles/{request.profile_id}_profile.json"
-        if not os.path.exists(profile_path):
-            raise HTTPException(status_code=404, detail="Profile not found")
-        
-        profile = extractor.load_profile(profile_path)
+        profile = _get_cached_profile(request.profile_id)
         
         # Load validation survey
-        with open("data/validation_survey.json", 'r') as f:
-            survey = json.load(f)
+        survey = _get_cached_survey()
         
         # Generate predictions for each question
         predictions = []
-        for q in survey["questions"]:
-            from response_predictor import SurveyQuestion
-            question = SurveyQuestion(
-                id=q["id"],
-                category=q["category"],
-                question=q["question"],
-                options=q["options"]
-            )
+        for q in survey.raw["questions"]:
+            question = survey.questions[q["id"]]
             
             prediction = predictor.predict_response(profile, question)
             predictions.append({
@@ -456,7 +585,7 @@ async def predict_validation_responses(request: ValidationRequest):
         
         return {
             "profile_id": request.profile_id,
-            "survey_title": survey["survey_title"],
+            "survey_title": survey.raw["survey_title"],
             "predictions": predictions,
             "total_questions": len(predictions)
         }
@@ -465,40 +594,63 @@ async def predict_validation_responses(request: ValidationRequest):
         raise HTTPException(status_code=500, detail=f"Failed to generate predictions: {str(e)}")
 
 
-@app.post("/validation/compare")
-async def compare_responses(request: ValidationResponseRequest):
-    """Compare human response to digital twin prediction for accuracy"""
+@app.post("/validation/begin")
+async def begin_validation(request: BeginValidationRequest):
+    """Start predicting every validation question while the human takes the survey"""
     try:
-        # Load the profile
-        profile_path = f"data/profiles/{request.profile_id}_profile.json"
-        if not os.path.exists(profile_path):
-            raise HTTPException(status_code=404, detail="Profile not found")
-        
-        profile = extractor.load_profile(profile_path)
-        
-        # Load validation survey to find the specific question
-        with open("data/validation_survey.json", 'r') as f:
-            survey = json.load(f)
-        
-        question_data = None
-        for q in survey["questions"]:
-            if q["id"] == request.question_id:
-                question_data = q
-                break
+        profile = _get_cached_profile(request.profile_id)
+        survey = _get_cached_survey()
+        
+        queued = prefetcher.begin(
+            request.test_session_id,
+            request.profile_id,
+            predictor,
+            profile,
+            list(survey.questions.values())
+        )
         
-        if not question_data:
-            raise HTTPException(status_code=404, detail="Question not found")
+        return {
+            "status": "started",
+            "test_session_id": request.test_session_id,
+            "predictions_queued": queued
+        }
         
-        # Generate digital twin prediction
-        from response_predictor import SurveyQuestion
-        question = SurveyQuestion(
-            id=question_data["id"],
-            category=question_data["category"],
-            question=question_data["question"],
-            options=question_data["options"]
-        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to begin validation: {str(e)}")
+
+
+@app.post("/validation/compare")
+def compare_responses(request: ValidationResponseRequest):
+    """Compare human response to digital twin prediction for accuracy.
+
+    A plain def, so FastAPI runs it in its threadpool: waiting up to
+    PREFETCH_WAIT_SECONDS for a prefetched prediction (or making one) never
+    blocks the event loop the interview WebSocket runs on.
+    """
+    try:
+        prediction = None
+        if request.test_session_id:
+            # Started by /validation/begin - usually finished before the human answers
+            prediction = prefetcher.get(
+                request.test_session_id,
+                request.question_id,
+                profile_id=request.profile_id,
+                timeout=PREFETCH_WAIT_SECONDS
+            )
         
-        prediction = predictor.predict_response(profile, question)
+        if prediction is None:
+            # Load the profile
+            profile = _get_cached_profile(request.profile_id)
+            
+            # Look up the specific question in the survey's question index
+            question = _get_cached_survey().questions.get(request.question_id)
+            if not question:
+                raise HTTPException(status_code=404, detail="Question not found")
+            
+            # Generate digital twin prediction
+            prediction = predictor.predict_response(profile, question, priority=NEAR_REAL_TIME)
         
         # Compare responses
         is_match = request.human_answer.strip() == prediction.predicted_answer.strip()
@@ -532,7 +684,7 @@ async def save_validation_results(request: SaveValidationResultsRequest):
             "accuracy_percentage": request.accuracy_percentage,
             "total_questions": request.total_questions,
             "correct_answers": request.correct_answers,
-            "model_version": request.model_version or "claude-3-5-sonnet-20241022",
+            "model_version": request.model_version or call_config("prediction")["model"],
             "digital_twin_version": _get_digital_twin_version(request.profile_id),
             "comparisons": request.comparisons,
             "test_completed": True
@@ -543,6 +695,9 @@ async def save_validation_results(request: SaveValidationResultsRequest):
         with open(results_file, 'w', encoding='utf-8') as f:
             json.dump(results, f, indent=2, ensure_ascii=False)
         
+        # Keep the results index in sync with the file we just wrote
+        results_index.record(results_file, results)
+        
         return {
             "message": "Results saved successfully",
             "file_path": results_file,
@@ -557,49 +712,16 @@ async def save_validation_results(request: SaveValidationResultsRequest):
 async def get_validation_history():
     """Get all validation test results across all profiles"""
     try:
-        results_dir = "data/validation_results"
+        # Summaries come straight from the index - no result files are opened
+        results = results_index.get_history()
         
-        if not os.path.exists(results_dir):
+        if not results:
             return {
                 "status": "no_tests_completed",
                 "results": [],
                 "message": "No validation tests have been completed yet"
             }
         
-        # Find all result files
-        result_files = [f for f in os.listdir(results_dir) if f.endswith("_results.json")]
-        
-        if not result_files:
-            return {
-                "status": "no_tests_completed",
-                "results": [],
-                "message": "No validation tests have been completed yet"
-            }
-        
-        # Load all results with summary info
-        results = []
-        for filename in sorted(result_files, reverse=True):  # Most recent first
-            filepath = os.path.join(results_dir, filename)
-            try:
-                with open(filepath, 'r') as f:
-                    result_data = json.load(f)
-                
-                # Add summary info
-                results.append({
-                    "filename": filename,
-                    "profile_id": result_data.get("profile_id"),
-                    "digital_twin_version": result_data.get("digital_twin_version"), 
-                    "model_version": result_data.get("model_version"),
-                    "accuracy_percentage": result_data.get("accuracy_percentage"),
-                    "total_questions": result_data.get("total_questions"),
-                    "correct_answers": result_data.get("correct_answers"),
-                    "timestamp": result_data.get("timestamp"),
-                    "test_session_id": result_data.get("test_session_id")
-                })
-            except Exception as e:
-                print(f"Error loading result file {filename}: {e}")
-                continue
-        
         return {
             "status": "success",
             "total_tests": len(results),
@@ -614,33 +736,17 @@ async def get_validation_history():
 async def get_validation_results(profile_id: str):
     """Get overall validation test results for a profile"""
     try:
-        results_dir = "data/validation_results"
-        
-        if not os.path.exists(results_dir):
-            return {
-                "profile_id": profile_id,
-                "status": "no_tests_completed",
-                "message": "No validation tests have been completed yet"
-            }
-        
-        # Find all result files for this profile
-        result_files = [f for f in os.listdir(results_dir) 
-                       if f.startswith(f"{profile_id}_") and f.endswith("_results.json")]
+        # Find the most recent result for this profile via the index
+        latest = results_index.get_latest_for_profile(profile_id)
+        results = results_index.load_full_results(latest) if latest else None
         
-        if not result_files:
+        if not results:
             return {
                 "profile_id": profile_id,
                 "status": "no_tests_completed", 
                 "message": "No validation tests have been completed yet"
             }
         
-        # Load the most recent results
-        most_recent_file = sorted(result_files)[-1]
-        results_path = os.path.join(results_dir, most_recent_file)
-        
-        with open(results_path, 'r') as f:
-            results = json.load(f)
-        
         return results
         
     except Exception as e:
@@ -651,22 +757,14 @@ async def get_validation_results(profile_id: str):
 async def get_detailed_validation_results(test_session_id: str):
     """Get detailed validation results for a specific test session"""
     try:
-        results_dir = "data/validation_results"
-        
-        if not os.path.exists(results_dir):
-            raise HTTPException(status_code=404, detail="No validation results found")
-        
-        # Find the result file by test session ID
-        result_files = [f for f in os.listdir(results_dir) 
-                       if test_session_id in f and f.endswith("_results.json")]
-        
-        if not result_files:
+        summary = results_index.get_by_session(test_session_id)
+        if not summary:
             raise HTTPException(status_code=404, detail="Test session results not found")
         
         # Load the detailed results
-        results_path = os.path.join(results_dir, result_files[0])
-        with open(results_path, 'r') as f:
-            results = json.load(f)
+        results = results_index.load_full_results(summary)
+        if not results:
+            raise HTTPException(status_code=404, detail="Test session results not found")
         
         return results
         
@@ -691,6 +789,9 @@ async def get_system_status():
             "interviews_completed": interviews_count,
             "profiles_created": profiles_count,
             "predictions_generated": predictions_count,
+            "profile_cache": profile_cache.stats(),
+            "survey_cache": survey_cache.stats(),
+            "llm_gateway": get_gateway(api_key).get_stats(),
             "api_key_configured": bool(api_key),
             "timestamp": datetime.now().isoformat()
         }
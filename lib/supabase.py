@@ -1,7 +1,109 @@
 import os
 import json
+import socket
+import threading
+import urllib.error
+import urllib.parse
+from datetime import datetime, timezone
 from typing import Dict, List, Optional
 
+from .tracing import span
+from .read_cache import SingleFlightCache
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .catalog_replica import CatalogReplica, CATALOG_REPLICA, replica_path
+
+# Seconds a GET result is reused per table; read-mostly tables only, and
+# writes through any SupabaseClient in the process invalidate immediately
+READ_CACHE = os.getenv('PAI_SUPABASE_READ_CACHE', '1') != '0'
+READ_CACHE_TTLS = {
+    'custom_questionnaires': 30,
+    'questionnaire_questions': 30,
+    'survey_templates': 30,
+    'interview_templates': 30,
+    'profile_versions': 5,
+    'people': 5,
+}
+
+# Read-mostly tables served stale-while-revalidate: (seconds past the TTL a result is returned
+# while a background refresh runs, seconds a result still stands in when Supabase is failing)
+STALE_WHILE_REVALIDATE = {
+    'custom_questionnaires': (300, 86400),
+    'questionnaire_questions': (300, 86400),
+    'survey_templates': (300, 86400),
+    'interview_templates': (300, 86400),
+    'profile_versions': (60, 3600),
+}
+
+# Seconds to wait per endpoint class before giving up on Supabase
+SUPABASE_TIMEOUTS = {
+    'read': float(os.getenv('PAI_SUPABASE_READ_TIMEOUT', '5')),
+    'write': float(os.getenv('PAI_SUPABASE_WRITE_TIMEOUT', '10')),
+    'rpc': float(os.getenv('PAI_SUPABASE_RPC_TIMEOUT', '20')),
+}
+
+# Shared across clients - handlers create a SupabaseClient per request
+_reads = SingleFlightCache()
+_breakers = {
+    endpoint_class: CircuitBreaker(f"supabase {endpoint_class}",
+                                   failure_threshold=int(os.getenv('PAI_SUPABASE_BREAKER_FAILURES', '5')),
+                                   reset_timeout=float(os.getenv('PAI_SUPABASE_BREAKER_RESET', '30')))
+    for endpoint_class in SUPABASE_TIMEOUTS
+}
+
+
+_catalogs: Dict[str, CatalogReplica] = {}
+_catalog_lock = threading.Lock()
+
+
+def _catalog_replica(supabase_url: str) -> Optional[CatalogReplica]:
+    """The process's catalog mirror for a Supabase project, opened on first use (None when disabled or unavailable)"""
+    global CATALOG_REPLICA
+    if not CATALOG_REPLICA:
+        return None
+    with _catalog_lock:
+        if supabase_url not in _catalogs:
+            try:
+                _catalogs[supabase_url] = CatalogReplica(replica_path(supabase_url))
+            except Exception as e:
+                print(f"DEBUG: Catalog replica unavailable, reading catalogs from Supabase: {e}")
+                CATALOG_REPLICA = False
+                return None
+        return _catalogs[supabase_url]
+
+
+def _endpoint_class(method: str, table: str) -> str:
+    if table.startswith('rpc/'):
+        return 'rpc'
+    return 'read' if method == 'GET' else 'write'
+
+
+class SupabaseRpcUnavailable(Exception):
+    """The database doesn't have the requested Postgres function (its migration hasn't been run)"""
+
+
+class SupabaseHTTPError(Exception):
+    """Supabase answered with an error status"""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"Supabase error: {status} - {body}")
+        self.status = status
+
+
+# Characters PostgREST endpoints use literally; anything else (spaces, non-ASCII) is percent-encoded
+_URL_SAFE = "/?&=,.*()%:!$'+;@~-_"
+
+# Errors that mean Supabase is unreachable or failing, as opposed to a bad request from us
+_OUTAGE_ERRORS = (urllib.error.URLError, socket.timeout, TimeoutError, ConnectionError)
+
+
+def _is_outage(error: BaseException) -> bool:
+    """Whether a failed request says Supabase is down (so a breaker counts it and a stale read may stand in)"""
+    if isinstance(error, SupabaseHTTPError):
+        return error.status >= 500
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500
+    return isinstance(error, (CircuitOpenError,) + _OUTAGE_ERRORS)
+
 class SupabaseClient:
     def __init__(self):
         self.url = os.getenv('SUPABASE_URL')
@@ -10,12 +112,62 @@ class SupabaseClient:
         if not self.url or not self.key:
             raise Exception('SUPABASE_URL and SUPABASE_ANON_KEY environment variables are required')
     
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, headers: Optional[Dict] = None) -> Dict:
-        """Make HTTP request to Supabase REST API"""
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, headers: Optional[Dict] = None,
+                      cached: bool = True) -> Dict:
+        """Make HTTP request to Supabase REST API.
+
+        Identical concurrent GETs share one round-trip, and GETs of read-mostly
+        tables are briefly cached (and served stale while Supabase is slow or
+        down) unless `cached` is False; any write invalidates its table's cached reads.
+        """
+        table = endpoint.split('?', 1)[0]
+        catalog = _catalog_replica(self.url)
+        if method == 'GET':
+            # Questionnaire and template catalogs are answered from the local mirror when it can
+            rows = catalog.query(self, endpoint) if catalog and not headers else None
+            if rows is not None:
+                return rows
+            key = json.dumps([self.url, endpoint, headers or {}], sort_keys=True)
+            ttl = READ_CACHE_TTLS.get(table, 0) if READ_CACHE and cached else 0
+            stale_ttl, max_stale = STALE_WHILE_REVALIDATE.get(table, (0, 0)) if READ_CACHE and cached else (0, 0)
+            return _reads.get(table, key, lambda: self._send(method, endpoint, data, headers),
+                              ttl=ttl, stale_ttl=stale_ttl, max_stale=max_stale, fallback_on=_is_outage)
+        sent = True
+        try:
+            return self._send(method, endpoint, data, headers)
+        except CircuitOpenError:
+            sent = False
+            raise
+        finally:
+            # Even a failed write may have been applied (one the breaker stopped wasn't);
+            # an RPC may have written to any table
+            if sent:
+                _reads.invalidate(None if table.startswith('rpc/') else table)
+                if catalog:
+                    catalog.mark_dirty(table)
+    
+    def invalidate_cache(self, table: Optional[str] = None):
+        """Drop cached reads of a table (all tables when None), e.g. after writing to it some other way"""
+        _reads.invalidate(table)
+    
+    @staticmethod
+    def read_cache_stats() -> Dict:
+        return _reads.snapshot()
+    
+    def catalog_replica_stats(self) -> Optional[Dict]:
+        catalog = _catalog_replica(self.url)
+        return catalog.snapshot() if catalog else None
+    
+    @staticmethod
+    def circuit_stats() -> Dict:
+        return {endpoint_class: breaker.snapshot() for endpoint_class, breaker in _breakers.items()}
+    
+    def _send(self, method: str, endpoint: str, data: Optional[Dict] = None, headers: Optional[Dict] = None) -> Dict:
         import urllib.request
         import urllib.parse
         
-        url = f"{self.url}/rest/v1/{endpoint}"
+        # Filter values are interpolated raw (names, session ids with spaces); percent-encode what isn't URL-safe
+        url = f"{self.url}/rest/v1/{urllib.parse.quote(endpoint, safe=_URL_SAFE)}"
         
         default_headers = {
             'apikey': self.key,
@@ -33,39 +185,109 @@ class SupabaseClient:
         
         req = urllib.request.Request(url, data=request_data, headers=default_headers, method=method)
         
+        table = endpoint.split('?', 1)[0]
+        endpoint_class = _endpoint_class(method, table)
+        breaker = _breakers[endpoint_class]
+        trial = breaker.before_call()
+        with span("supabase", f"{method} {table}", bytes_sent=len(request_data or b'')) as current:
+            try:
+                with urllib.request.urlopen(req, timeout=SUPABASE_TIMEOUTS[endpoint_class]) as response:
+                    response_data = response.read().decode('utf-8')
+                    current.set(status=response.status, bytes_received=len(response_data))
+                    breaker.record_success(trial)
+            except urllib.error.HTTPError as e:
+                error_data = e.read().decode('utf-8')
+                current.set(status=e.code, bytes_received=len(error_data))
+                # A 4xx is Supabase answering normally about a bad request
+                if e.code >= 500:
+                    breaker.record_failure(trial)
+                else:
+                    breaker.record_success(trial)
+                raise SupabaseHTTPError(e.code, error_data)
+            except _OUTAGE_ERRORS as e:
+                # Timeouts, refused connections, DNS failures
+                breaker.record_failure(trial)
+                current.set(error=type(e).__name__)
+                raise
+            except BaseException as e:
+                # Our own mistake (e.g. an invalid URL) or an interrupt - says nothing about Supabase
+                breaker.release(trial)
+                current.set(error=type(e).__name__)
+                raise
+        return json.loads(response_data) if response_data else {}
+    
+    def _upsert(self, table: str, rows, on_conflict: str) -> List[Dict]:
+        """Insert rows, merging into any existing row with the same `on_conflict` key, in one round-trip"""
+        result = self._make_request('POST', f'{table}?on_conflict={on_conflict}', rows,
+                                    headers={'Prefer': 'resolution=merge-duplicates,return=representation'})
+        return result if isinstance(result, list) else [result] if result else []
+    
+    def _rpc(self, function: str, params: Dict):
+        """Call a Postgres function; raises SupabaseRpcUnavailable if it isn't installed"""
         try:
-            with urllib.request.urlopen(req) as response:
-                response_data = response.read().decode('utf-8')
-                return json.loads(response_data) if response_data else {}
-        except urllib.error.HTTPError as e:
-            error_data = e.read().decode('utf-8')
-            raise Exception(f"Supabase error: {e.code} - {error_data}")
+            return self._make_request('POST', f'rpc/{function}', params)
+        except Exception as e:
+            # PostgREST answers 404 / PGRST202 for a function missing from its schema cache
+            if 'PGRST202' in str(e) or str(e).startswith('Supabase error: 404'):
+                raise SupabaseRpcUnavailable(f"Postgres function {function} is not installed") from e
+            raise
+    
+    def _get_all(self, endpoint: str, page_size: int = 1000) -> List[Dict]:
+        """GET every row for a query, a page at a time (PostgREST caps rows per response)"""
+        separator = '&' if '?' in endpoint else '?'
+        rows: List[Dict] = []
+        while True:
+            page = self._make_request('GET', f'{endpoint}{separator}limit={page_size}&offset={len(rows)}')
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
     
     # ============================================================================
     # PROFILE MANAGEMENT
     # ============================================================================
     
-    def create_person(self, name: str) -> Dict:
-        """Create or get a person"""
-        try:
-            return self._make_request('POST', 'people', {'name': name})
-        except:
-            # Person might already exist, try to get them
-            result = self._make_request('GET', f'people?name=eq.{name}')
-            return result[0] if result else {}
-    
     def insert_profile_version(self, profile_data: Dict) -> Dict:
         """Insert a new profile version"""
         return self._make_request('POST', 'profile_versions', profile_data)
     
-    def get_profile_version(self, profile_id: str) -> Optional[Dict]:
-        """Get a specific profile version by profile_id"""
+    def get_profile_version(self, profile_id: str, cached: bool = True) -> Optional[Dict]:
+        """Get a specific profile version by profile_id (cached=False when another container's writes must be seen)"""
+        try:
+            result = self._make_request('GET', f'profile_versions?profile_id=eq.{profile_id}', cached=cached)
+            return result[0] if result else None
+        except:
+            return None
+    
+    def get_profile_version_stamp(self, profile_id: str) -> Optional[Dict]:
+        """Get just the profile_id and updated_at of a profile version (cheap freshness check)"""
         try:
-            result = self._make_request('GET', f'profile_versions?profile_id=eq.{profile_id}')
+            # Never from the read cache: converted profiles are keyed by this exact version
+            result = self._make_request('GET', f'profile_versions?profile_id=eq.{profile_id}&select=profile_id,updated_at',
+                                        cached=False)
             return result[0] if result else None
         except:
             return None
     
+    def get_profile_versions(self, profile_ids: List[str]) -> List[Dict]:
+        """Get several profile versions in one request"""
+        if not profile_ids:
+            return []
+        try:
+            return self._make_request('GET', f'profile_versions?profile_id=in.({",".join(profile_ids)})')
+        except:
+            return []
+    
+    def get_profile_versions_for_people(self, person_names: List[str]) -> List[Dict]:
+        """profile_id/person_name of every version (active or not) belonging to the given people"""
+        if not person_names:
+            return []
+        try:
+            names = ",".join('"' + name.replace('"', '\\"') + '"' for name in person_names)
+            return self._get_all(f'profile_versions?person_name=in.({names})&select=profile_id,person_name'
+                                 f'&order=profile_id.asc')
+        except:
+            return []
+
     def get_active_profiles(self) -> List[Dict]:
         """Get all active profile versions"""
         try:
@@ -85,6 +307,11 @@ class SupabaseClient:
         """Update an existing profile version"""
         return self._make_request('PATCH', f'profile_versions?profile_id=eq.{profile_id}', profile_data)
     
+    def save_profile_digest(self, profile_id: str, digest: Dict) -> None:
+        """Store the compact prompt digest for a profile version (leaves updated_at alone)"""
+        self._make_request('PATCH', f'profile_versions?profile_id=eq.{profile_id}', {'profile_digest': digest},
+                           headers={'Prefer': 'return=minimal'})
+    
     # ============================================================================
     # INTERVIEW TEMPLATES & MANAGEMENT
     # ============================================================================
@@ -206,6 +433,32 @@ class SupabaseClient:
         except:
             return None
     
+    def get_validation_test_sessions(self, profile_ids: Optional[List[str]] = None) -> List[Dict]:
+        """Get validation test sessions for the given profiles (all sessions when None), newest first"""
+        if profile_ids is not None and not profile_ids:
+            return []
+        try:
+            endpoint = 'validation_test_sessions?order=started_at.desc'
+            if profile_ids is not None:
+                endpoint += f'&profile_id=in.({",".join(profile_ids)})'
+            return self._get_all(endpoint)
+        except:
+            return []
+    
+    def get_survey_responses(self, test_session_ids: List[str], chunk_size: int = 100) -> List[Dict]:
+        """Get the human/AI question responses recorded for the given test sessions"""
+        rows: List[Dict] = []
+        try:
+            # Chunked so long id lists don't overflow the URL
+            for start in range(0, len(test_session_ids), chunk_size):
+                ids = ",".join(test_session_ids[start:start + chunk_size])
+                rows.extend(self._get_all(f'survey_responses?test_session_id=in.({ids})'
+                                          f'&select=test_session_id,question_id,human_response,ai_response,is_correct'
+                                          f'&order=id.asc'))
+            return rows
+        except:
+            return rows
+    
     # ============================================================================
     # AI PREDICTIONS & ANALYTICS
     # ============================================================================
@@ -214,22 +467,49 @@ class SupabaseClient:
         """Insert AI prediction data"""
         return self._make_request('POST', 'ai_predictions', prediction_data)
     
+    def insert_ai_predictions(self, predictions: List[Dict]) -> None:
+        """Insert many AI predictions in a single request"""
+        if predictions:
+            self._make_request('POST', 'ai_predictions', predictions, headers={'Prefer': 'return=minimal'})
+    
     def get_profile_predictions(self, profile_id: str) -> List[Dict]:
         """Get all AI predictions for a profile"""
         try:
-            return self._make_request('GET', f'ai_predictions?profile_id=eq.{profile_id}')
+            return self._get_all(f'ai_predictions?profile_id=eq.{profile_id}&order=id.asc')
         except:
             return []
     
+    def insert_prediction_refresh_job(self, job: Dict) -> Optional[Dict]:
+        """Queue a selective re-prediction job (see supabase_migration_prediction_refresh_jobs.sql)"""
+        result = self._make_request('POST', 'prediction_refresh_jobs', job)
+        return result[0] if isinstance(result, list) and result else None
+    
+    def get_prediction_refresh_jobs(self, status: str = 'pending', limit: int = 50) -> List[Dict]:
+        """Refresh jobs in a status, oldest first"""
+        return self._make_request('GET', f'prediction_refresh_jobs?status=eq.{status}&order=created_at.asc&limit={limit}')
+    
+    def claim_prediction_refresh_job(self, job_id: int) -> bool:
+        """Move a pending job to running; False if another worker got there first"""
+        result = self._make_request('PATCH', f'prediction_refresh_jobs?id=eq.{job_id}&status=eq.pending',
+                                    {'status': 'running', 'started_at': datetime.now(timezone.utc).isoformat()})
+        return bool(result)
+    
+    def finish_prediction_refresh_job(self, job_id: int, status: str, summary: Optional[Dict] = None,
+                                      error: Optional[str] = None) -> None:
+        """Record a job's outcome ('done' / 'failed'), or put it back to 'pending'"""
+        finished_at = datetime.now(timezone.utc).isoformat() if status in ('done', 'failed') else None
+        self._make_request('PATCH', f'prediction_refresh_jobs?id=eq.{job_id}', {
+            'status': status, 'summary': summary, 'error': error, 'finished_at': finished_at
+        }, headers={'Prefer': 'return=minimal'})
+    
+    def upsert_test_history_summary(self, profile_id: str, summary_data: Dict) -> Dict:
+        """Create or update the test history summary for a profile"""
+        rows = self._upsert('test_history_summary', dict(summary_data, profile_id=profile_id), on_conflict='profile_id')
+        return rows[0] if rows else {}
+    
     def update_test_history_summary(self, profile_id: str, summary_data: Dict) -> Dict:
         """Update or create test history summary"""
-        try:
-            # Try to update existing
-            return self._make_request('PATCH', f'test_history_summary?profile_id=eq.{profile_id}', summary_data)
-        except:
-            # Create new if doesn't exist
-            summary_data['profile_id'] = profile_id
-            return self._make_request('POST', 'test_history_summary', summary_data)
+        return self.upsert_test_history_summary(profile_id, summary_data)
     
     def get_test_history_summary(self, profile_id: str) -> Optional[Dict]:
         """Get test history summary for a profile"""
@@ -247,6 +527,27 @@ class SupabaseClient:
         """Create a new custom questionnaire"""
         return self._make_request('POST', 'custom_questionnaires', questionnaire_data)
     
+    def update_custom_questionnaire(self, questionnaire_id: str, questionnaire_data: Dict) -> Dict:
+        """Update an existing custom questionnaire"""
+        return self._make_request('PATCH', f'custom_questionnaires?questionnaire_id=eq.{questionnaire_id}', questionnaire_data)
+    
+    def save_questionnaire_artifacts(self, questionnaire_id: str, artifacts: Dict) -> None:
+        """Store a questionnaire's compiled artifacts (see lib/questionnaire_compiler.py)"""
+        self._make_request('PATCH', f'custom_questionnaires?questionnaire_id=eq.{questionnaire_id}',
+                           {'compiled_artifacts': artifacts}, headers={'Prefer': 'return=minimal'})
+    
+    def get_all_questionnaires(self) -> List[Dict]:
+        """Get every custom questionnaire, active or not"""
+        try:
+            return self._make_request('GET', 'custom_questionnaires?order=created_at.asc')
+        except:
+            return []
+    
+    def delete_questionnaire_questions(self, questionnaire_id: str) -> None:
+        """Remove a questionnaire's rows from questionnaire_questions"""
+        self._make_request('DELETE', f'questionnaire_questions?questionnaire_id=eq.{questionnaire_id}',
+                           headers={'Prefer': 'return=minimal'})
+    
     def add_questionnaire_question(self, question_data: Dict) -> Dict:
         """Add a question to a questionnaire"""
         return self._make_request('POST', 'questionnaire_questions', question_data)
@@ -342,14 +643,14 @@ class SupabaseClient:
     # INTERVIEW SESSIONS & PROFILE MANAGEMENT
     # ============================================================================
     
+    def upsert_person(self, name: str) -> Dict:
+        """Make sure a person record exists and return it (one round-trip, safe when requests race)"""
+        rows = self._upsert('people', {'name': name}, on_conflict='name')
+        return rows[0] if rows else {}
+    
     def create_person(self, name: str) -> Dict:
-        """Create a new person record"""
-        person_data = {
-            'name': name,
-            'created_at': 'NOW()',
-            'updated_at': 'NOW()'
-        }
-        return self._make_request('POST', 'people', person_data)
+        """Create a person record; an existing person with the same name is returned as is"""
+        return self.upsert_person(name)
     
     def get_person(self, name: str) -> Optional[Dict]:
         """Get person by name"""
@@ -374,6 +675,25 @@ class SupabaseClient:
         """Update an existing interview session"""
         return self._make_request('PATCH', f'interview_sessions?session_id=eq.{session_id}', updates)
     
+    def complete_interview_profile(self, person_name: str, profile_id: str, action: str, profile_data: Dict,
+                                   completeness_metadata: Dict, session_ids: List[str]) -> Dict:
+        """Commit a finished interview in one transaction (supabase_complete_interview_rpc.sql).
+
+        Ensures the person, then either merges into `profile_id` (action
+        'existing') or allocates the person's next version, and links the
+        sessions to the result. Returns profile_id, version_number, action
+        ('created' or 'merged'), profile_data, previous_profile_data and
+        sessions_linked.
+        """
+        return self._rpc('complete_interview_profile', {
+            'p_person_name': person_name,
+            'p_profile_id': profile_id,
+            'p_action': action,
+            'p_profile_data': profile_data,
+            'p_completeness_metadata': completeness_metadata or {},
+            'p_session_ids': session_ids
+        })
+    
     def get_recent_interview_sessions_by_person_and_questionnaire(self, person_name: str, questionnaire_id: str) -> List[Dict]:
         """Get recent interview sessions for a person and specific questionnaire type"""
         try:
@@ -403,15 +723,16 @@ class SupabaseClient:
         """Create a new profile version"""
         return self._make_request('POST', 'profile_versions', profile_data)
     
-    def get_latest_profile_version(self, person_name: str) -> Optional[Dict]:
-        """Get the latest profile version for a person"""
+    def get_latest_profile_version(self, person_name: str, cached: bool = True) -> Optional[Dict]:
+        """Get the latest profile version for a person (cached=False when allocating the next version number)"""
         try:
             import urllib.parse
             # URL encode the person name to handle spaces and special characters
             encoded_name = urllib.parse.quote(person_name.strip())
             print(f"DEBUG: Querying latest profile version for person: {person_name} (encoded: {encoded_name})")
             # Use ilike for case-insensitive matching to handle both "rachita_v1" and "Rachita_v1" formats
-            result = self._make_request('GET', f'profile_versions?person_name=ilike.{encoded_name}&order=version_number.desc&limit=1')
+            result = self._make_request('GET', f'profile_versions?person_name=ilike.{encoded_name}&order=version_number.desc&limit=1',
+                                        cached=cached)
             print(f"DEBUG: Latest profile query result: {result}")
             return result[0] if result else None
         except Exception as e:
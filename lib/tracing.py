@@ -0,0 +1,255 @@
+"""
+Request Tracing
+Lightweight spans around Claude calls and Supabase requests, exported as NDJSON
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any
+
+
+TRACE_ENABLED = os.getenv('PAI_TRACE', '1') != '0'
+# Spans are only exported when a file is set (e.g. /tmp/pai_traces.ndjson); past the size limit the
+# file is rotated to <file>.1, so at most twice the limit is kept on disk
+TRACE_FILE = os.getenv('PAI_TRACE_FILE', '')
+TRACE_FILE_MAX_BYTES = int(os.getenv('PAI_TRACE_FILE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+USAGE_FIELDS = [
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+]
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('pai_trace', default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed unit of work (a Claude call, a Supabase request, ...)"""
+
+    def __init__(self, kind: str, name: str, trace: Optional["Trace"], attributes: Optional[Dict[str, Any]] = None):
+        self.span_id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.name = name
+        self.trace = trace
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.outcome = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def fail(self, error: BaseException):
+        self.outcome = "error"
+        self.error = f"{type(error).__name__}: {error}"[:300]
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            "type": "span",
+            "trace_id": self.trace.trace_id if self.trace else None,
+            "span_id": self.span_id,
+            "kind": self.kind,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "outcome": self.outcome,
+        }
+        if self.trace:
+            record.update(self.trace.tags)
+        record.update(self.attributes)
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class Trace:
+    """All spans recorded while handling one request"""
+
+    def __init__(self, name: str, tags: Optional[Dict[str, Any]] = None):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.tags: Dict[str, Any] = {k: v for k, v in (tags or {}).items() if v is not None}
+        self.spans: List[Span] = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            finished = self.finished
+            if not finished:
+                self.spans.append(span)
+        if finished:
+            # Background work (e.g. prefetched predictions) outliving its request
+            _export([span.to_dict()])
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-request totals, with span names ranked by time spent"""
+        with self._lock:
+            spans = list(self.spans)
+
+        by_name: Dict[str, Dict[str, Any]] = {}
+        totals = {"spans": len(spans), "errors": 0, "bytes_sent": 0, "bytes_received": 0}
+        totals.update({field: 0 for field in USAGE_FIELDS})
+
+        for span in spans:
+            key = f"{span.kind}:{span.name}"
+            entry = by_name.setdefault(key, {"name": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + (span.duration_ms or 0), 2)
+            entry["max_ms"] = max(entry["max_ms"], span.duration_ms or 0)
+            if span.outcome != "ok":
+                entry["errors"] += 1
+                totals["errors"] += 1
+            for field in USAGE_FIELDS + ["bytes_sent", "bytes_received"]:
+                totals[field] += span.attributes.get(field) or 0
+
+        summary = {
+            "type": "trace",
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "hot_spots": sorted(by_name.values(), key=lambda e: e["total_ms"], reverse=True),
+        }
+        summary.update(self.tags)
+        summary.update(totals)
+        return summary
+
+
+def _export(records: List[Dict[str, Any]]):
+    if not TRACE_FILE:
+        return
+    try:
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with _export_lock:
+            if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) >= TRACE_FILE_MAX_BYTES:
+                os.replace(TRACE_FILE, TRACE_FILE + '.1')
+            with open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(lines)
+    except Exception as e:
+        print(f"DEBUG: Could not export trace: {e}")
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def tag(**tags):
+    """Attach tags (session_id, profile_id, operation, ...) to the current request's trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.tags.update({k: v for k, v in tags.items() if v is not None})
+
+
+@contextmanager
+def request_trace(name: str, **tags):
+    """Trace one request; spans recorded inside are summarized and exported when it ends"""
+    if not TRACE_ENABLED:
+        yield None
+        return
+
+    trace = Trace(name, tags)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.duration_ms = round((time.perf_counter() - trace._start) * 1000, 2)
+        with trace._lock:
+            trace.finished = True
+
+        summary = trace.summary()
+        _export([span.to_dict() for span in trace.spans] + [summary])
+
+        top = ", ".join(f"{e['name']} {e['total_ms']:.0f}ms x{e['count']}" for e in summary["hot_spots"][:3])
+        print(f"DEBUG: Trace {trace.name} {trace.duration_ms:.0f}ms - {summary['spans']} spans, "
+              f"{summary['input_tokens']}/{summary['output_tokens']} tokens in/out"
+              f"{' - ' + top if top else ''}")
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes):
+    """Time a unit of work inside the current trace; exceptions mark it failed and propagate"""
+    if not TRACE_ENABLED:
+        yield Span(kind, name, None)
+        return
+
+    trace = _current_trace.get()
+    current = Span(kind, name, trace, attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        current.finish()
+        if trace is not None:
+            trace.add(current)
+        else:
+            _export([current.to_dict()])
+
+
+def traced_messages_create(client, call_name: str, **kwargs):
+    """client.messages.create(**kwargs) recorded as an `llm` span with token usage"""
+    payload_bytes = len(json.dumps(
+        {"system": kwargs.get("system"), "messages": kwargs.get("messages")}, default=str
+    ).encode('utf-8'))
+
+    with span("llm", call_name, model=kwargs.get("model"), max_tokens=kwargs.get("max_tokens"),
+              bytes_sent=payload_bytes) as current:
+        response = client.messages.create(**kwargs)
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            current.set(**{field: getattr(usage, field, None) for field in USAGE_FIELDS})
+        current.set(
+            stop_reason=getattr(response, "stop_reason", None),
+            bytes_received=sum(len(getattr(block, "text", "") or "") for block in getattr(response, "content", []))
+        )
+        return response
+
+
+def traced_messages_stream(client, call_name: str, **kwargs):
+    """client.messages.stream(**kwargs) as a generator of text deltas, recorded as an `llm` span with token usage"""
+    payload_bytes = len(json.dumps(
+        {"system": kwargs.get("system"), "messages": kwargs.get("messages")}, default=str
+    ).encode('utf-8'))
+
+    with span("llm", call_name, model=kwargs.get("model"), max_tokens=kwargs.get("max_tokens"),
+              bytes_sent=payload_bytes, streamed=True) as current:
+        started = time.perf_counter()
+        received = 0
+        with client.messages.stream(**kwargs) as stream:
+            for text in stream.text_stream:
+                if not received:
+                    current.set(first_token_ms=round((time.perf_counter() - started) * 1000, 2))
+                received += len(text)
+                yield text
+            response = stream.get_final_message()
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            current.set(**{field: getattr(usage, field, None) for field in USAGE_FIELDS})
+        current.set(stop_reason=getattr(response, "stop_reason", None), bytes_received=received)
+
+
+def wrap_context(fn):
+    """Bind fn to the caller's trace so work handed to a thread pool is still attributed"""
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so run each call in a copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
@@ -0,0 +1,228 @@
+"""
+Turn Journal
+Durable local append-only journal of interview turns, written to Supabase by a background flusher (write-behind)
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .tracing import span
+
+
+WRITE_BEHIND = os.getenv('PAI_INTERVIEW_WRITE_BEHIND', '0') == '1'
+JOURNAL_DIR = os.getenv('PAI_TURN_JOURNAL_DIR', '/tmp/pai_turn_journal')
+FLUSH_INTERVAL_SECONDS = float(os.getenv('PAI_TURN_JOURNAL_FLUSH_INTERVAL', '0.5'))
+
+
+def build_transcript(messages: List[Dict[str, Any]]) -> str:
+    """interview_sessions.transcript for a message list"""
+    return "\n\n".join(f"{'User' if msg.get('type') == 'user' else 'AI'}: {msg.get('content', '')}"
+                       for msg in messages)
+
+
+class TurnJournal:
+    """Interview turns are fsync'd to a local journal and saved to interview_sessions in the background.
+
+    Every entry gets a sequence number. The flusher applies pending entries in
+    sequence order, one GET and one PATCH per session per batch, and records
+    the highest sequence number below which everything is saved. On startup,
+    entries past that mark are replayed. Messages are merged by id
+    (user_N / ai_N), so replaying an entry Supabase already has changes nothing.
+    """
+
+    def __init__(self, supabase_factory: Callable[[], Any], journal_dir: str = JOURNAL_DIR,
+                 flush_interval: float = FLUSH_INTERVAL_SECONDS, batch_size: int = 200,
+                 compact_bytes: int = 1 << 20):
+        self.supabase_factory = supabase_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_bytes = compact_bytes
+        self.path = os.path.join(journal_dir, 'turns.ndjson')
+        self.mark_path = os.path.join(journal_dir, 'flushed_seq')
+
+        self._lock = threading.Lock()        # journal file, sequence numbers, pending list
+        self._flush_lock = threading.Lock()  # one flush at a time, so batches apply in order
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._flushed_seq = 0
+        self._next_seq = 1
+        self._stats = {"appended": 0, "flushed": 0, "batches": 0, "failures": 0, "replayed_on_start": 0,
+                       "last_flush_lag_seconds": 0.0, "max_flush_lag_seconds": 0.0, "last_error": None}
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self._recover()
+
+    def _recover(self):
+        try:
+            with open(self.mark_path, 'r', encoding='utf-8') as f:
+                self._flushed_seq = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            self._flushed_seq = 0
+
+        last_seq = self._flushed_seq
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-append; that turn was never acknowledged
+                        continue
+                    last_seq = max(last_seq, entry['seq'])
+                    if entry['seq'] > self._flushed_seq:
+                        self._pending.append(entry)
+        self._pending.sort(key=lambda entry: entry['seq'])
+        self._next_seq = last_seq + 1
+
+        if self._pending:
+            self._stats["replayed_on_start"] = len(self._pending)
+            print(f"DEBUG: Turn journal has {len(self._pending)} unsaved turn(s) from a previous run, replaying")
+            self._start_flusher()
+
+    def append(self, session_id: str, messages: List[Dict[str, Any]], updates: Dict[str, Any]) -> int:
+        """Durably record a turn's new messages and session fields; returns its sequence number"""
+        with self._lock:
+            entry = {"seq": self._next_seq, "session_id": session_id, "messages": messages,
+                     "updates": updates, "journaled_at": time.time()}
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._next_seq += 1
+            self._pending.append(entry)
+            self._stats["appended"] += 1
+
+        self._start_flusher()
+        self._wake.set()
+        return entry["seq"]
+
+    def pending_turn(self, session_id: str, exchange_count: int) -> Optional[Dict[str, Any]]:
+        """Unsaved journal entry holding a session's turn, if any"""
+        ids = {f"user_{exchange_count}", f"ai_{exchange_count}"}
+        with self._lock:
+            for entry in reversed(self._pending):
+                if entry["session_id"] == session_id and ids <= {msg.get('id') for msg in entry["messages"]}:
+                    return entry
+        return None
+
+    def pending_for(self, session_id: str) -> int:
+        with self._lock:
+            return sum(1 for entry in self._pending if entry["session_id"] == session_id)
+
+    def flush(self) -> int:
+        """Save every pending entry now, in journal order; returns how many were saved.
+
+        A session whose save fails keeps all of its entries pending (later turns
+        never land before earlier ones); other sessions still go through.
+        """
+        saved = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    break
+                done = self._apply(batch)
+                saved += len(done)
+                self._commit(done)
+                if len(done) < len(batch):
+                    break
+        return saved
+
+    def _apply(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_session: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in batch:
+            by_session.setdefault(entry["session_id"], []).append(entry)
+
+        done: List[Dict[str, Any]] = []
+        try:
+            supabase = self.supabase_factory()
+        except Exception as e:
+            self._record_failure(e)
+            return done
+
+        for session_id, entries in by_session.items():
+            try:
+                with span("turn_journal", "flush session", session_id=session_id, entries=len(entries)):
+                    current = supabase.get_interview_session(session_id) or {}
+                    messages = list(current.get('messages') or [])
+                    seen = {msg.get('id') for msg in messages}
+                    updates: Dict[str, Any] = {}
+                    for entry in entries:
+                        for msg in entry["messages"]:
+                            if msg.get('id') not in seen:
+                                seen.add(msg.get('id'))
+                                messages.append(msg)
+                        updates.update(entry["updates"])
+                    supabase.update_interview_session(session_id, dict(updates, messages=messages,
+                                                                       transcript=build_transcript(messages)))
+                done.extend(entries)
+            except Exception as e:
+                self._record_failure(e, session_id)
+        return done
+
+    def _record_failure(self, error: Exception, session_id: Optional[str] = None):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._stats["last_error"] = str(error)
+        print(f"DEBUG: Turn journal flush failed{f' for {session_id}' if session_id else ''}: {error}")
+
+    def _commit(self, done: List[Dict[str, Any]]):
+        if not done:
+            return
+        now = time.time()
+        done_seqs = {entry["seq"] for entry in done}
+        lag = max(now - entry["journaled_at"] for entry in done)
+        with self._lock:
+            self._pending = [entry for entry in self._pending if entry["seq"] not in done_seqs]
+            # Everything below the oldest still-pending entry is saved
+            mark = (self._pending[0]["seq"] - 1) if self._pending else self._next_seq - 1
+            if mark > self._flushed_seq:
+                self._flushed_seq = mark
+                tmp_path = self.mark_path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(str(mark))
+                os.replace(tmp_path, self.mark_path)
+            if not self._pending and os.path.getsize(self.path) > self.compact_bytes:
+                open(self.path, 'w').close()
+
+            self._stats["flushed"] += len(done)
+            self._stats["batches"] += 1
+            self._stats["last_flush_lag_seconds"] = round(lag, 3)
+            self._stats["max_flush_lag_seconds"] = round(max(self._stats["max_flush_lag_seconds"], lag), 3)
+        print(f"DEBUG: Turn journal saved {len(done)} turn(s), lag {lag:.3f}s")
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="pai-turn-journal", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            self._wake.wait(backoff)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self._record_failure(e)
+            with self._lock:
+                stuck = bool(self._pending)
+            # Back off while Supabase is failing, up to 30s between attempts
+            backoff = min(backoff * 2, 30.0) if stuck else self.flush_interval
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current flush lag (age of the oldest unsaved turn)"""
+        with self._lock:
+            oldest = self._pending[0]["journaled_at"] if self._pending else None
+            return dict(self._stats,
+                        pending=len(self._pending),
+                        flush_lag_seconds=round(time.time() - oldest, 3) if oldest else 0.0,
+                        flushed_seq=self._flushed_seq,
+                        next_seq=self._next_seq)
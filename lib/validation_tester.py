@@ -6,10 +6,22 @@ Tests prediction accuracy against real responses
 import os
 import json
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Tuple
 from pydantic import BaseModel
 from .response_predictor import ResponsePredictor, SurveyQuestion, PredictionResult, get_test_survey_questions
 from .profile_extractor import PaiProfile, ProfileExtractor
+from .sampling_stats import wilson_interval, CI_LEVEL
+from .tracing import wrap_context
+
+
+# Adaptive validation stops once the 95% interval on accuracy clears ADAPTIVE_TARGET_ACCURACY (the 60%
+# concept-validation bar), or is within +/- ADAPTIVE_TOLERANCE (reachable from ~24 questions). With a
+# 3-question minimum a twin that misses the first round on the 5 built-in questions stops there.
+ADAPTIVE_TOLERANCE = 0.20
+ADAPTIVE_TARGET_ACCURACY = 0.60
+ADAPTIVE_MIN_QUESTIONS = 3
+ADAPTIVE_ROUND_SIZE = 3
 
 
 class ValidationResult(BaseModel):
@@ -21,6 +33,137 @@ class ValidationResult(BaseModel):
     high_confidence_accuracy: float  # Accuracy for predictions with >0.7 confidence
     low_confidence_accuracy: float   # Accuracy for predictions with <0.5 confidence
     question_results: List[Dict[str, Any]]
+    accuracy_interval: Optional[List[float]] = None  # Wilson interval on accuracy_rate
+    stopping_rule: Optional[Dict[str, Any]] = None   # set when the run stopped adaptively
+
+
+def order_by_information_value(questions: List[SurveyQuestion],
+                               history: Optional[Dict[str, Tuple[int, int]]] = None) -> List[SurveyQuestion]:
+    """Most informative questions first, interleaving categories.
+
+    A question's value is p(1-p) for its smoothed historical hit rate p
+    (history maps question id -> (correct, total)); questions that every twin
+    gets right, or wrong, say little about this one. Unseen questions score as
+    p = 0.5, with more options breaking ties.
+    """
+    history = history or {}
+
+    def value(question: SurveyQuestion) -> float:
+        correct, total = history.get(question.id, (0, 0))
+        p = (correct + 1) / (total + 2)
+        return p * (1 - p)
+
+    remaining = sorted(questions, key=lambda q: (-value(q), -len(q.options), q.id))
+    ordered = []
+    used: Dict[str, int] = {}
+    while remaining:
+        # Best remaining question from the least-covered category
+        question = min(remaining, key=lambda q: used.get(q.category, 0))
+        remaining.remove(question)
+        used[question.category] = used.get(question.category, 0) + 1
+        ordered.append(question)
+    return ordered
+
+
+def score_prediction(question: SurveyQuestion, pred: PredictionResult, real_answer: str) -> Dict[str, Any]:
+    return {
+        "question_id": pred.question_id,
+        "question": question.question,
+        "category": question.category,
+        "predicted_answer": pred.predicted_answer,
+        "real_answer": real_answer,
+        "is_correct": pred.predicted_answer.strip() == real_answer.strip(),
+        "confidence": pred.confidence,
+        "reasoning": pred.reasoning,
+        "uncertainty_flags": pred.uncertainty_flags
+    }
+
+
+def summarize_results(profile_id: str, results: List[Dict[str, Any]]) -> ValidationResult:
+    """Accuracy metrics over per-question results"""
+    total_questions = len(results)
+    correct_count = sum(1 for r in results if r["is_correct"])
+    high_conf = [r for r in results if r["confidence"] > 0.7]
+    low_conf = [r for r in results if r["confidence"] < 0.5]
+    low, high = wilson_interval(correct_count, total_questions)
+
+    return ValidationResult(
+        profile_id=profile_id,
+        total_questions=total_questions,
+        correct_predictions=correct_count,
+        accuracy_rate=correct_count / total_questions if total_questions > 0 else 0,
+        avg_confidence=sum(r["confidence"] for r in results) / total_questions if total_questions > 0 else 0,
+        high_confidence_accuracy=sum(r["is_correct"] for r in high_conf) / len(high_conf) if high_conf else 0,
+        low_confidence_accuracy=sum(r["is_correct"] for r in low_conf) / len(low_conf) if low_conf else 0,
+        question_results=results,
+        accuracy_interval=[round(float(low), 4), round(float(high), 4)]
+    )
+
+
+def adaptive_validate(predictor: ResponsePredictor, profile: PaiProfile, questions: List[SurveyQuestion],
+                      real_responses: Dict[str, str], tolerance: float = ADAPTIVE_TOLERANCE,
+                      min_questions: int = ADAPTIVE_MIN_QUESTIONS,
+                      target_accuracy: Optional[float] = ADAPTIVE_TARGET_ACCURACY,
+                      question_history: Optional[Dict[str, Tuple[int, int]]] = None,
+                      priority: Optional[str] = None, round_size: int = ADAPTIVE_ROUND_SIZE) -> ValidationResult:
+    """Predict questions in information-value order until accuracy is pinned down.
+
+    After each round (and at least `min_questions` answers) the run stops when
+    the Wilson interval on accuracy is within +/- `tolerance`, or, unless
+    `target_accuracy` is None, as soon as the whole interval is above or
+    below it. The rule and why it fired are kept in `stopping_rule`.
+    """
+    ordered = order_by_information_value([q for q in questions if q.id in real_responses], question_history)
+
+    def predict(question: SurveyQuestion) -> Optional[PredictionResult]:
+        try:
+            return predictor.predict_response(profile, question, priority)
+        except Exception as e:
+            print(f"Error predicting question {question.id}: {e}")
+            return None
+
+    results = []
+    asked = 0
+    reason = "exhausted"
+    low, high = 0.0, 1.0
+    with ThreadPoolExecutor(max_workers=round_size) as executor:
+        for start in range(0, len(ordered), round_size):
+            batch = ordered[start:start + round_size]
+            asked += len(batch)
+            for question, pred in zip(batch, executor.map(wrap_context(predict), batch)):
+                if pred is not None:
+                    results.append(score_prediction(question, pred, real_responses[question.id]))
+
+            if len(results) < min_questions:
+                continue
+            correct = sum(1 for r in results if r["is_correct"])
+            low, high = (float(v) for v in wilson_interval(correct, len(results)))
+            if (high - low) / 2 <= tolerance:
+                reason = "precision"
+            elif target_accuracy is not None and low >= target_accuracy:
+                reason = "above_target"
+            elif target_accuracy is not None and high < target_accuracy:
+                reason = "below_target"
+            else:
+                continue
+            break
+
+    result = summarize_results(profile.pai_id, results)
+    result.stopping_rule = {
+        "method": "wilson",
+        "ci_level": CI_LEVEL,
+        "tolerance": tolerance,
+        "min_questions": min_questions,
+        "target_accuracy": target_accuracy,
+        "ordering": "information_value",
+        "reason": reason,
+        "questions_asked": asked,
+        "questions_available": len(ordered),
+        "predictions_saved": len(ordered) - asked,
+        "question_order": [q.id for q in ordered[:asked]]
+    }
+    print(f"DEBUG: Adaptive validation for {profile.pai_id} stopped ({reason}) after {asked}/{len(ordered)} questions")
+    return result
 
 
 class ValidationTester:
@@ -67,8 +210,12 @@ class ValidationTester:
             data = json.load(f)
         return data.get("responses", {})
     
-    def validate_predictions(self, profile: PaiProfile, real_responses: Dict[str, str]) -> ValidationResult:
-        """Validate predictions against real responses"""
+    def validate_predictions(self, profile: PaiProfile, real_responses: Dict[str, str],
+                             adaptive: bool = False, **adaptive_options) -> ValidationResult:
+        """Validate predictions against real responses (adaptive=True stops once accuracy is pinned down)"""
+        if adaptive:
+            return self.validate_predictions_adaptive(profile, real_responses, **adaptive_options)
+
         print(f"\nValidating predictions for {profile.pai_id}")
         
         # Get predictions for all questions
@@ -77,67 +224,49 @@ class ValidationTester:
         
         # Compare predictions with real responses
         results = []
-        correct_count = 0
-        high_conf_correct = 0
-        high_conf_total = 0
-        low_conf_correct = 0
-        low_conf_total = 0
-        
         for pred in predictions:
             real_answer = real_responses.get(pred.question_id)
             if real_answer is None:
                 continue
             
-            is_correct = pred.predicted_answer.strip() == real_answer.strip()
-            if is_correct:
-                correct_count += 1
-            
-            # Track confidence-based accuracy
-            if pred.confidence > 0.7:
-                high_conf_total += 1
-                if is_correct:
-                    high_conf_correct += 1
-            elif pred.confidence < 0.5:
-                low_conf_total += 1
-                if is_correct:
-                    low_conf_correct += 1
-            
             question = next(q for q in questions_to_test if q.id == pred.question_id)
-            
-            result = {
-                "question_id": pred.question_id,
-                "question": question.question,
-                "predicted_answer": pred.predicted_answer,
-                "real_answer": real_answer,
-                "is_correct": is_correct,
-                "confidence": pred.confidence,
-                "reasoning": pred.reasoning,
-                "uncertainty_flags": pred.uncertainty_flags
-            }
-            results.append(result)
+            results.append(score_prediction(question, pred, real_answer))
         
-        # Calculate metrics
-        total_questions = len(results)
-        accuracy_rate = correct_count / total_questions if total_questions > 0 else 0
-        avg_confidence = sum(r["confidence"] for r in results) / total_questions if total_questions > 0 else 0
-        
-        high_conf_accuracy = high_conf_correct / high_conf_total if high_conf_total > 0 else 0
-        low_conf_accuracy = low_conf_correct / low_conf_total if low_conf_total > 0 else 0
-        
-        validation_result = ValidationResult(
-            profile_id=profile.pai_id,
-            total_questions=total_questions,
-            correct_predictions=correct_count,
-            accuracy_rate=accuracy_rate,
-            avg_confidence=avg_confidence,
-            high_confidence_accuracy=high_conf_accuracy,
-            low_confidence_accuracy=low_conf_accuracy,
-            question_results=results
+        return summarize_results(profile.pai_id, results)
+    
+    def validate_predictions_adaptive(self, profile: PaiProfile, real_responses: Dict[str, str],
+                                      tolerance: float = ADAPTIVE_TOLERANCE,
+                                      min_questions: int = ADAPTIVE_MIN_QUESTIONS,
+                                      target_accuracy: Optional[float] = ADAPTIVE_TARGET_ACCURACY) -> ValidationResult:
+        """Validate on just enough questions to place accuracy above/below `target_accuracy` or within `tolerance`"""
+        print(f"\nAdaptively validating predictions for {profile.pai_id}")
+        return adaptive_validate(
+            self.predictor, profile, self.questions, real_responses,
+            tolerance=tolerance, min_questions=min_questions, target_accuracy=target_accuracy,
+            question_history=self.load_question_history()
         )
+    
+    def load_question_history(self, validation_dir: str = "data/validation") -> Dict[str, Tuple[int, int]]:
+        """(correct, total) per question id across saved validation results"""
+        history: Dict[str, Tuple[int, int]] = {}
+        if not os.path.isdir(validation_dir):
+            return history
         
-        return validation_result
+        for filename in os.listdir(validation_dir):
+            if not filename.endswith('_validation.json'):
+                continue
+            try:
+                with open(os.path.join(validation_dir, filename), 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            for qr in saved.get("question_results", []):
+                correct, total = history.get(qr.get("question_id"), (0, 0))
+                history[qr.get("question_id")] = (correct + (1 if qr.get("is_correct") else 0), total + 1)
+        return history
     
-    def run_full_validation(self, profile_filepath: str, collect_responses: bool = True) -> ValidationResult:
+    def run_full_validation(self, profile_filepath: str, collect_responses: bool = True,
+                            adaptive: bool = False) -> ValidationResult:
         """Run complete validation pipeline"""
         # Load profile
         extractor = ProfileExtractor(os.getenv("ANTHROPIC_API_KEY"))
@@ -166,7 +295,7 @@ class ValidationTester:
             print(f"Loaded existing responses from: {responses_file}")
         
         # Run validation
-        validation_result = self.validate_predictions(profile, real_responses)
+        validation_result = self.validate_predictions(profile, real_responses, adaptive=adaptive)
         
         return validation_result
     
@@ -191,6 +320,12 @@ class ValidationTester:
         print(f"Average Confidence: {result.avg_confidence:.2f}")
         print(f"High Confidence Accuracy (>0.7): {result.high_confidence_accuracy:.1%}")
         print(f"Low Confidence Accuracy (<0.5): {result.low_confidence_accuracy:.1%}")
+        if result.accuracy_interval:
+            print(f"Accuracy {CI_LEVEL:.0%} interval: {result.accuracy_interval[0]:.1%} - {result.accuracy_interval[1]:.1%}")
+        if result.stopping_rule:
+            rule = result.stopping_rule
+            print(f"Adaptive stop ({rule['reason']}): asked {rule['questions_asked']}/{rule['questions_available']} "
+                  f"questions, tolerance +/-{rule['tolerance']:.0%}")
         
         # Success criteria check
         success_rate = 0.60  # 60% target from PDF
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Script to compile questionnaires' derived artifacts and store them in custom_questionnaires.compiled_artifacts
+Only questionnaires whose stored artifacts are missing or older than their current version are compiled, unless --force
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("⚠️  python-dotenv not installed. Make sure environment variables are set manually.")
+    pass
+
+# Add lib to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.supabase import SupabaseClient
+from lib.questionnaire_compiler import compile_questionnaire, compiled_artifacts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompile questionnaire interviewer prompts and extraction schemas")
+    parser.add_argument("--questionnaire-id", action="append", dest="questionnaire_ids",
+                        help="Only these questionnaires (default: all)")
+    parser.add_argument("--force", action="store_true", help="Recompile even if the stored artifacts are current")
+    parser.add_argument("--dry-run", action="store_true", help="Compile and report, but don't store anything")
+    parser.add_argument("--show", action="store_true", help="Print each compiled artifact set as JSON")
+    args = parser.parse_args()
+
+    supabase = SupabaseClient()
+    if args.questionnaire_ids:
+        questionnaires = [q for q in (supabase.get_custom_questionnaire(q_id) for q_id in args.questionnaire_ids) if q]
+    else:
+        questionnaires = supabase.get_all_questionnaires()
+    if not questionnaires:
+        print("No questionnaires to compile")
+        sys.exit(1)
+
+    compiled, current, failed = 0, 0, 0
+    for questionnaire in questionnaires:
+        questionnaire_id = questionnaire['questionnaire_id']
+        if compiled_artifacts(questionnaire) and not args.force:
+            current += 1
+            print(f"✓ {questionnaire_id}: up to date")
+            continue
+
+        artifacts = compile_questionnaire(questionnaire)
+        if args.show:
+            print(json.dumps(artifacts, indent=2))
+        if not args.dry_run:
+            try:
+                supabase.save_questionnaire_artifacts(questionnaire_id, artifacts)
+            except Exception as e:
+                failed += 1
+                print(f"❌ {questionnaire_id}: {e}")
+                continue
+        compiled += 1
+        print(f"{'~' if args.dry_run else '✅'} {questionnaire_id}: version {artifacts['source_hash']}, "
+              f"{artifacts['question_count']} questions, {len(artifacts['extraction_schema'])} schema sections, "
+              f"target {artifacts['target_questions']} exchanges")
+
+    print(f"\n{compiled} compiled{' (dry run)' if args.dry_run else ''}, {current} already current, {failed} failed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Script to replay historical validation answers under alternative prediction configs
+Configs are a JSON list of {"name", "model", "prompt_file", "temperature", "max_tokens", "use_digest"}; the first is the baseline
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("⚠️  python-dotenv not installed. Make sure environment variables are set manually.")
+    pass
+
+# Add lib to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.supabase import SupabaseClient
+from lib.replay_harness import ReplayHarness, ReplayConfig, load_replay_cases, REPLAY_CACHE_DIR
+
+
+def print_report(report):
+    print(f"\nReplayed {report['cases']} historical answers (baseline: {report['baseline']})\n")
+    print(f"{'config':<20}{'n':>6}{'cached':>8}{'accuracy':>10}{'95% CI':>15}{'tok in':>9}{'tok out':>9}"
+          f"{'cost $':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, column in report['configs'].items():
+        low, high = column['accuracy_interval']
+        cost = column.get('cost_usd')
+        print(f"{name[:19]:<20}{column['cases']:>6}{column.get('cache_hits', '-'):>8}{column['accuracy']:>10.1%}"
+              f"{f'{low:.0%}-{high:.0%}':>15}{column.get('input_tokens_per_prediction', 0):>9.0f}"
+              f"{column.get('output_tokens_per_prediction', 0):>9.0f}{cost if cost is not None else '-':>9}"
+              f"{column.get('latency_p50_ms', 0):>9.0f}{column.get('latency_p95_ms', 0):>9.0f}")
+
+    for name, column in report['configs'].items():
+        delta = column.get(f"vs_{report['baseline']}")
+        if delta:
+            print(f"\n{name} vs {report['baseline']}: accuracy {delta['accuracy_delta']:+.1%} "
+                  f"({delta['wins']} wins / {delta['losses']} losses over {delta['paired_cases']} paired cases), "
+                  f"tokens {delta['input_tokens_delta']:+.0f} in / {delta['output_tokens_delta']:+.0f} out, "
+                  f"p50 latency {delta['latency_p50_delta_ms']:+.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prediction configs on historical human answers")
+    parser.add_argument("--configs", help="JSON file with a list of configs (default: just the current config)")
+    parser.add_argument("--model", action="append", default=[],
+                        help="Shorthand for an extra config that only changes the model")
+    parser.add_argument("--profile-id", action="append", dest="profile_ids", help="Only these profile versions")
+    parser.add_argument("--survey", help="Only this survey_templates.survey_name")
+    parser.add_argument("--limit", type=int, help="Replay at most this many cases")
+    parser.add_argument("--cache-dir", default=REPLAY_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json-out", help="Also write the report here")
+    args = parser.parse_args()
+
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        print("ANTHROPIC_API_KEY environment variable is required")
+        sys.exit(1)
+
+    if args.configs:
+        with open(args.configs, 'r', encoding='utf-8') as f:
+            configs = [ReplayConfig(**config) for config in json.load(f)]
+    else:
+        configs = [ReplayConfig(name="current")]
+    configs += [ReplayConfig(name=model, model=model) for model in args.model]
+
+    loaded = load_replay_cases(SupabaseClient(), args.profile_ids, args.survey)
+    cases = loaded["cases"][:args.limit] if args.limit else loaded["cases"]
+    if not cases:
+        print("No historical answers to replay")
+        sys.exit(1)
+
+    report = ReplayHarness(api_key, configs, cache_dir=args.cache_dir, max_workers=args.workers).run(
+        cases, loaded["profiles"])
+    print_report(report)
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
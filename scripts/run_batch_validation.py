@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Script to validate every twin against its stored human responses in one non-interactive run
+Re-running with the same --run-id skips twins that already have a result file
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("⚠️  python-dotenv not installed. Make sure environment variables are set manually.")
+    pass
+
+# Add lib to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.response_predictor import ResponsePredictor
+from lib.panel_simulation import survey_questions_from_template
+from lib.batch_validation import BatchValidationRunner, BATCH_VALIDATION_DIR, TARGET_ACCURACY
+from lib.validation_tester import ADAPTIVE_TOLERANCE, ADAPTIVE_MIN_QUESTIONS
+
+
+def print_summary(summary):
+    print(f"\n{'='*60}")
+    print(f"BATCH VALIDATION {summary['run_id']} ({summary['mode']})")
+    print(f"{'='*60}")
+    print(f"Profiles validated: {summary['profiles_validated']} in {summary['duration_seconds']}s")
+    print(f"Mean accuracy: {summary['mean_accuracy']:.1%}  pooled: {summary['pooled_accuracy']:.1%}")
+    print(f"Meeting {summary['target_accuracy']:.0%} target: "
+          f"{summary['profiles_meeting_target']}/{summary['profiles_validated']}")
+    if summary['profiles_failed']:
+        print(f"Failed: {', '.join(summary['profiles_failed'])}")
+    if summary['profiles_skipped_no_responses']:
+        print(f"Skipped (no human responses to its questions): {', '.join(summary['profiles_skipped_no_responses'])}")
+
+    print()
+    for profile in summary['profiles']:
+        status = "✅" if profile['meets_target'] else "❌"
+        interval = profile['accuracy_interval'] or [0, 0]
+        print(f"{status} {profile['profile_id']:<30} {profile['accuracy_rate']:>6.1%} "
+              f"[{interval[0]:.0%}-{interval[1]:.0%}]  {profile['correct_predictions']}/{profile['total_questions']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate many twins in parallel against stored human responses")
+    parser.add_argument("--source", choices=["supabase", "files"], default="supabase",
+                        help="Twins and responses from Supabase (survey_responses) or local files")
+    parser.add_argument("--profile-id", action="append", dest="profile_ids", help="Only these profile versions")
+    parser.add_argument("--survey", help="survey_templates.survey_name to validate with (default: the survey of each "
+                             "person's latest responses, or the built-in questions for local files)")
+    parser.add_argument("--profiles-dir", default="data/profiles", help="Local *_profile.json files (--source files)")
+    parser.add_argument("--responses-dir", default="data/validation",
+                        help="Local *_responses.json files (also a fallback for --source supabase)")
+    parser.add_argument("--run-id", help="Name of the run; re-use it to resume (default: validation_YYYYMMDD)")
+    parser.add_argument("--output-dir", default=BATCH_VALIDATION_DIR)
+    parser.add_argument("--workers", type=int, default=8, help="Twins validated at once")
+    parser.add_argument("--adaptive", action="store_true", help="Stop each twin once accuracy is pinned down")
+    parser.add_argument("--tolerance", type=float, default=ADAPTIVE_TOLERANCE)
+    parser.add_argument("--min-questions", type=int, default=ADAPTIVE_MIN_QUESTIONS)
+    parser.add_argument("--target", type=float, default=TARGET_ACCURACY)
+    parser.add_argument("--json", action="store_true", help="Print the full summary as JSON")
+    args = parser.parse_args()
+
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        print("ANTHROPIC_API_KEY environment variable is required")
+        sys.exit(1)
+
+    supabase = None
+    questions = None
+    if args.source == "supabase" or args.survey:
+        from lib.supabase import SupabaseClient
+        supabase = SupabaseClient()
+    if args.survey:
+        survey_template = supabase.get_survey_template(args.survey)
+        if not survey_template:
+            print(f"Survey template not found: {args.survey}")
+            sys.exit(1)
+        questions = survey_questions_from_template(survey_template)
+
+    runner = BatchValidationRunner(
+        ResponsePredictor(api_key),
+        questions=questions,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        adaptive=args.adaptive,
+        tolerance=args.tolerance,
+        min_questions=args.min_questions,
+        target_accuracy=args.target
+    )
+
+    if args.source == "supabase":
+        jobs, skipped = runner.jobs_from_supabase(supabase, args.profile_ids, args.survey, args.responses_dir)
+    else:
+        jobs, skipped = runner.jobs_from_files(args.profiles_dir, args.responses_dir)
+        if args.profile_ids:
+            jobs = [job for job in jobs if job.profile_id in args.profile_ids]
+
+    summary = runner.run(jobs, run_id=args.run_id, skipped=skipped)
+
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print_summary(summary)
+    print(f"\nSummary: {os.path.join(args.output_dir, summary['run_id'], 'summary.json')}")
+    sys.exit(0 if not summary['profiles_failed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
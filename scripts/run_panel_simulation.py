@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Script to field a survey template to every active digital twin
+Re-running with the same survey and twins resumes from the checkpoint in PAI_PANEL_DIR,
+so a run stopped early with --target-ci-width can be completed by re-running without it
+"""
+
+import os
+import sys
+import json
+import argparse
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("⚠️  python-dotenv not installed. Make sure environment variables are set manually.")
+    pass
+
+# Add lib to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.supabase import SupabaseClient
+from lib.response_predictor import ResponsePredictor
+from lib.panel_simulation import PanelSimulator, PanelFilter, PANEL_DIR, MIN_SEQUENTIAL_TWINS
+
+
+def parse_attribute_filters(values):
+    """--attr lifestyle.location=NYC --attr lifestyle.location=LA -> {"lifestyle.location": ["NYC", "LA"]}"""
+    attributes = {}
+    for value in values or []:
+        key, _, accepted = value.partition('=')
+        attributes.setdefault(key.strip(), []).append(accepted.strip())
+    return attributes
+
+
+def print_summary(summary):
+    print(f"\nRun {summary['run_id']}: {summary['twins']} twins x {summary['questions']} questions")
+    print(f"Predictions: {summary['predictions']} ({summary['resumed_from_checkpoint']} from checkpoint, "
+          f"{summary['failed']} failed, {summary['stored']} stored) in {summary['duration_seconds']}s")
+
+    sequential = summary.get('sequential')
+    if sequential:
+        outcome = "stopped early" if sequential['stopped_early'] else "sampled the whole panel"
+        print(f"Sequential sampling {outcome}: {sequential['twins_sampled']} twins, widest CI "
+              f"{sequential['widest_ci']}, {sequential['llm_calls_saved']} of "
+              f"{sequential['llm_calls_full_panel']} LLM calls saved")
+
+    for question_id, entry in summary['aggregates']['questions'].items():
+        print(f"\n{question_id}: {entry['question']}  (n={entry['responses']})")
+        for option, share, low, high, weighted in zip(entry['options'], entry['shares'], entry['ci_low'],
+                                                      entry['ci_high'], entry['confidence_weighted_shares']):
+            print(f"  {share:>6.1%} [{low:.0%}-{high:.0%}]  {weighted:>6.1%} weighted  {option}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a survey across the active twin panel")
+    parser.add_argument("survey_name", help="survey_templates.survey_name to field")
+    parser.add_argument("--profile-id", action="append", dest="profile_ids", help="Only these profile versions")
+    parser.add_argument("--person", action="append", dest="person_names", help="Only these people")
+    parser.add_argument("--attr", action="append", help="section.field=value filter (repeat for OR within a field)")
+    parser.add_argument("--all-versions", action="store_true", help="Include every active version, not just the latest")
+    parser.add_argument("--limit", type=int, help="Cap the panel size")
+    parser.add_argument("--crosstab", action="append", dest="dimensions", help="section.field to cross-tab by")
+    parser.add_argument("--target-ci-width", type=float,
+                        help="Sample twins until every option share's 95%% CI is at most this wide (e.g. 0.15)")
+    parser.add_argument("--stratify-by", help="section.field to stratify the sampling order by")
+    parser.add_argument("--min-twins", type=int, default=MIN_SEQUENTIAL_TWINS,
+                        help="Never stop sampling before this many twins")
+    parser.add_argument("--run-id", help="Resume or name a specific run")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--no-store", action="store_true", help="Don't write predictions to ai_predictions")
+    parser.add_argument("--json", action="store_true", help="Print the full summary as JSON")
+    args = parser.parse_args()
+
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        print("ANTHROPIC_API_KEY environment variable is required")
+        sys.exit(1)
+
+    supabase = SupabaseClient()
+    survey_template = supabase.get_survey_template(args.survey_name)
+    if not survey_template:
+        print(f"Survey template not found: {args.survey_name}")
+        sys.exit(1)
+
+    twin_filter = PanelFilter(
+        profile_ids=args.profile_ids,
+        person_names=args.person_names,
+        attributes=parse_attribute_filters(args.attr),
+        latest_version_only=not args.all_versions,
+        limit=args.limit
+    )
+
+    simulator = PanelSimulator(ResponsePredictor(api_key), supabase, max_workers=args.workers,
+                               store_results=not args.no_store)
+    summary = simulator.run(survey_template, twin_filter, run_id=args.run_id, dimensions=args.dimensions,
+                            target_ci_width=args.target_ci_width, stratify_by=args.stratify_by,
+                            min_twins=args.min_twins)
+
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print_summary(summary)
+    print(f"\nFull summary: {os.path.join(PANEL_DIR, summary['run_id'] + '_summary.json')}")
+
+
+if __name__ == "__main__":
+    main()
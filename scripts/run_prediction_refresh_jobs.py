@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Script to run queued selective re-prediction jobs (prediction_refresh_jobs)
+Interview completion queues one per profile merge and tries to run it in the background; run this on a schedule for the rest
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta, timezone
+
+# Load environment variables from .env file
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    print("⚠️  python-dotenv not installed. Make sure environment variables are set manually.")
+    pass
+
+# Add lib to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.supabase import SupabaseClient
+from lib.prediction_dependencies import run_refresh_job
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-predict stored predictions for queued profile updates")
+    parser.add_argument("--limit", type=int, default=50, help="Run at most this many jobs")
+    parser.add_argument("--retry-failed", action="store_true", help="Also re-run failed jobs")
+    parser.add_argument("--stuck-minutes", type=float, default=30,
+                        help="Re-run jobs left 'running' this long (their worker died)")
+    args = parser.parse_args()
+
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        print("ANTHROPIC_API_KEY environment variable is required")
+        sys.exit(1)
+
+    supabase = SupabaseClient()
+    jobs = supabase.get_prediction_refresh_jobs('pending', args.limit)
+
+    # Failed and stuck jobs go back to pending so they're claimed like any other
+    requeue = []
+    if args.retry_failed:
+        requeue += supabase.get_prediction_refresh_jobs('failed', args.limit)
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=args.stuck_minutes)
+    requeue += [job for job in supabase.get_prediction_refresh_jobs('running', args.limit)
+                if job.get('started_at') and datetime.fromisoformat(job['started_at'].replace('Z', '+00:00')) < cutoff]
+    for job in requeue:
+        supabase.finish_prediction_refresh_job(job['id'], 'pending', error=job.get('error'))
+        job['status'] = 'pending'
+    jobs = (jobs + requeue)[:args.limit]
+
+    if not jobs:
+        print("No prediction refresh jobs to run")
+        return
+
+    done, skipped, failed = 0, 0, 0
+    for job in jobs:
+        try:
+            summary = run_refresh_job(api_key, supabase, job)
+        except Exception as e:
+            failed += 1
+            print(f"❌ job {job['id']} ({job['profile_id']}): {e}")
+            continue
+        if summary is None:
+            skipped += 1
+            print(f"- job {job['id']} ({job['profile_id']}): claimed by another worker")
+            continue
+        done += 1
+        print(f"✅ job {job['id']} ({job['profile_id']}): {summary['refreshed']} refreshed, "
+              f"{summary['stale']} stale of {summary['stored']} stored")
+
+    print(f"\n{done} done, {skipped} skipped, {failed} failed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
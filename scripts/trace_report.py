@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Script to rank hot spots from exported request traces
+Reads the NDJSON written by lib/tracing.py (PAI_TRACE_FILE), including its rotated .1 file
+"""
+
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List, Any
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def build_report(records: List[Dict[str, Any]], request_filter: str = None) -> Dict[str, Any]:
+    """Aggregate traces per request type and spans per (request type, span)"""
+    traces = [r for r in records if r.get("type") == "trace"]
+    request_names = {}
+    for trace in traces:
+        request = trace["name"]
+        if trace.get("operation") and trace["operation"] not in request:
+            request = f"{request} [{trace['operation']}]"
+        request_names[trace["trace_id"]] = request
+
+    requests: Dict[str, Dict[str, Any]] = {}
+    for trace in traces:
+        request = request_names[trace["trace_id"]]
+        if request_filter and request_filter not in request:
+            continue
+        entry = requests.setdefault(request, {"durations": [], "input_tokens": 0, "output_tokens": 0, "spans": 0})
+        entry["durations"].append(trace.get("duration_ms") or 0)
+        entry["input_tokens"] += trace.get("input_tokens") or 0
+        entry["output_tokens"] += trace.get("output_tokens") or 0
+        entry["spans"] += trace.get("spans") or 0
+
+    spans: Dict[tuple, Dict[str, Any]] = {}
+    for record in records:
+        if record.get("type") != "span":
+            continue
+        request = request_names.get(record.get("trace_id"), "(untraced)")
+        if request_filter and request_filter not in request:
+            continue
+        key = (request, f"{record['kind']}:{record['name']}")
+        entry = spans.setdefault(key, {"durations": [], "errors": 0, "input_tokens": 0, "output_tokens": 0,
+                                       "cache_read_input_tokens": 0, "bytes": 0})
+        entry["durations"].append(record.get("duration_ms") or 0)
+        if record.get("outcome") != "ok":
+            entry["errors"] += 1
+        for field in ("input_tokens", "output_tokens", "cache_read_input_tokens"):
+            entry[field] += record.get(field) or 0
+        entry["bytes"] += (record.get("bytes_sent") or 0) + (record.get("bytes_received") or 0)
+
+    return {"requests": requests, "spans": spans}
+
+
+def print_report(report: Dict[str, Any], top: int):
+    print("\nREQUESTS")
+    print(f"{'request':<55}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'spans/req':>11}{'tok in/req':>12}{'tok out/req':>12}")
+    for request, entry in sorted(report["requests"].items(), key=lambda item: -sum(item[1]["durations"])):
+        count = len(entry["durations"])
+        print(f"{request[:54]:<55}{count:>7}{percentile(entry['durations'], 50):>10.0f}"
+              f"{percentile(entry['durations'], 95):>10.0f}{entry['spans'] / count:>11.1f}"
+              f"{entry['input_tokens'] / count:>12.0f}{entry['output_tokens'] / count:>12.0f}")
+
+    print(f"\nHOT SPOTS (top {top} by total time)")
+    print(f"{'request':<40}{'span':<36}{'count':>7}{'total ms':>11}{'p95 ms':>9}{'err':>5}{'tok in':>9}{'cached':>9}{'KB':>8}")
+    ranked = sorted(report["spans"].items(), key=lambda item: -sum(item[1]["durations"]))
+    for (request, name), entry in ranked[:top]:
+        print(f"{request[:39]:<40}{name[:35]:<36}{len(entry['durations']):>7}{sum(entry['durations']):>11.0f}"
+              f"{percentile(entry['durations'], 95):>9.0f}{entry['errors']:>5}{entry['input_tokens']:>9}"
+              f"{entry['cache_read_input_tokens']:>9}{entry['bytes'] / 1024:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank hot spots from Pai request traces")
+    parser.add_argument("trace_file", nargs="?", default=os.getenv('PAI_TRACE_FILE'))
+    parser.add_argument("--request", help="Only include requests whose name contains this text")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if not args.trace_file:
+        print("No trace file: pass one or set PAI_TRACE_FILE (trace export is off without it)")
+        sys.exit(1)
+    if not os.path.exists(args.trace_file):
+        print(f"Trace file not found: {args.trace_file}")
+        sys.exit(1)
+
+    records = []
+    for path in [args.trace_file + '.1', args.trace_file]:
+        if os.path.exists(path):
+            records.extend(load_records(path))
+    report = build_report(records, args.request)
+    print_report(report, args.top)
+
+
+if __name__ == "__main__":
+    main()
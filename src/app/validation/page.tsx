@@ -50,6 +50,7 @@ export default function ValidationTest() {
   const [availableSurveys, setAvailableSurveys] = useState<Survey[]>([])
   const [selectedSurvey, setSelectedSurvey] = useState<Survey | null>(null)
   const [isLoadingSurveys, setIsLoadingSurveys] = useState(false)
+  const [testSessionId, setTestSessionId] = useState('')
 
   const people = [
     { id: 'rachita', name: 'Rachita' },
@@ -173,9 +174,25 @@ export default function ValidationTest() {
   }
 
   const selectSurvey = (survey: Survey) => {
+    const newTestSessionId = `test_${Date.now()}`
+    setTestSessionId(newTestSessionId)
     setSelectedSurvey(survey)
     setSurvey(survey)
     setTestPhase('questions')
+
+    // Start the twin's predictions while the human answers - not awaited
+    fetch('/api/validation', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        action: 'begin_test',
+        profile_id: profileId,
+        test_session_id: newTestSessionId,
+        survey_name: survey.survey_name || 'validation_survey_1'
+      })
+    }).catch(error => console.error('Error starting prediction prefetch:', error))
   }
 
   const handleAnswer = (answer: string) => {
@@ -220,7 +237,8 @@ export default function ValidationTest() {
             profile_id: profileId,
             question_id: question.id,
             human_answer: humanAnswer || 'NO_ANSWER',
-            survey_name: survey?.survey_name || 'validation_survey_1'
+            survey_name: survey?.survey_name || 'validation_survey_1',
+            test_session_id: testSessionId
           })
         })
 
@@ -245,7 +263,6 @@ export default function ValidationTest() {
 
       // Save results to backend
       try {
-        const testSessionId = `test_${Date.now()}`
         const saveResponse = await fetch('/api/validation', {
           method: 'POST',
           headers: {
@@ -293,6 +310,7 @@ export default function ValidationTest() {
     setAvailableVersions([])
     setSelectedSurvey(null)
     setSurvey(null)
+    setTestSessionId('')
     setTestPhase('person_selection')
   }
 
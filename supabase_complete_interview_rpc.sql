@@ -0,0 +1,164 @@
+-- Migration: complete_interview_profile RPC
+-- Date: 2026-10-19
+-- Purpose: Commit a finished interview (person, profile version allocation, insert or merge,
+-- session links) in one transaction and one round-trip (SupabaseClient.complete_interview_profile).
+-- Until this is run, api/interview.py falls back to committing with separate requests.
+
+-- Section-wise merge of a new extraction into a stored profile_data column.
+-- Mirrors merge_profile_data in lib/profile_extractor.py.
+CREATE OR REPLACE FUNCTION pai_merge_profile_data(p_old JSONB, p_new JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+  v_sections JSONB;
+  v_section TEXT;
+  v_value JSONB;
+BEGIN
+  -- Stored profile is legacy (or empty): the new extraction replaces it
+  IF p_old IS NULL OR jsonb_typeof(p_old -> 'profile_data') IS DISTINCT FROM 'object' THEN
+    RETURN p_new;
+  END IF;
+  -- New data is legacy: keep the existing structure
+  IF jsonb_typeof(p_new -> 'profile_data') IS DISTINCT FROM 'object' THEN
+    RETURN p_old;
+  END IF;
+
+  v_sections := p_old -> 'profile_data';
+  FOR v_section, v_value IN SELECT key, value FROM jsonb_each(p_new -> 'profile_data') LOOP
+    IF jsonb_typeof(v_value) = 'object' AND jsonb_typeof(v_sections -> v_section) = 'object' THEN
+      v_sections := jsonb_set(v_sections, ARRAY[v_section], (v_sections -> v_section) || v_value);
+    ELSE
+      v_sections := jsonb_set(v_sections, ARRAY[v_section], v_value);
+    END IF;
+  END LOOP;
+  RETURN jsonb_set(p_old, '{profile_data}', v_sections);
+END;
+$$;
+
+-- Completeness metadata merge: centrepiece replaced, categories/products gain entries with new names.
+-- Mirrors merge_completeness_metadata in lib/profile_extractor.py.
+CREATE OR REPLACE FUNCTION pai_merge_completeness(p_old JSONB, p_new JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+  v_result JSONB := COALESCE(p_old, '{}'::jsonb);
+  v_key TEXT;
+  v_new JSONB;
+  v_list JSONB;
+  v_item JSONB;
+BEGIN
+  IF p_new IS NULL OR p_new IN ('{}'::jsonb, 'null'::jsonb) THEN
+    RETURN v_result;
+  END IF;
+  IF jsonb_typeof(p_new) <> 'object' OR jsonb_typeof(v_result) <> 'object' THEN
+    RETURN p_new;
+  END IF;
+
+  FOREACH v_key IN ARRAY ARRAY['centrepiece', 'categories', 'products'] LOOP
+    CONTINUE WHEN NOT p_new ? v_key;
+    v_new := p_new -> v_key;
+    IF NOT v_result ? v_key THEN
+      v_result := jsonb_set(v_result, ARRAY[v_key], v_new);
+    ELSIF v_key = 'centrepiece' THEN
+      IF jsonb_typeof(v_new) <> 'null' THEN
+        v_result := jsonb_set(v_result, ARRAY[v_key], v_new);
+      END IF;
+    ELSIF jsonb_typeof(v_result -> v_key) = 'array' AND jsonb_typeof(v_new) = 'array' THEN
+      v_list := v_result -> v_key;
+      FOR v_item IN SELECT value FROM jsonb_array_elements(v_new) LOOP
+        IF jsonb_typeof(v_item) = 'object' AND NOT EXISTS (
+          SELECT 1 FROM jsonb_array_elements(v_list) AS existing(item)
+          WHERE jsonb_typeof(existing.item) = 'object'
+            AND existing.item -> 'name' IS NOT DISTINCT FROM v_item -> 'name'
+        ) THEN
+          v_list := v_list || jsonb_build_array(v_item);
+        END IF;
+      END LOOP;
+      v_result := jsonb_set(v_result, ARRAY[v_key], v_list);
+    ELSE
+      v_result := jsonb_set(v_result, ARRAY[v_key], v_new);
+    END IF;
+  END LOOP;
+  RETURN v_result;
+END;
+$$;
+
+-- p_action 'existing': merge into p_profile_id (a new version is created if it no longer exists).
+-- p_action 'new': allocate the person's next version; p_profile_id is only the provisional id used
+-- during extraction and is replaced by the allocated one.
+CREATE OR REPLACE FUNCTION complete_interview_profile(
+  p_person_name TEXT,
+  p_profile_id TEXT,
+  p_action TEXT,
+  p_profile_data JSONB,
+  p_completeness_metadata JSONB,
+  p_session_ids TEXT[]
+)
+RETURNS JSONB
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_existing profile_versions%ROWTYPE;
+  v_profile_id TEXT;
+  v_version INTEGER;
+  v_saved JSONB;
+  v_previous JSONB := NULL;
+  v_action TEXT;
+  v_linked INTEGER;
+BEGIN
+  INSERT INTO people (name) VALUES (p_person_name) ON CONFLICT (name) DO NOTHING;
+
+  -- Completions for the same person run one at a time, so version numbers can't collide
+  PERFORM pg_advisory_xact_lock(hashtext('profile_versions:' || lower(p_person_name)));
+
+  IF p_action = 'existing' THEN
+    SELECT * INTO v_existing FROM profile_versions WHERE profile_id = p_profile_id FOR UPDATE;
+  END IF;
+
+  IF v_existing.profile_id IS NOT NULL THEN
+    v_previous := v_existing.profile_data;
+    v_saved := pai_merge_profile_data(v_existing.profile_data, p_profile_data);
+    UPDATE profile_versions
+       SET profile_data = v_saved,
+           completeness_metadata = pai_merge_completeness(v_existing.completeness_metadata, p_completeness_metadata),
+           updated_at = NOW()
+     WHERE profile_id = v_existing.profile_id;
+    v_profile_id := v_existing.profile_id;
+    v_version := v_existing.version_number;
+    v_action := 'merged';
+  ELSE
+    -- Same person match as get_latest_profile_version, without ILIKE's wildcards
+    SELECT COALESCE(MAX(version_number), 0) + 1 INTO v_version
+      FROM profile_versions WHERE lower(person_name) = lower(p_person_name);
+    v_profile_id := p_person_name || '_v' || v_version;
+    IF EXISTS (SELECT 1 FROM profile_versions WHERE profile_id = v_profile_id) THEN
+      v_profile_id := v_profile_id || '_' || substr(md5(random()::text), 1, 8);
+    END IF;
+
+    v_saved := p_profile_data;
+    IF jsonb_typeof(v_saved) = 'object' AND v_saved ? 'profile_id' THEN
+      v_saved := jsonb_set(v_saved, '{profile_id}', to_jsonb(v_profile_id));
+    END IF;
+
+    INSERT INTO profile_versions (profile_id, person_name, version_number, profile_data,
+                                  completeness_metadata, is_active, created_at, updated_at)
+    VALUES (v_profile_id, p_person_name, v_version, v_saved,
+            COALESCE(p_completeness_metadata, '{}'::jsonb), true, NOW(), NOW());
+    v_action := 'created';
+  END IF;
+
+  UPDATE interview_sessions SET profile_id = v_profile_id
+   WHERE session_id = ANY(COALESCE(p_session_ids, ARRAY[]::TEXT[]));
+  GET DIAGNOSTICS v_linked = ROW_COUNT;
+
+  RETURN jsonb_build_object(
+    'profile_id', v_profile_id,
+    'version_number', v_version,
+    'action', v_action,
+    'profile_data', v_saved,
+    'previous_profile_data', v_previous,
+    'sessions_linked', v_linked
+  );
+END;
+$$;
+
+COMMENT ON FUNCTION complete_interview_profile(TEXT, TEXT, TEXT, JSONB, JSONB, TEXT[]) IS 'Interview completion in one transaction: ensure person, allocate or merge profile version, link sessions';
@@ -0,0 +1,44 @@
+-- Migration: Keep updated_at current on the catalog tables
+-- Date: 2026-10-19
+-- Purpose: The local catalog replica (lib/catalog_replica.py) syncs incrementally by updated_at, so every
+-- insert and update of custom_questionnaires, questionnaire_questions, survey_templates and
+-- interview_templates must bump it, whichever client made the change (an insert may carry a stale or
+-- client-supplied updated_at). Set PAI_CATALOG_REPLICA=1 once this migration is applied
+
+-- questionnaire_questions only had created_at
+ALTER TABLE questionnaire_questions
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+UPDATE questionnaire_questions SET updated_at = created_at WHERE updated_at IS NULL;
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+  -- clock_timestamp(), not NOW(): a long transaction still gets a time close to its commit
+  NEW.updated_at := clock_timestamp();
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS custom_questionnaires_updated_at ON custom_questionnaires;
+CREATE TRIGGER custom_questionnaires_updated_at BEFORE INSERT OR UPDATE ON custom_questionnaires
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS questionnaire_questions_updated_at ON questionnaire_questions;
+CREATE TRIGGER questionnaire_questions_updated_at BEFORE INSERT OR UPDATE ON questionnaire_questions
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS survey_templates_updated_at ON survey_templates;
+CREATE TRIGGER survey_templates_updated_at BEFORE INSERT OR UPDATE ON survey_templates
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS interview_templates_updated_at ON interview_templates;
+CREATE TRIGGER interview_templates_updated_at BEFORE INSERT OR UPDATE ON interview_templates
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Incremental sync reads each table ordered by updated_at
+CREATE INDEX IF NOT EXISTS idx_custom_questionnaires_updated_at ON custom_questionnaires(updated_at);
+CREATE INDEX IF NOT EXISTS idx_questionnaire_questions_updated_at ON questionnaire_questions(updated_at);
+CREATE INDEX IF NOT EXISTS idx_survey_templates_updated_at ON survey_templates(updated_at);
+CREATE INDEX IF NOT EXISTS idx_interview_templates_updated_at ON interview_templates(updated_at);
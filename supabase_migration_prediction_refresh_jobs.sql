@@ -0,0 +1,22 @@
+-- Migration: Queue selective re-prediction jobs
+-- Date: 2026-10-19
+-- Purpose: Merging a questionnaire into a profile re-predicts the stored predictions that depend on the
+-- changed fields. That runs after the completion response (api/interview.py), and whatever doesn't finish
+-- there is picked up by scripts/run_prediction_refresh_jobs.py
+
+CREATE TABLE IF NOT EXISTS prediction_refresh_jobs (
+  id SERIAL PRIMARY KEY,
+  profile_id VARCHAR NOT NULL,
+  changed_fields TEXT[] NOT NULL,
+  status VARCHAR(10) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed')),
+  summary JSONB,
+  error TEXT,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  started_at TIMESTAMP WITH TIME ZONE,
+  finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_prediction_refresh_jobs_status ON prediction_refresh_jobs(status, created_at);
+
+-- Stored predictions are read per profile, newest row per question
+CREATE INDEX IF NOT EXISTS idx_ai_predictions_profile_id ON ai_predictions(profile_id);
@@ -0,0 +1,9 @@
+-- Migration: Add profile_digest column to profile_versions table
+-- Date: 2026-10-19
+-- Purpose: Store the compact, source-free prompt rendering of each profile version (see lib/profile_digest.py)
+
+-- Add the profile_digest column; rows without one get it built on first use
+ALTER TABLE profile_versions 
+ADD COLUMN IF NOT EXISTS profile_digest JSONB;
+
+COMMENT ON COLUMN profile_versions.profile_digest IS 'Prompt digest: {"format", "source_hash", "text", "tokens", "json_tokens"}; rebuilt when source_hash no longer matches profile_data';
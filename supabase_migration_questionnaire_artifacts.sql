@@ -0,0 +1,11 @@
+-- Migration: Store compiled artifacts with each questionnaire
+-- Date: 2026-10-19
+-- Purpose: The interviewer prompt, field coverage, extraction schema and target interview length are
+-- compiled once per questionnaire version (lib/questionnaire_compiler.py) instead of on every request.
+-- They are rebuilt on create/update in api/questionnaires.py and by scripts/compile_questionnaires.py
+
+ALTER TABLE custom_questionnaires
+ADD COLUMN IF NOT EXISTS compiled_artifacts JSONB;
+
+COMMENT ON COLUMN custom_questionnaires.compiled_artifacts IS
+  'Derived artifacts keyed to the questionnaire version by source_hash; stale or missing artifacts are rebuilt on next use';
@@ -0,0 +1,46 @@
+"""
+Circuit Breaker Tests
+Only the half-open trial call decides the circuit's next state
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.circuit_breaker import CircuitBreaker, CircuitOpenError, HALF_OPEN
+
+
+def _open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure(breaker.before_call())
+    time.sleep(0.02)
+    return breaker
+
+
+def test_straggler_release_does_not_admit_a_second_trial():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    straggler = breaker.before_call()  # started while closed
+    breaker.record_failure(breaker.before_call())
+    time.sleep(0.02)
+
+    trial = breaker.before_call()
+    assert trial is not None
+    breaker.release(straggler)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.release(trial)
+    assert breaker.before_call() is not None
+
+
+def test_straggler_failure_does_not_reopen_a_half_open_circuit():
+    breaker = _open_breaker()
+    trial = breaker.before_call()
+    breaker.record_failure(None)
+    assert breaker.snapshot()["state"] == HALF_OPEN
+
+    breaker.record_success(trial)
+    assert breaker.snapshot()["state"] == "closed"
@@ -0,0 +1,39 @@
+"""
+LLM Scheduler Tests
+Reserved interactive slots and admission bookkeeping
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.llm_scheduler import LLMScheduler, LLMAdmissionRejected, INTERACTIVE, BATCH
+
+
+def test_batch_work_leaves_reserved_slots_for_interactive_calls():
+    scheduler = LLMScheduler(4, interactive_reserved=2)
+    scheduler.acquire(BATCH)
+    scheduler.acquire(BATCH)
+
+    with pytest.raises(TimeoutError):
+        scheduler.acquire(BATCH, timeout=0.05)
+
+    # Both reserved slots are still free for live turns
+    scheduler.acquire(INTERACTIVE, timeout=0.05)
+    scheduler.acquire(INTERACTIVE, timeout=0.05)
+    assert scheduler.in_flight == 4
+
+
+def test_rejected_call_does_not_advance_its_class_finish_tag():
+    scheduler = LLMScheduler(1)
+    scheduler.acquire(BATCH)
+    scheduler.release(BATCH, service_seconds=10.0)
+    scheduler.acquire(BATCH)
+    before = scheduler._last_finish[BATCH]
+
+    # The only slot is busy and calls take ~10s, so this one can't start in time
+    with pytest.raises(LLMAdmissionRejected):
+        scheduler.acquire(BATCH, timeout=0.01)
+    assert scheduler._last_finish[BATCH] == before
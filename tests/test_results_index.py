@@ -0,0 +1,53 @@
+"""
+Validation Results Index Tests
+Result files written by other processes after the index exists still get indexed
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.results_index import ValidationResultsIndex
+
+
+def _write_result(results_dir, profile_id, session_id, timestamp):
+    results = {
+        "profile_id": profile_id,
+        "test_session_id": session_id,
+        "timestamp": timestamp,
+        "accuracy_percentage": 80.0,
+        "total_questions": 5,
+        "correct_answers": 4,
+    }
+    path = os.path.join(results_dir, f"{profile_id}_{session_id}_results.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f)
+    return path
+
+
+def test_indexes_files_written_after_the_index_was_created(tmp_path):
+    results_dir = str(tmp_path)
+    _write_result(results_dir, "twin_v1", "session_a", "2026-01-01T00:00:00")
+
+    index = ValidationResultsIndex(results_dir)
+    assert [row["test_session_id"] for row in index.get_history()] == ["session_a"]
+
+    # Written by a CLI script, not through index.record()
+    _write_result(results_dir, "twin_v1", "session_b", "2026-01-02T00:00:00")
+
+    assert index.get_by_session("session_b")["profile_id"] == "twin_v1"
+    assert index.get_latest_for_profile("twin_v1")["test_session_id"] == "session_b"
+    assert len(index.get_history()) == 2
+
+
+def test_reopened_index_picks_up_files_written_while_closed(tmp_path):
+    results_dir = str(tmp_path)
+    _write_result(results_dir, "twin_v1", "session_a", "2026-01-01T00:00:00")
+    ValidationResultsIndex(results_dir).get_history()
+
+    _write_result(results_dir, "twin_v2", "session_b", "2026-01-02T00:00:00")
+
+    index = ValidationResultsIndex(results_dir)
+    assert index.get_latest_for_profile("twin_v2")["test_session_id"] == "session_b"
+    assert len(index.get_history()) == 2
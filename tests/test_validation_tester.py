@@ -0,0 +1,68 @@
+"""
+Adaptive Validation Tests
+The default stopping rule fires early on the built-in survey questions
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from lib.profile_extractor import PaiProfile
+from lib.response_predictor import PredictionResult, get_test_survey_questions
+from lib.validation_tester import adaptive_validate, ADAPTIVE_MIN_QUESTIONS
+
+
+class FixedPredictor:
+    """Answers every question with the given option index and counts the calls"""
+
+    def __init__(self, option: int):
+        self.option = option
+        self.calls = 0
+
+    def predict_response(self, profile, question, priority=None):
+        self.calls += 1
+        return PredictionResult(
+            question_id=question.id,
+            predicted_answer=question.options[self.option],
+            confidence=0.8,
+            reasoning="fixed",
+            uncertainty_flags=[],
+            option_analysis={}
+        )
+
+
+def _profile() -> PaiProfile:
+    return PaiProfile(pai_id="test_twin", demographics={}, core_attitudes={}, decision_psychology={},
+                      usage_patterns={}, value_system={}, behavioral_quotes=[], prediction_weights={})
+
+
+def test_defaults_can_trigger_on_built_in_questions():
+    assert ADAPTIVE_MIN_QUESTIONS <= len(get_test_survey_questions())
+
+
+def test_stops_early_below_target_on_built_in_questions():
+    questions = get_test_survey_questions()
+    # The human always picks the first option, the twin always the last
+    real_responses = {q.id: q.options[0] for q in questions}
+    predictor = FixedPredictor(option=-1)
+
+    result = adaptive_validate(predictor, _profile(), questions, real_responses)
+
+    assert result.stopping_rule["reason"] == "below_target"
+    assert result.stopping_rule["questions_asked"] < len(questions)
+    assert predictor.calls == result.stopping_rule["questions_asked"]
+    assert result.stopping_rule["predictions_saved"] == len(questions) - predictor.calls
+    assert result.accuracy_interval[1] < result.stopping_rule["target_accuracy"]
+
+
+def test_runs_to_exhaustion_when_interval_straddles_target():
+    questions = get_test_survey_questions()
+    real_responses = {q.id: q.options[0] for q in questions}
+    predictor = FixedPredictor(option=0)
+
+    result = adaptive_validate(predictor, _profile(), questions, real_responses)
+
+    # 5/5 correct still leaves the 95% interval below 0.6, so every question is asked
+    assert result.stopping_rule["reason"] == "exhausted"
+    assert predictor.calls == len(questions)
+    assert result.accuracy_rate == 1.0